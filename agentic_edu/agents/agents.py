@@ -1,6 +1,8 @@
 from typing import Optional, List, Dict, Any
 from agentic_edu.agents.instruments import PostgresAgentInstruments
 from agentic_edu.modules import orchestrator
+from agentic_edu.modules.llm_cache import ResponseCache
+from agentic_edu.modules.usage import UsageLedger
 from agentic_edu.agents import agent_config
 import autogen
 import guidance
@@ -201,6 +203,10 @@ def build_team_orchestrator(
     team: str,
     agent_instruments: PostgresAgentInstruments,
     validate_results: callable = None,
+    deadline_seconds: float = None,
+    response_cache: ResponseCache = None,
+    token_budget: int = None,
+    usage_ledger: UsageLedger = None,
 ) -> orchestrator.Orchestrator:
     """
     Based on a team name, build a team of agents and return an orchestrator
@@ -211,12 +217,20 @@ def build_team_orchestrator(
             agents=build_data_eng_team(agent_instruments),
             instruments=agent_instruments,
             validate_results_func=validate_results,
+            deadline_seconds=deadline_seconds,
+            response_cache=response_cache,
+            token_budget=token_budget,
+            usage_ledger=usage_ledger,
         )
     elif team == "data_viz":
         return orchestrator.Orchestrator(
             name="data_viz_team",
             agents=build_data_viz_team(agent_instruments),
             validate_results_func=validate_results,
+            deadline_seconds=deadline_seconds,
+            response_cache=response_cache,
+            token_budget=token_budget,
+            usage_ledger=usage_ledger,
         )
     elif team == "scrum_master":
         return orchestrator.Orchestrator(
@@ -224,6 +238,10 @@ def build_team_orchestrator(
             agents=build_scrum_master_team(agent_instruments),
             instruments=agent_instruments,
             validate_results_func=validate_results,
+            deadline_seconds=deadline_seconds,
+            response_cache=response_cache,
+            token_budget=token_budget,
+            usage_ledger=usage_ledger,
         )
     elif team == "data_insights":
         return orchestrator.Orchestrator(
@@ -231,6 +249,10 @@ def build_team_orchestrator(
             agents=build_insights_team(agent_instruments),
             instruments=agent_instruments,
             validate_results_func=validate_results,
+            deadline_seconds=deadline_seconds,
+            response_cache=response_cache,
+            token_budget=token_budget,
+            usage_ledger=usage_ledger,
         )
 
     raise Exception("Unknown team: " + team)
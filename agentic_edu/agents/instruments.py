@@ -1,9 +1,37 @@
-from agentic_edu.modules.db import PostgresManager
+from agentic_edu.modules.db import (
+    COPY_ROW_THRESHOLD,
+    PostgresManager,
+    ResultLimiter,
+    is_select,
+)
+from agentic_edu.modules import db_pool
+from agentic_edu.modules import db_router
+from agentic_edu.modules.db_router import ReplicaRouter
+from agentic_edu.modules.query_cache import QueryResultCache
+from agentic_edu.modules.query_guard import GuardDecision, QueryGuard
+from agentic_edu.modules.schema_snapshot import SchemaSnapshot
+from agentic_edu.modules import columnar
 from agentic_edu.modules import file
+import hashlib
+from psycopg2.extensions import QueryCanceledError
+import json
 import os
+import shutil
+from typing import Dict, List, Optional
 
 BASE_DIR = os.environ.get("BASE_DIR", "./agent_results")
 
+# State that outlives a session, e.g. schema snapshots
+CACHE_DIR = os.environ.get("CACHE_DIR", "./agent_cache")
+
+
+def min_timeout(*timeouts_ms: Optional[int]) -> Optional[int]:
+    """
+    The strictest of several optional timeouts
+    """
+    timeouts_ms = [timeout for timeout in timeouts_ms if timeout is not None]
+    return min(timeouts_ms) if timeouts_ms else None
+
 
 class AgentInstruments:
     """
@@ -26,6 +54,12 @@ class AgentInstruments:
         """
         raise NotImplementedError
 
+    def cancel(self):
+        """
+        Interrupt in-flight work, called from another thread when a deadline hits
+        """
+        pass
+
     def make_agent_chat_file(self, team_name: str):
         return os.path.join(self.root_dir, f"agent_chats_{team_name}.json")
 
@@ -51,22 +85,95 @@ class PostgresAgentInstruments(AgentInstruments):
         - The state lifecycle lives between all agent orchestrations
     """
 
-    def __init__(self, db_url: str, session_id: str) -> None:
+    def __init__(
+        self,
+        db_url: str,
+        session_id: str,
+        use_pool: bool = False,
+        results_format: str = "json",
+        copy_row_threshold: int = COPY_ROW_THRESHOLD,
+        query_cache: QueryResultCache = None,
+        query_guard: QueryGuard = None,
+        statement_timeout_ms: int = None,
+        max_rows: int = None,
+        max_bytes: int = None,
+        replica_urls: List[str] = None,
+        replica_strategy: str = "round_robin",
+        tenant_db_urls: Dict[str, str] = None,
+    ) -> None:
         super().__init__()
 
         self.db_url = db_url
+        # borrow connections from a process-wide pool instead of opening one
+        self.use_pool = use_pool
         self.db = None
         self.session_id = session_id
         self.messages = []
         self.innovation_index = 0
 
+        # "json" - one pretty-printed document built in memory
+        # "jsonl" - rows streamed to disk in batches, bounded memory for any size
+        # "columnar" - typed, compressed columns: parquet, or npz without pyarrow
+        if results_format == "columnar":
+            results_format = columnar.columnar_format()
+        self.results_format = results_format
+
+        # text results estimated above this many rows are exported as csv with
+        # COPY, None to never use COPY
+        self.copy_row_threshold = copy_row_threshold
+
+        # the file the last run_sql wrote, its format can differ per query
+        self.last_run_sql_results_file = None
+        # rows the last run_sql wrote, when the writer reports it
+        self.last_run_sql_row_count = None
+
+        # optional cache of results files, hits skip the database entirely
+        self.query_cache = query_cache
+
+        # optional EXPLAIN check that rejects or limits expensive queries
+        self.query_guard = query_guard
+
+        # per query caps: Postgres cancels statements after statement_timeout_ms,
+        # fetching stops after max_rows rows or about max_bytes bytes
+        self.statement_timeout_ms = statement_timeout_ms
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+
+        # read replicas for read-only agent queries, everything else uses db_url
+        self.replica_urls = replica_urls or []
+        self.replica_strategy = replica_strategy
+
+        # tenant name -> url, run_sql fans out to every tenant and merges rows
+        self.tenant_db_urls = tenant_db_urls or {}
+        self.tenant_dbs: Dict[str, PostgresManager] = {}
+
     def __enter__(self):
         """
         Support entering the 'with' statement
         """
         self.reset_files()
-        self.db = PostgresManager()
-        self.db.connect_with_url(self.db_url)
+        self.db = PostgresManager(snapshot=SchemaSnapshot(self.schema_snapshot_file))
+        if self.replica_urls:
+            self.db.connect_with_pool(
+                ReplicaRouter(
+                    db_pool.get_pool(self.db_url),
+                    [db_pool.get_pool(url) for url in self.replica_urls],
+                    self.replica_strategy,
+                )
+            )
+        elif self.use_pool:
+            self.db.connect_with_pool(db_pool.get_pool(self.db_url))
+        else:
+            self.db.connect_with_url(self.db_url)
+
+        for name, url in self.tenant_db_urls.items():
+            tenant_db = PostgresManager()
+            if self.use_pool:
+                tenant_db.connect_with_pool(db_pool.get_pool(url))
+            else:
+                tenant_db.connect_with_url(url)
+            self.tenant_dbs[name] = tenant_db
+
         return self, self.db
 
     def __exit__(self, exc_type, exc_val, exc_tb):
@@ -74,6 +181,17 @@ class PostgresAgentInstruments(AgentInstruments):
         Support exiting the 'with' statement
         """
         self.db.close()
+        for tenant_db in self.tenant_dbs.values():
+            tenant_db.close()
+
+    def cancel(self):
+        """
+        Cancel any query the agents are running
+        """
+        if self.db is not None:
+            self.db.cancel()
+        for tenant_db in self.tenant_dbs.values():
+            tenant_db.cancel()
 
     def sync_messages(self, messages: list):
         """
@@ -99,11 +217,34 @@ class PostgresAgentInstruments(AgentInstruments):
         """
         return os.path.join(self.root_dir, fname)
 
+    @property
+    def schema_snapshot_file(self):
+        """
+        Schema snapshots are kept per database and shared across sessions
+        """
+        db_hash = hashlib.sha256(self.db_url.encode("utf-8")).hexdigest()[:16]
+        return os.path.join(CACHE_DIR, f"schema_snapshot_{db_hash}.json")
+
+    @property
+    def database_key(self):
+        """
+        Identifies the database(s) run_sql queries, so databases sharing a
+        schema (tenants, staging / prod) never share cached results
+        """
+        urls = [self.db_url] + [
+            f"{name}={url}" for name, url in sorted(self.tenant_db_urls.items())
+        ]
+        return hashlib.sha256("\n".join(urls).encode("utf-8")).hexdigest()
+
     # -------------------------- Agent Properties -------------------------- #
 
     @property
     def run_sql_results_file(self):
-        return self.get_file_path("run_sql_results.json")
+        return self.get_file_path(f"run_sql_results.{self.results_format}")
+
+    @property
+    def run_sql_copy_results_file(self):
+        return self.get_file_path("run_sql_results.csv")
 
     # -------------------------- Agent Functions -------------------------- #
 
@@ -111,24 +252,268 @@ class PostgresAgentInstruments(AgentInstruments):
         """
         Run a SQL query against the postgres database
         """
-        results_as_json = self.db.run_sql(sql)
+        self.last_run_sql_row_count = None
+
+        # cached or not, a query is only served if the guard lets it run
+        decision = self.check_sql(sql)
+        if not decision.allowed:
+            return self.query_error_message(decision.error)
+
+        schema_version = None
+        if self.query_cache is not None:
+            # any schema change gives a new version and so a cache miss
+            schema_version = self.db.get_schema_version()
+            if self.tenant_dbs:
+                # fanned out results also depend on which tenants are queried
+                schema_version += ":" + ",".join(sorted(self.tenant_dbs))
+            # keyed on the SQL that runs, including a LIMIT added by the guard
+            cached = self.query_cache.get(
+                decision.sql,
+                schema_version,
+                self.results_format,
+                database=self.database_key,
+            )
+            if cached is not None:
+                return self.restore_cached_results(*cached)
+
+        statement_timeout_ms = min_timeout(
+            self.statement_timeout_ms, decision.statement_timeout_ms
+        )
+        limiter = self.make_result_limiter()
+
+        try:
+            summary = self.write_sql_results(
+                decision.sql, statement_timeout_ms, limiter, decision
+            )
+        except QueryCanceledError:
+            return self.query_error_message(
+                {
+                    "error": "query_cancelled",
+                    "reason": "The query was cancelled by its statement timeout "
+                    f"({statement_timeout_ms}ms) or the conversation deadline",
+                    "suggestion": "Filter or aggregate earlier so less data is scanned.",
+                }
+            )
+
+        self.last_run_sql_row_count = (summary or {}).get("row_count")
+
+        if decision.row_limit is not None:
+            summary = {**(summary or {}), "row_limit": decision.row_limit}
+
+        if limiter is not None and limiter.truncated:
+            summary = {
+                **(summary or {}),
+                "truncated": True,
+                "max_rows": self.max_rows,
+                "max_bytes": self.max_bytes,
+            }
+
+        if self.query_cache is not None:
+            self.query_cache.put(
+                decision.sql,
+                schema_version,
+                self.results_format,
+                self.last_run_sql_results_file,
+                summary,
+                database=self.database_key,
+            )
+        return self.results_delivered_message(summary)
+
+    def check_sql(self, sql: str) -> GuardDecision:
+        """
+        Run the cost guard, if any, before the query touches the database
+        """
+        if self.query_guard is None:
+            return GuardDecision(sql)
+        return self.query_guard.check(sql, self.db.explain)
+
+    def query_error_message(self, error: dict) -> str:
+        return "Query was not run, revise the SQL and try again: " + json.dumps(error)
+
+    def make_result_limiter(self) -> Optional[ResultLimiter]:
+        if self.max_rows is None and self.max_bytes is None:
+            return None
+        return ResultLimiter(self.max_rows, self.max_bytes)
+
+    def write_sql_results(
+        self,
+        sql: str,
+        statement_timeout_ms: int = None,
+        limiter: ResultLimiter = None,
+        decision: GuardDecision = None,
+    ):
+        """
+        Run a query into the results file, returning a summary for the agent or None
+        """
+        if self.tenant_dbs:
+            return self.fan_out_sql_results(sql, statement_timeout_ms, limiter)
+
+        # COPY cannot stop at a row / byte cap, capped queries are fetched
+        if limiter is None and self.should_copy_sql_results(sql, decision):
+            return self.copy_sql_results(sql, statement_timeout_ms)
+
+        if self.results_format in ("jsonl", "parquet", "npz"):
+            return self.stream_sql_results(sql, statement_timeout_ms, limiter)
+
+        results_as_json = self.db.run_sql(
+            sql, statement_timeout_ms=statement_timeout_ms, limiter=limiter
+        )
 
         fname = self.run_sql_results_file
 
         # dump these results to a file
         with open(fname, "w") as f:
             f.write(results_as_json)
+        self.last_run_sql_results_file = fname
+
+        return None
+
+    def results_delivered_message(self, summary: dict = None) -> str:
+        fname = self.last_run_sql_results_file
+        file_format = os.path.splitext(fname)[1].lstrip(".")
+        message = f"Successfully delivered results to {file_format} file"
+        if file_format != self.results_format:
+            # large results are exported with COPY
+            message += f" instead of {self.results_format} as the result was too large"
+        if summary is None:
+            return message
+        return message + ": " + json.dumps({"file": fname, **summary})
+
+    def restore_cached_results(self, cached_file: str, summary: dict = None) -> str:
+        """
+        Copy cached results into this session instead of querying the database
+        """
+        extension = os.path.splitext(cached_file)[1]
+        fname = self.get_file_path(f"run_sql_results{extension}")
+        shutil.copyfile(cached_file, fname)
+        self.last_run_sql_results_file = fname
+        self.last_run_sql_row_count = (summary or {}).get("row_count")
+        return self.results_delivered_message(summary)
+
+    def should_copy_sql_results(self, sql: str, decision: GuardDecision = None) -> bool:
+        """
+        Use COPY for text formats when the planner expects a large result.
+        Parquet keeps typed columns, which COPY csv would lose, and streams
+        any size. npz is built in memory, so large results are copied as well.
+        """
+        if self.copy_row_threshold is None:
+            return False
+        if self.results_format not in ("json", "jsonl", "npz"):
+            return False
+        if not is_select(sql):
+            # COPY (...) only wraps queries
+            return False
+
+        if decision is not None and decision.explained:
+            # reuse the guard's plan instead of another EXPLAIN round trip
+            estimated_rows = decision.estimated_rows
+        else:
+            estimated_rows = self.db.estimate_rows(sql)
+        return estimated_rows is not None and estimated_rows > self.copy_row_threshold
+
+    def copy_sql_results(self, sql: str, statement_timeout_ms: int = None) -> dict:
+        """
+        Export query results to a csv file with COPY
+        """
+        fname = self.run_sql_copy_results_file
+        row_count = self.db.copy_sql_to_file(
+            sql, fname, fmt="csv", statement_timeout_ms=statement_timeout_ms
+        )
+        self.last_run_sql_results_file = fname
+        return {"row_count": row_count}
+
+    def stream_sql_results(
+        self,
+        sql: str,
+        statement_timeout_ms: int = None,
+        limiter: ResultLimiter = None,
+    ) -> dict:
+        """
+        Stream query results to a jsonl or columnar file
+        """
+        fname = self.run_sql_results_file
 
-        return "Successfully delivered results to json file"
+        with self.db.stream_sql(sql, statement_timeout_ms=statement_timeout_ms) as (
+            columns,
+            batches,
+        ):
+            if limiter is not None:
+                batches = limiter.limit(batches)
+            if self.results_format == "jsonl":
+                row_count = file.write_jsonl_file(
+                    fname, columns, batches, default=self.db.datetime_handler
+                )
+            else:
+                row_count = columnar.write_columnar_file(
+                    fname, columns, batches, fmt=self.results_format
+                )
+        self.last_run_sql_results_file = fname
+        return {"row_count": row_count, "columns": columns}
+
+    def fan_out_sql_results(
+        self,
+        sql: str,
+        statement_timeout_ms: int = None,
+        limiter: ResultLimiter = None,
+    ) -> dict:
+        """
+        Run a query on every tenant database concurrently into one results file
+        """
+        result = db_router.fan_out(
+            self.tenant_dbs,
+            sql,
+            statement_timeout_ms=statement_timeout_ms,
+            max_rows=self.max_rows,
+            max_bytes=self.max_bytes,
+        )
+        if not result.rows and len(result.errors) == len(self.tenant_dbs):
+            raise Exception(f"Query failed on every tenant database: {result.errors}")
+
+        batches = [result.rows]
+        if limiter is not None:
+            # per tenant caps were applied by fan_out, this caps the merged rows
+            batches = limiter.limit(batches)
+
+        fname = self.run_sql_results_file
+        if self.results_format == "jsonl":
+            row_count = file.write_jsonl_file(
+                fname, result.columns, batches, default=self.db.datetime_handler
+            )
+        elif self.results_format in ("parquet", "npz"):
+            row_count = columnar.write_columnar_file(
+                fname, result.columns, batches, fmt=self.results_format
+            )
+        else:
+            rows = [dict(zip(result.columns, row)) for rows in batches for row in rows]
+            with open(fname, "w") as f:
+                json.dump(rows, f, indent=4, default=self.db.datetime_handler)
+            row_count = len(rows)
+        self.last_run_sql_results_file = fname
+
+        summary = {"row_count": row_count, "databases": list(self.tenant_dbs)}
+        if result.errors:
+            summary["errors"] = result.errors
+        if result.truncated:
+            summary["truncated"] = True
+        return summary
 
     def validate_run_sql(self):
         """
         validate that the run_sql results file exists and has content
         """
-        fname = self.run_sql_results_file
-
-        with open(fname, "r") as f:
-            content = f.read()
+        fname = self.last_run_sql_results_file or self.run_sql_results_file
+
+        # only the first byte is needed, results files can be huge (and binary)
+        try:
+            with open(fname, "rb") as f:
+                content = f.read(1)
+        except FileNotFoundError:
+            return False, f"File {fname} does not exist"
+
+        if self.last_run_sql_row_count is not None:
+            # the writer counted the rows, a query may rightly return none
+            # and e.g. a jsonl file without rows is empty
+            return True, ""
 
         if not content:
             return False, f"File {fname} is empty"
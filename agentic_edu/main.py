@@ -1,3 +1,4 @@
+import hashlib
 import os
 from agentic_edu.agents.instruments import PostgresAgentInstruments
 from agentic_edu.modules.db import PostgresManager
@@ -6,6 +7,12 @@ from agentic_edu.modules import orchestrator
 from agentic_edu.modules import rand
 from agentic_edu.modules import file
 from agentic_edu.modules import embeddings
+from agentic_edu.modules.embedding_store import EmbeddingStore
+from agentic_edu.modules.llm_cache import ResponseCache
+from agentic_edu.modules.prompt_packer import PromptPacker, rank_tables
+from agentic_edu.modules.query_cache import QueryResultCache
+from agentic_edu.modules.query_guard import QueryGuard
+from agentic_edu.modules.usage import UsageLedger
 from agentic_edu.agents import agents
 import dotenv
 import argparse
@@ -31,6 +38,32 @@ OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
 
 POSTGRES_TABLE_DEFINITIONS_CAP_REF = "TABLE_DEFINITIONS"
 
+# Table embeddings persist across runs so only new or altered tables are embedded,
+# one directory per database as saving drops the rows of tables it doesn't have
+EMBEDDINGS_CACHE_DIR = os.path.join(
+    os.environ.get("EMBEDDINGS_CACHE_DIR", "./agent_cache/embeddings"),
+    hashlib.sha256(DB_URL.encode("utf-8")).hexdigest()[:16],
+)
+
+# run_sql results are reused across retries and sessions until the schema changes
+QUERY_CACHE_DIR = os.environ.get("QUERY_CACHE_DIR", "./agent_cache/query_results")
+
+# LLM replies are reused across sessions for identical requests
+LLM_CACHE_PATH = os.environ.get("LLM_CACHE_PATH", "./agent_cache/llm_responses.sqlite")
+
+# Tokens of table definitions added to each prompt
+TABLE_DEFINITIONS_TOKEN_BUDGET = int(
+    os.environ.get("TABLE_DEFINITIONS_TOKEN_BUDGET", "3000")
+)
+
+
+def print_usage(usage_ledger: UsageLedger):
+    for team, usage in usage_ledger.by("team").items():
+        print(
+            f"💰 {team}: ${usage.cost:.4f} for {usage.prompt_tokens} prompt + {usage.completion_tokens} completion tokens in {usage.calls} calls"
+        )
+    print(f"💰 Session total: ${usage_ledger.total.cost:.4f}")
+
 
 def main():
     # ---------------- Parse '--prompt' CLI Parameter ----------------
@@ -49,15 +82,28 @@ def main():
 
     session_id = rand.generate_session_id(raw_prompt)
 
+    os.makedirs(os.path.dirname(LLM_CACHE_PATH) or ".", exist_ok=True)
+    response_cache = ResponseCache(LLM_CACHE_PATH)
+
+    # billed tokens and cost of every LLM call in this session, per team
+    usage_ledger = UsageLedger({"session": session_id})
+
     # ---------------- Create Agent Instruments And Build Database Connection ----------------
 
-    with PostgresAgentInstruments(DB_URL, session_id) as (agent_instruments, db):
+    with PostgresAgentInstruments(
+        DB_URL,
+        session_id,
+        query_cache=QueryResultCache(QUERY_CACHE_DIR),
+        query_guard=QueryGuard(),
+    ) as (agent_instruments, db):
         # ----------- Gate Team: Prevent bad prompts from running and burning your $$$ -------------
 
         gate_orchestrator = agents.build_team_orchestrator(
             "scrum_master",
             agent_instruments,
             validate_results=lambda: (True, ""),
+            response_cache=response_cache,
+            usage_ledger=usage_ledger,
         )
 
         gate_orchestrator: ConversationResult = (
@@ -71,36 +117,58 @@ def main():
         match nlq_confidence:
             case (1 | 2):
                 print(f"❌ Gate Team Rejected - Confidence too low: {nlq_confidence}")
+                print_usage(usage_ledger)
                 return
             case (3 | 4 | 5):
                 print(f"✅ Gate Team Approved - Valid confidence: {nlq_confidence}")
             case _:
                 print("❌ Gate Team Rejected - Invalid response")
+                print_usage(usage_ledger)
                 return
 
         # -------- BUILD TABLE DEFINITIONS -----------
 
         map_table_name_to_table_def = db.get_table_definition_map_for_embeddings()
 
-        database_embedder = embeddings.DatabaseEmbedder()
+        database_embedder = embeddings.DatabaseEmbedder(
+            store=EmbeddingStore(EMBEDDINGS_CACHE_DIR)
+        )
 
-        for name, table_def in map_table_name_to_table_def.items():
-            database_embedder.add_table(name, table_def)
+        database_embedder.add_tables(map_table_name_to_table_def)
 
-        similar_tables = database_embedder.get_similar_tables(raw_prompt, n=5)
+        database_embedder.save()
 
-        table_definitions = database_embedder.get_table_definitions_from_names(
-            similar_tables
-        )
+        # similarity scores, tables named in the prompt count as exact matches
+        table_scores = dict(database_embedder.search(raw_prompt, n=5))
+        for table_name in database_embedder.get_similar_table_names_via_word_match(
+            raw_prompt
+        ):
+            table_scores[table_name] = 1.0
 
-        related_table_names = db.get_related_tables(similar_tables, n=3)
+        prompt_packer = PromptPacker(TABLE_DEFINITIONS_TOKEN_BUDGET)
 
-        core_and_related_table_definitions = (
-            database_embedder.get_table_definitions_from_names(
-                related_table_names + similar_tables
-            )
+        table_definitions = prompt_packer.pack(
+            rank_tables(table_scores, map_table_name_to_table_def, max_hops=0),
+            raw_prompt,
+        ).text
+
+        core_and_related_tables = prompt_packer.pack(
+            rank_tables(
+                table_scores,
+                map_table_name_to_table_def,
+                db.get_foreign_key_graph(),
+                max_hops=1,
+            ),
+            raw_prompt,
         )
 
+        if core_and_related_tables.omitted:
+            print(
+                f"📦 Tables left out to fit {TABLE_DEFINITIONS_TOKEN_BUDGET} tokens: {core_and_related_tables.omitted}"
+            )
+
+        core_and_related_table_definitions = core_and_related_tables.text
+
         prompt = llm.add_cap_ref(
             prompt,
             f"Use these {POSTGRES_TABLE_DEFINITIONS_CAP_REF} to satisfy the database query.",
@@ -150,6 +218,8 @@ def main():
             "data_insights",
             agent_instruments,
             validate_results=agent_instruments.validate_innovation_files,
+            response_cache=response_cache,
+            usage_ledger=usage_ledger,
         )
 
         data_insights_conversation_result: ConversationResult = (
@@ -173,6 +243,8 @@ def main():
                     f"❌ Orchestrator failed. Team: {data_insights_orchestrator.name} Failed"
                 )
 
+        print_usage(usage_ledger)
+
 
 if __name__ == "__main__":
     main()
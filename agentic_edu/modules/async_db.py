@@ -0,0 +1,225 @@
+"""
+Purpose:
+    asyncio counterpart of PostgresManager built on asyncpg.
+    Every call borrows a connection from an asyncpg pool, so one event loop
+    can serve many sessions' queries concurrently instead of blocking on each.
+"""
+
+import json
+from typing import Dict, List
+from agentic_edu.modules.db import (
+    GET_FOREIGN_KEYS_FINGERPRINT_STMT,
+    GET_FOREIGN_KEYS_STMT,
+    GET_TABLE_DEFINITIONS_FOR_TABLES_STMT,
+    GET_TABLE_DEFINITIONS_STMT,
+    GET_TABLE_FINGERPRINTS_STMT,
+    datetime_handler,
+    format_create_table,
+)
+from agentic_edu.modules.fk_graph import ForeignKeyGraph
+from agentic_edu.modules.schema_snapshot import SchemaSnapshot, schema_version
+
+MIN_POOL_SIZE = 1
+MAX_POOL_SIZE = 10
+
+# asyncpg uses numbered placeholders instead of psycopg2's %s
+ASYNC_GET_TABLE_DEFINITIONS_FOR_TABLES_STMT = (
+    GET_TABLE_DEFINITIONS_FOR_TABLES_STMT.replace("ANY(%s)", "ANY($1::text[])")
+)
+
+GET_ALL_TABLE_NAMES_STMT = (
+    "SELECT tablename FROM pg_tables WHERE schemaname = 'public';"
+)
+
+
+def load_asyncpg():
+    """
+    asyncpg is only needed by the async layer, import it on first use
+    """
+    try:
+        import asyncpg
+    except ImportError as e:
+        raise ImportError(
+            "asyncpg is required for AsyncPostgresManager, install it with 'pip install asyncpg'"
+        ) from e
+    return asyncpg
+
+
+class AsyncPostgresManager:
+    """
+    Async version of PostgresManager with the same query surface.
+
+    Usage:
+        async with AsyncPostgresManager() as db:
+            await db.connect_with_url(url)
+            await db.run_sql("SELECT 1")
+    """
+
+    def __init__(self, snapshot: SchemaSnapshot = None):
+        self.pool = None
+        # pools created by connect_with_url are closed with the manager,
+        # pools passed to connect_with_pool belong to the caller
+        self.owns_pool = False
+
+        # Optional local copy of the schema - only changed tables are re-read
+        self.snapshot = snapshot
+
+        # Foreign key graph, loaded once on first use
+        self.fk_graph = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def connect_with_url(
+        self, url, min_size: int = MIN_POOL_SIZE, max_size: int = MAX_POOL_SIZE
+    ):
+        asyncpg = load_asyncpg()
+        self.pool = await asyncpg.create_pool(url, min_size=min_size, max_size=max_size)
+        self.owns_pool = True
+
+    def connect_with_pool(self, pool):
+        self.pool = pool
+        self.owns_pool = False
+
+    async def close(self):
+        if self.pool is not None and self.owns_pool:
+            await self.pool.close()
+
+    async def fetch(self, sql, *args, statement_timeout_ms: int = None):
+        """
+        Run a query on a pooled connection and return its records
+        """
+        async with self.pool.acquire() as conn:
+            if statement_timeout_ms is None:
+                return await conn.fetch(sql, *args)
+
+            # SET LOCAL - the timeout ends with the transaction
+            async with conn.transaction():
+                await conn.execute(
+                    "SELECT set_config('statement_timeout', $1, true)",
+                    str(int(statement_timeout_ms)),
+                )
+                return await conn.fetch(sql, *args)
+
+    async def run_sql(self, sql, statement_timeout_ms: int = None) -> str:
+        """
+        Run a SQL query against the postgres database
+        """
+        records = await self.fetch(sql, statement_timeout_ms=statement_timeout_ms)
+
+        list_of_dicts = [dict(record) for record in records]
+
+        return json.dumps(list_of_dicts, indent=4, default=datetime_handler)
+
+    async def get_table_definition(self, table_name):
+        """
+        Generate the 'create' definition for a table
+        """
+        definitions = await self.fetch_table_definitions([table_name])
+        if table_name not in definitions:
+            return format_create_table(table_name, "")
+        return definitions[table_name][1]
+
+    async def get_all_table_names(self):
+        """
+        Get all table names in the database
+        """
+        records = await self.fetch(GET_ALL_TABLE_NAMES_STMT)
+        return [record[0] for record in records]
+
+    async def get_table_definition_map(self) -> Dict[str, str]:
+        """
+        Generate the 'create' definition for every table.
+        With a snapshot only new or altered tables are read from the catalog.
+        """
+        if self.snapshot is None:
+            tables = await self.fetch_table_definitions()
+            return {name: definition for name, (_, definition) in tables.items()}
+
+        await self.refresh_snapshot()
+        return self.snapshot.definitions
+
+    async def get_table_definitions_for_prompt(self):
+        """
+        Get all table 'create' definitions in the database
+        """
+        return "\n\n".join((await self.get_table_definition_map()).values())
+
+    async def fetch_table_definitions(self, table_names: List[str] = None):
+        """
+        Read (fingerprint, 'create' definition) for all tables, or only the
+        given tables, in a single catalog query
+        """
+        if table_names is None:
+            records = await self.fetch(GET_TABLE_DEFINITIONS_STMT)
+        else:
+            records = await self.fetch(
+                ASYNC_GET_TABLE_DEFINITIONS_FOR_TABLES_STMT, list(table_names)
+            )
+
+        return {
+            table_name: (fingerprint, format_create_table(table_name, columns))
+            for table_name, columns, fingerprint in records
+        }
+
+    async def get_table_fingerprints(self) -> Dict[str, str]:
+        """
+        Map of table name to a fingerprint of its columns
+        """
+        records = await self.fetch(GET_TABLE_FINGERPRINTS_STMT)
+        return {table_name: fingerprint for table_name, fingerprint in records}
+
+    async def get_schema_version(self) -> str:
+        return schema_version(await self.get_table_fingerprints())
+
+    async def refresh_snapshot(self):
+        """
+        Bring the snapshot up to date, re-reading only changed tables
+        """
+        changed, removed = self.snapshot.diff(await self.get_table_fingerprints())
+
+        if not changed and not removed:
+            return
+
+        tables = await self.fetch_table_definitions(changed) if changed else {}
+        self.snapshot.update(tables, removed)
+        self.snapshot.save()
+
+    async def get_foreign_key_graph(self) -> ForeignKeyGraph:
+        """
+        Load every foreign key in the schema once and keep it in memory.
+        With a snapshot the edges are only re-read when their fingerprint changes.
+        """
+        if self.fk_graph is not None:
+            return self.fk_graph
+
+        if self.snapshot is None:
+            edges = [
+                tuple(record) for record in await self.fetch(GET_FOREIGN_KEYS_STMT)
+            ]
+        else:
+            records = await self.fetch(GET_FOREIGN_KEYS_FINGERPRINT_STMT)
+            fingerprint = records[0][0]
+
+            if fingerprint != self.snapshot.foreign_keys_fingerprint:
+                records = await self.fetch(GET_FOREIGN_KEYS_STMT)
+                self.snapshot.update_foreign_keys(
+                    fingerprint, [tuple(record) for record in records]
+                )
+                self.snapshot.save()
+
+            edges = self.snapshot.foreign_keys
+
+        self.fk_graph = ForeignKeyGraph(edges)
+        return self.fk_graph
+
+    async def get_related_tables(self, table_list, n=2, max_hops=1):
+        """
+        Get tables linked to the given tables by foreign keys, in either direction.
+        See PostgresManager.get_related_tables.
+        """
+        graph = await self.get_foreign_key_graph()
+        return graph.related_tables(table_list, n, max_hops)
@@ -0,0 +1,247 @@
+"""
+Purpose:
+    Columnar files for query results.
+    Parquet when pyarrow is installed, otherwise a compressed NumPy .npz
+    with one array per column. Both keep dates, timestamps and decimals
+    typed instead of turning them into strings.
+
+    Parquet is written batch by batch; .npz is built in memory, so large
+    results should go to parquet or COPY instead.
+"""
+
+from datetime import date, datetime, timezone
+from decimal import Decimal
+import json
+from typing import Dict, Iterable, List, Tuple
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+# key of the json metadata entry in an .npz results file
+NPZ_META_KEY = "__meta__"
+
+# parquet decimals are written with the widest decimal128 precision
+DECIMAL_PRECISION = 38
+
+
+def columnar_format() -> str:
+    """
+    The best columnar format available in this environment
+    """
+    return "parquet" if pa is not None else "npz"
+
+
+def write_columnar_file(
+    fname, columns: List[str], batches: Iterable[list], fmt: str = None
+) -> int:
+    """
+    Write rows as a columnar file in 'fmt' ("parquet" or "npz").
+    Returns the number of rows written.
+    """
+    fmt = fmt or columnar_format()
+    if fmt == "parquet":
+        return write_parquet_file(fname, columns, batches)
+    if fmt == "npz":
+        return write_npz_file(fname, columns, batches)
+    raise ValueError(f"Unsupported columnar format '{fmt}'")
+
+
+def widen_decimals(schema):
+    """
+    'schema' with decimal fields at DECIMAL_PRECISION digits.
+
+    The type pyarrow infers only fits the values of one batch, an
+    unconstrained numeric (SUM, AVG) can outgrow it in the next one.
+    """
+    return pa.schema(
+        [
+            field.with_type(pa.decimal128(DECIMAL_PRECISION, field.type.scale))
+            if pa.types.is_decimal128(field.type)
+            else field
+            for field in schema
+        ]
+    )
+
+
+def open_parquet_writer(fname, schema, tables: list):
+    writer = pq.ParquetWriter(fname, schema, compression="zstd")
+    for table in tables:
+        writer.write_table(table.cast(schema))
+    return writer
+
+
+def write_parquet_file(fname, columns: List[str], batches: Iterable[list]) -> int:
+    """
+    Write each batch as its own row group, so rows are never all in memory.
+
+    The file schema is fixed once every column has had a non NULL value:
+    until then batches are held back, so a column that is NULL in the first
+    batch is not typed null and later values still fit. Decimals keep the
+    scale of their first values but get the full 38 digits of precision.
+    """
+    if pa is None:
+        raise ImportError("pyarrow is required to write parquet files")
+
+    writer = None
+    schema = None
+    # batches read while some column has only been NULL so far
+    pending = []
+    row_count = 0
+    try:
+        for rows in batches:
+            data = {name: list(values) for name, values in zip(columns, zip(*rows))}
+            if writer is not None:
+                writer.write_table(pa.Table.from_pydict(data, schema=schema))
+            else:
+                table = pa.Table.from_pydict(data)
+                pending.append(table.cast(widen_decimals(table.schema)))
+                # null typed fields take the type of the same field in other batches
+                schema = pa.unify_schemas([table.schema for table in pending])
+                if not any(pa.types.is_null(field.type) for field in schema):
+                    writer = open_parquet_writer(fname, schema, pending)
+                    pending = []
+            row_count += len(rows)
+
+        if pending:
+            # columns that are NULL in every row stay null typed
+            writer = open_parquet_writer(fname, schema, pending)
+
+        if writer is None:
+            # no rows, still write a readable file with the column names
+            empty = pa.table({name: pa.array([], pa.null()) for name in columns})
+            pq.write_table(empty, fname)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    return row_count
+
+
+# -------------------------- npz encoding -------------------------- #
+
+
+def encode_column(values: list) -> Tuple[str, np.ndarray, np.ndarray]:
+    """
+    Encode one column of python values as (type, values array, null mask)
+    """
+    nulls = np.array([value is None for value in values], dtype=bool)
+    present = [value for value in values if value is not None]
+    kind = infer_kind(present)
+
+    if kind == "bool":
+        return kind, np.array([bool(v) for v in values], dtype=bool), nulls
+    if kind == "int":
+        return kind, np.array([v or 0 for v in values], dtype=np.int64), nulls
+    if kind == "float":
+        array = np.array([np.nan if v is None else v for v in values], np.float64)
+        return kind, array, nulls
+    if kind == "timestamp":
+        array = np.array(
+            [to_naive_utc(v) if v is not None else None for v in values],
+            dtype="datetime64[us]",
+        )
+        return kind, array, nulls
+    if kind == "date":
+        return kind, np.array(values, dtype="datetime64[D]"), nulls
+    if kind == "decimal":
+        # exact digits, not a float approximation
+        return kind, np.array(["" if v is None else str(v) for v in values]), nulls
+    if kind == "json":
+        array = np.array(["" if v is None else json.dumps(v) for v in values])
+        return kind, array, nulls
+    return kind, np.array(["" if v is None else str(v) for v in values]), nulls
+
+
+def infer_kind(values: list) -> str:
+    types = {type(value) for value in values}
+    if not types:
+        return "str"
+    if types == {bool}:
+        return "bool"
+    if types == {int}:
+        return "int"
+    if types <= {int, float}:
+        return "float"
+    if types == {datetime}:
+        return "timestamp"
+    if types == {date}:
+        return "date"
+    if types <= {Decimal, int}:
+        return "decimal"
+    if types <= {dict, list}:
+        return "json"
+    return "str"
+
+
+def to_naive_utc(value: datetime) -> datetime:
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def decode_column(kind: str, array: np.ndarray, nulls: np.ndarray, tz) -> list:
+    if kind == "timestamp":
+        # NaT decodes to None
+        values = [
+            value.replace(tzinfo=timezone.utc) if tz and value is not None else value
+            for value in array.astype(object)
+        ]
+    elif kind == "date":
+        values = list(array.astype(object))
+    elif kind == "decimal":
+        values = [Decimal(value) if value else None for value in array]
+    elif kind == "json":
+        values = [json.loads(value) if value else None for value in array]
+    else:
+        values = array.tolist()
+    return [None if null else value for value, null in zip(values, nulls)]
+
+
+def write_npz_file(fname, columns: List[str], batches: Iterable[list]) -> int:
+    """
+    Write rows as a compressed .npz with one typed array and null mask per column.
+
+    Every row is held in memory until the file is written, unlike parquet.
+    """
+    column_values = [[] for _ in columns]
+    for rows in batches:
+        for values, column in zip(column_values, zip(*rows)):
+            values.extend(column)
+
+    arrays = {}
+    meta = {"columns": []}
+    for i, (name, values) in enumerate(zip(columns, column_values)):
+        kind, array, nulls = encode_column(values)
+        arrays[f"c{i}"] = array
+        arrays[f"c{i}_null"] = nulls
+        has_tz = kind == "timestamp" and any(
+            value is not None and value.tzinfo is not None for value in values
+        )
+        meta["columns"].append({"name": name, "type": kind, "tz": has_tz})
+    row_count = len(column_values[0]) if column_values else 0
+    meta["row_count"] = row_count
+    arrays[NPZ_META_KEY] = np.array(json.dumps(meta))
+
+    with open(fname, "wb") as f:
+        np.savez_compressed(f, **arrays)
+
+    return row_count
+
+
+def read_npz_file(fname) -> Dict[str, list]:
+    """
+    Read an .npz results file back into {column: values} with python types restored
+    """
+    with np.load(fname, allow_pickle=False) as data:
+        meta = json.loads(str(data[NPZ_META_KEY]))
+        return {
+            column["name"]: decode_column(
+                column["type"], data[f"c{i}"], data[f"c{i}_null"], column["tz"]
+            )
+            for i, column in enumerate(meta["columns"])
+        }
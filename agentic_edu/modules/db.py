@@ -1,7 +1,273 @@
+from contextlib import contextmanager
 from datetime import datetime
 import json
+import re
+import threading
+from typing import Dict, Iterable, Iterator, List, Tuple
+import uuid
 import psycopg2
 from psycopg2.sql import SQL, Identifier
+from agentic_edu.modules.db_pool import ConnectionPool
+from agentic_edu.modules.fk_graph import ForeignKeyGraph
+from agentic_edu.modules.schema_snapshot import SchemaSnapshot, schema_version
+
+# Rows pulled per round trip when streaming results from a server-side cursor
+STREAM_BATCH_SIZE = 2000
+
+# Results estimated above this many rows are exported with COPY instead of fetched
+COPY_ROW_THRESHOLD = 100_000
+
+# words that make a query write or lock rows: data-modifying CTEs, SELECT ...
+# INTO and FOR UPDATE, and the sequence functions
+WRITE_WORDS = {"insert", "update", "delete", "merge", "into", "nextval", "setval"}
+
+# opening tag of a dollar quoted string, e.g. $$ or $body$
+DOLLAR_QUOTE_PATTERN = re.compile(r"\$([A-Za-z_][A-Za-z_0-9]*)?\$")
+
+COPY_OPTIONS = {
+    "csv": "FORMAT csv, HEADER",
+    "binary": "FORMAT binary",
+}
+
+# Column list of a table joined server-side, and the catalog rows it is built from
+TABLE_COLUMNS_SQL = """string_agg(
+        pg_attribute.attname || ' ' || format_type(atttypid, atttypmod),
+        E',\n' ORDER BY pg_attribute.attnum
+    )"""
+
+TABLE_COLUMNS_FROM_SQL = """FROM pg_class
+JOIN pg_namespace ON pg_namespace.oid = pg_class.relnamespace
+JOIN pg_attribute ON pg_attribute.attrelid = pg_class.oid
+WHERE pg_attribute.attnum > 0
+    AND NOT pg_attribute.attisdropped
+    AND pg_class.relkind IN ('r', 'p')
+    AND pg_namespace.nspname = 'public'"""
+
+# One row per table with its column list and a fingerprint of it,
+# so the whole schema comes back in a single round trip
+GET_TABLE_DEFINITIONS_STMT = f"""
+SELECT pg_class.relname AS tablename,
+    {TABLE_COLUMNS_SQL} AS columns,
+    md5({TABLE_COLUMNS_SQL}) AS fingerprint
+{TABLE_COLUMNS_FROM_SQL}
+GROUP BY pg_class.relname
+ORDER BY pg_class.relname;
+"""
+
+GET_TABLE_DEFINITIONS_FOR_TABLES_STMT = f"""
+SELECT pg_class.relname AS tablename,
+    {TABLE_COLUMNS_SQL} AS columns,
+    md5({TABLE_COLUMNS_SQL}) AS fingerprint
+{TABLE_COLUMNS_FROM_SQL}
+    AND pg_class.relname = ANY(%s)
+GROUP BY pg_class.relname
+ORDER BY pg_class.relname;
+"""
+
+# Only 32 characters per table cross the wire, cheap enough to run every prompt
+GET_TABLE_FINGERPRINTS_STMT = f"""
+SELECT pg_class.relname AS tablename,
+    md5({TABLE_COLUMNS_SQL}) AS fingerprint
+{TABLE_COLUMNS_FROM_SQL}
+GROUP BY pg_class.relname;
+"""
+
+# Every foreign key in the schema as (referencing table, referenced table)
+FOREIGN_KEYS_FROM_SQL = """FROM pg_constraint con
+JOIN pg_class src ON src.oid = con.conrelid
+JOIN pg_namespace src_ns ON src_ns.oid = src.relnamespace
+JOIN pg_class dst ON dst.oid = con.confrelid
+JOIN pg_namespace dst_ns ON dst_ns.oid = dst.relnamespace
+WHERE con.contype = 'f'
+    AND src_ns.nspname = 'public'
+    AND dst_ns.nspname = 'public'"""
+
+GET_FOREIGN_KEYS_STMT = f"""
+SELECT src.relname, dst.relname
+{FOREIGN_KEYS_FROM_SQL}
+ORDER BY src.relname, dst.relname, con.conname;
+"""
+
+GET_FOREIGN_KEYS_FINGERPRINT_STMT = f"""
+SELECT md5(coalesce(string_agg(
+    src.relname || '>' || dst.relname || ':' || con.conname,
+    ',' ORDER BY src.relname, dst.relname, con.conname
+), ''))
+{FOREIGN_KEYS_FROM_SQL};
+"""
+
+
+def scan_sql(sql: str) -> Iterator[Tuple[str, str]]:
+    """
+    Split 'sql' into (kind, text) pieces: "quoted" for string literals,
+    quoted identifiers and dollar quoted strings, "comment", ";" and "code"
+    for every other character
+    """
+    i = 0
+    n = len(sql)
+
+    while i < n:
+        char = sql[i]
+        dollar_quote = DOLLAR_QUOTE_PATTERN.match(sql, i) if char == "$" else None
+
+        if char in "'\"":
+            # '' / "" escape a quote, E'...' strings also take backslash escapes
+            backslash_escapes = char == "'" and is_escape_string_prefix(sql, i)
+            end = i + 1
+            while end < n:
+                if backslash_escapes and sql[end] == "\\":
+                    end += 2
+                    continue
+                if sql[end] == char:
+                    if end + 1 < n and sql[end + 1] == char:
+                        end += 2
+                        continue
+                    break
+                end += 1
+            yield "quoted", sql[i : end + 1]
+            i = end + 1
+        elif dollar_quote is not None:
+            tag = dollar_quote.group(0)
+            end = sql.find(tag, dollar_quote.end())
+            end = n if end == -1 else end + len(tag)
+            yield "quoted", sql[i:end]
+            i = end
+        elif sql.startswith("--", i):
+            end = sql.find("\n", i)
+            end = n if end == -1 else end
+            yield "comment", sql[i:end]
+            i = end
+        elif sql.startswith("/*", i):
+            end = sql.find("*/", i + 2)
+            end = n if end == -1 else end + 2
+            yield "comment", sql[i:end]
+            i = end
+        elif char == ";":
+            yield ";", char
+            i += 1
+        else:
+            yield "code", char
+            i += 1
+
+
+def is_escape_string_prefix(sql: str, quote: int) -> bool:
+    """
+    Whether the quote at index 'quote' opens an E'...' string
+    """
+    if quote == 0 or sql[quote - 1] not in "eE":
+        return False
+    # the E of a longer word (e.g. "where'x'") is not a prefix
+    return quote == 1 or not (sql[quote - 2].isalnum() or sql[quote - 2] in "_$")
+
+
+def split_sql(sql: str) -> List[str]:
+    """
+    The statements in 'sql' with comments removed. Semicolons in string
+    literals, quoted identifiers and dollar quoted strings don't split.
+    """
+    statements = []
+    current = []
+
+    for kind, text in scan_sql(sql):
+        if kind == "comment":
+            current.append(" ")
+        elif kind == ";":
+            statements.append("".join(current))
+            current = []
+        else:
+            current.append(text)
+
+    statements.append("".join(current))
+    return [statement.strip() for statement in statements if statement.strip()]
+
+
+def is_select(sql: str) -> bool:
+    """
+    Whether 'sql' is a single statement that returns rows and can run on a
+    server-side cursor
+    """
+    statements = split_sql(sql)
+    if len(statements) != 1:
+        return False
+    first_word = statements[0].split(None, 1)[0].lower()
+    return first_word in ("select", "with", "values", "table")
+
+
+def is_read_only(sql: str) -> bool:
+    """
+    Whether 'sql' is a single query that neither writes nor locks rows, so a
+    read replica can run it. Errs on the side of False.
+    """
+    if not is_select(sql):
+        return False
+
+    # words outside literals and comments
+    code = "".join(text if kind == "code" else " " for kind, text in scan_sql(sql))
+    words = re.findall(r"[a-z_][a-z_0-9$]*", code.lower())
+    if WRITE_WORDS.intersection(words):
+        return False
+    # FOR SHARE / FOR KEY SHARE, FOR [NO KEY] UPDATE is caught above
+    return not any(
+        word == "for" and next_word in ("share", "key")
+        for word, next_word in zip(words, words[1:])
+    )
+
+
+def datetime_handler(obj):
+    """
+    Handle datetime objects when serializing to JSON.
+    """
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    return str(obj)  # or just return the object unchanged, or another default value
+
+
+def format_create_table(table_name: str, columns: str) -> str:
+    """
+    Build the 'create' definition for a table from its joined column list
+    """
+    return f"CREATE TABLE {table_name} (\n{columns}\n);"
+
+
+class ResultLimiter:
+    """
+    Client-side cap on the rows and bytes taken from a result.
+
+    Wraps a stream of row batches and stops once 'max_rows' rows or roughly
+    'max_bytes' bytes (the length of each value's text form) were taken,
+    which closes the server-side cursor instead of fetching the rest.
+    'truncated' tells the caller whether rows were dropped.
+    """
+
+    def __init__(self, max_rows: int = None, max_bytes: int = None):
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.row_count = 0
+        self.byte_count = 0
+        self.truncated = False
+
+    def limit(self, batches: Iterable[list]) -> Iterator[list]:
+        for rows in batches:
+            if self.max_rows is not None and self.row_count + len(rows) > self.max_rows:
+                rows = rows[: self.max_rows - self.row_count]
+                self.truncated = True
+
+            if self.max_bytes is not None:
+                kept = []
+                for row in rows:
+                    size = sum(len(str(value)) for value in row)
+                    if self.byte_count + size > self.max_bytes:
+                        self.truncated = True
+                        break
+                    self.byte_count += size
+                    kept.append(row)
+                rows = kept
+
+            self.row_count += len(rows)
+            if rows:
+                yield rows
+            if self.truncated:
+                return
 
 
 class PostgresManager:
@@ -9,36 +275,230 @@ class PostgresManager:
     A class to manage postgres connections and queries
     """
 
-    def __init__(self):
+    def __init__(self, snapshot: SchemaSnapshot = None):
         self.conn = None
-        self.cur = None
+
+        # In pooled mode every call borrows a connection from the pool
+        self.pool = None
+
+        # Optional local copy of the schema - only changed tables are re-read
+        self.snapshot = snapshot
+
+        # Foreign key graph, loaded once on first use
+        self.fk_graph = None
+
+        # connections with a call in flight, so cancel() can interrupt them
+        self.active_connections = []
+        self.active_connections_lock = threading.Lock()
 
     def __enter__(self):
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        if self.cur:
-            self.cur.close()
-        if self.conn:
-            self.conn.close()
+        self.close()
 
     def connect_with_url(self, url):
         self.conn = psycopg2.connect(url)
-        self.cur = self.conn.cursor()
+
+    def connect_with_pool(self, pool: ConnectionPool):
+        self.pool = pool
 
     def close(self):
-        if self.cur:
-            self.cur.close()
+        # pooled connections belong to the pool and stay open
         if self.conn:
             self.conn.close()
 
-    def run_sql(self, sql) -> str:
+    @contextmanager
+    def connection(self, statement_timeout_ms: int = None, sql: str = None):
         """
-        Run a SQL query against the postgres database
+        The connection to run a call on - borrowed from the pool in pooled mode.
+        With 'statement_timeout_ms' Postgres cancels statements that run longer.
+        'sql' is the agent query about to run, a ReplicaRouter sends read-only
+        ones to replicas and everything else (e.g. catalog reads) to the primary.
         """
-        self.cur.execute(sql)
-        columns = [desc[0] for desc in self.cur.description]
-        res = self.cur.fetchall()
+        if self.pool is None:
+            with self.track(self.conn):
+                with self.statement_timeout(self.conn, statement_timeout_ms):
+                    yield self.conn
+        else:
+            with self.pool.connection(sql) as conn:
+                with self.track(conn):
+                    with self.statement_timeout(conn, statement_timeout_ms):
+                        yield conn
+
+    @contextmanager
+    def track(self, conn):
+        with self.active_connections_lock:
+            self.active_connections.append(conn)
+        try:
+            yield
+        finally:
+            with self.active_connections_lock:
+                self.active_connections.remove(conn)
+
+    def cancel(self):
+        """
+        Cancel every statement this manager has in flight.
+        Safe to call from another thread; the cancelled calls raise QueryCanceledError.
+        """
+        with self.active_connections_lock:
+            connections = list(dict.fromkeys(self.active_connections))
+
+        for conn in connections:
+            try:
+                conn.cancel()
+            except psycopg2.Error:
+                # the statement finished or the connection is gone
+                pass
+
+    @contextmanager
+    def statement_timeout(self, conn, statement_timeout_ms: int = None):
+        """
+        Scope a statement_timeout to one transaction (SET LOCAL)
+        """
+        if statement_timeout_ms is None:
+            yield
+            return
+
+        cur = conn.cursor()
+        try:
+            cur.execute(
+                "SELECT set_config('statement_timeout', %s, true)",
+                (str(int(statement_timeout_ms)),),
+            )
+        finally:
+            cur.close()
+
+        try:
+            yield
+        finally:
+            # ending the transaction drops the timeout with it
+            conn.rollback()
+
+    @contextmanager
+    def cursor(self, statement_timeout_ms: int = None, sql: str = None):
+        """
+        A fresh cursor per call so concurrent agent functions never share one
+        """
+        with self.connection(statement_timeout_ms, sql) as conn:
+            cur = conn.cursor()
+            try:
+                yield cur
+            finally:
+                cur.close()
+
+    @contextmanager
+    def stream_sql(
+        self,
+        sql,
+        batch_size: int = STREAM_BATCH_SIZE,
+        statement_timeout_ms: int = None,
+    ):
+        """
+        Run a SQL query on a server-side (named) cursor.
+
+        Yields (columns, batches) where batches lazily fetches lists of at most
+        'batch_size' rows, so memory stays bounded no matter how big the result is.
+        """
+        with self.connection(statement_timeout_ms, sql) as conn:
+            cur = conn.cursor(name=f"agent_stream_{uuid.uuid4().hex}")
+            cur.itersize = batch_size
+            try:
+                cur.execute(sql)
+                # a named cursor only has a description after the first fetch
+                first_batch = cur.fetchmany(batch_size)
+                columns = [desc[0] for desc in cur.description]
+                yield columns, self.iter_batches(cur, first_batch, batch_size)
+            finally:
+                cur.close()
+
+    def iter_batches(self, cur, first_batch: list, batch_size: int) -> Iterator[list]:
+        rows = first_batch
+        while rows:
+            yield rows
+            rows = cur.fetchmany(batch_size)
+
+    def explain(self, sql):
+        """
+        The planner's estimate for a query, without running it.
+        Returns the top plan node of EXPLAIN (FORMAT JSON), or None if the
+        statement cannot be explained (e.g. it is not a query).
+        """
+        statements = split_sql(sql)
+        if len(statements) != 1:
+            # EXPLAIN only covers the first statement, the rest would run
+            return None
+
+        with self.connection(sql=sql) as conn:
+            cur = conn.cursor()
+            try:
+                cur.execute("EXPLAIN (FORMAT JSON) " + statements[0])
+                plan = cur.fetchone()[0]
+            except psycopg2.Error:
+                # leave the connection usable after the failed statement
+                conn.rollback()
+                return None
+            finally:
+                cur.close()
+
+        # psycopg2 parses json columns, but some drivers hand back text
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return plan[0]["Plan"]
+
+    def estimate_rows(self, sql):
+        """
+        Planner row estimate for a query, None if it cannot be explained
+        """
+        plan = self.explain(sql)
+        if plan is None:
+            return None
+        return int(plan["Plan Rows"])
+
+    def copy_sql_to_file(
+        self, sql, fname, fmt: str = "csv", statement_timeout_ms: int = None
+    ) -> int:
+        """
+        Export a query with COPY ... TO STDOUT straight into a file.
+
+        Postgres streams the encoded rows and psycopg2 writes them to the file
+        as they arrive, with no per-row python objects. Returns the row count.
+        """
+        if fmt not in COPY_OPTIONS:
+            raise ValueError(
+                f"Unsupported COPY format '{fmt}', expected one of {list(COPY_OPTIONS)}"
+            )
+        if not is_select(sql):
+            raise ValueError("COPY can only export a single query")
+
+        # without comments, a trailing '--' would swallow the closing paren
+        query = split_sql(sql)[0]
+        copy_sql = f"COPY ({query}) TO STDOUT WITH ({COPY_OPTIONS[fmt]})"
+        mode = "wb" if fmt == "binary" else "w"
+
+        with self.cursor(statement_timeout_ms, sql) as cur, open(fname, mode) as f:
+            cur.copy_expert(copy_sql, f)
+            return cur.rowcount
+
+    def run_sql(
+        self, sql, statement_timeout_ms: int = None, limiter: ResultLimiter = None
+    ) -> str:
+        """
+        Run a SQL query against the postgres database.
+        With a 'limiter', queries are fetched in batches from a server-side
+        cursor and stop at the limiter's caps.
+        """
+        if limiter is not None and is_select(sql):
+            with self.stream_sql(sql, statement_timeout_ms=statement_timeout_ms) as (
+                columns,
+                batches,
+            ):
+                res = [row for rows in limiter.limit(batches) for row in rows]
+        else:
+            with self.cursor(statement_timeout_ms, sql) as cur:
+                cur.execute(sql)
+                columns = [desc[0] for desc in cur.description]
+                res = cur.fetchall()
 
         list_of_dicts = [dict(zip(columns, row)) for row in res]
 
@@ -50,9 +510,7 @@ class PostgresManager:
         """
         Handle datetime objects when serializing to JSON.
         """
-        if isinstance(obj, datetime):
-            return obj.isoformat()
-        return str(obj)  # or just return the object unchanged, or another default value
+        return datetime_handler(obj)
 
     def get_table_definition(self, table_name):
         """
@@ -71,13 +529,67 @@ class PostgresManager:
             AND pg_class.relname = %s
             AND pg_namespace.nspname = 'public'  -- Assuming you're interested in public schema
         """
-        self.cur.execute(get_def_stmt, (table_name,))
-        rows = self.cur.fetchall()
-        create_table_stmt = "CREATE TABLE {} (\n".format(table_name)
-        for row in rows:
-            create_table_stmt += "{} {},\n".format(row[2], row[3])
-        create_table_stmt = create_table_stmt.rstrip(",\n") + "\n);"
-        return create_table_stmt
+        with self.cursor() as cur:
+            cur.execute(get_def_stmt, (table_name,))
+            rows = cur.fetchall()
+        columns = ",\n".join("{} {}".format(row[2], row[3]) for row in rows)
+        return format_create_table(table_name, columns)
+
+    def get_table_definition_map(self) -> Dict[str, str]:
+        """
+        Generate the 'create' definition for every table.
+        With a snapshot only new or altered tables are read from the catalog.
+        """
+        if self.snapshot is None:
+            tables = self.fetch_table_definitions()
+            return {name: definition for name, (_, definition) in tables.items()}
+
+        self.refresh_snapshot()
+        return self.snapshot.definitions
+
+    def fetch_table_definitions(self, table_names: List[str] = None):
+        """
+        Read (fingerprint, 'create' definition) for all tables, or only the
+        given tables, in a single catalog query
+        """
+        with self.cursor() as cur:
+            if table_names is None:
+                cur.execute(GET_TABLE_DEFINITIONS_STMT)
+            else:
+                cur.execute(GET_TABLE_DEFINITIONS_FOR_TABLES_STMT, (table_names,))
+            rows = cur.fetchall()
+
+        return {
+            table_name: (fingerprint, format_create_table(table_name, columns))
+            for table_name, columns, fingerprint in rows
+        }
+
+    def get_table_fingerprints(self) -> Dict[str, str]:
+        """
+        Map of table name to a fingerprint of its columns
+        """
+        with self.cursor() as cur:
+            cur.execute(GET_TABLE_FINGERPRINTS_STMT)
+            return dict(cur.fetchall())
+
+    def get_schema_version(self) -> str:
+        """
+        Fingerprint of the current schema, changes whenever any table's columns do
+        """
+        return schema_version(self.get_table_fingerprints())
+
+    def refresh_snapshot(self):
+        """
+        Bring the snapshot up to date, re-reading only changed tables
+        """
+        changed, removed = self.snapshot.diff(self.get_table_fingerprints())
+
+        if not changed and not removed:
+            return
+
+        tables = self.fetch_table_definitions(changed) if changed else {}
+        self.snapshot.update(tables, removed)
+        self.snapshot.save()
 
     def get_all_table_names(self):
         """
@@ -86,78 +598,54 @@ class PostgresManager:
         get_all_tables_stmt = (
             "SELECT tablename FROM pg_tables WHERE schemaname = 'public';"
         )
-        self.cur.execute(get_all_tables_stmt)
-        return [row[0] for row in self.cur.fetchall()]
+        with self.cursor() as cur:
+            cur.execute(get_all_tables_stmt)
+            return [row[0] for row in cur.fetchall()]
 
     def get_table_definitions_for_prompt(self):
         """
         Get all table 'create' definitions in the database
         """
-        table_names = self.get_all_table_names()
-        definitions = []
-        for table_name in table_names:
-            definitions.append(self.get_table_definition(table_name))
-        return "\n\n".join(definitions)
+        return "\n\n".join(self.get_table_definition_map().values())
 
     def get_table_definition_map_for_embeddings(self):
         """
         Creates a map of table names to table definitions
         """
-        table_names = self.get_all_table_names()
-        definitions = {}
-        for table_name in table_names:
-            definitions[table_name] = self.get_table_definition(table_name)
-        return definitions
-
-    def get_related_tables(self, table_list, n=2):
-        """
-        Get tables that have foreign keys referencing the given table
-        """
-
-        related_tables_dict = {}
-
-        for table in table_list:
-            # Query to fetch tables that have foreign keys referencing the given table
-            self.cur.execute(
-                """
-                SELECT 
-                    a.relname AS table_name
-                FROM 
-                    pg_constraint con 
-                    JOIN pg_class a ON a.oid = con.conrelid 
-                WHERE 
-                    confrelid = (SELECT oid FROM pg_class WHERE relname = %s)
-                LIMIT %s;
-                """,
-                (table, n),
-            )
+        return self.get_table_definition_map()
 
-            related_tables = [row[0] for row in self.cur.fetchall()]
-
-            # Query to fetch tables that the given table references
-            self.cur.execute(
-                """
-                SELECT 
-                    a.relname AS referenced_table_name
-                FROM 
-                    pg_constraint con 
-                    JOIN pg_class a ON a.oid = con.confrelid 
-                WHERE 
-                    conrelid = (SELECT oid FROM pg_class WHERE relname = %s)
-                LIMIT %s;
-                """,
-                (table, n),
-            )
+    def get_foreign_key_graph(self) -> ForeignKeyGraph:
+        """
+        Load every foreign key in the schema once and keep it in memory.
+        With a snapshot the edges are only re-read when their fingerprint changes.
+        """
+        if self.fk_graph is not None:
+            return self.fk_graph
 
-            related_tables += [row[0] for row in self.cur.fetchall()]
+        with self.cursor() as cur:
+            if self.snapshot is None:
+                cur.execute(GET_FOREIGN_KEYS_STMT)
+                edges = cur.fetchall()
+            else:
+                cur.execute(GET_FOREIGN_KEYS_FINGERPRINT_STMT)
+                fingerprint = cur.fetchone()[0]
 
-            related_tables_dict[table] = related_tables
+                if fingerprint != self.snapshot.foreign_keys_fingerprint:
+                    cur.execute(GET_FOREIGN_KEYS_STMT)
+                    self.snapshot.update_foreign_keys(fingerprint, cur.fetchall())
+                    self.snapshot.save()
 
-        # convert dict to list and remove dups
-        related_tables_list = []
-        for table, related_tables in related_tables_dict.items():
-            related_tables_list += related_tables
+                edges = self.snapshot.foreign_keys
 
-        related_tables_list = list(set(related_tables_list))
+        self.fk_graph = ForeignKeyGraph(edges)
+        return self.fk_graph
 
-        return related_tables_list
+    def get_related_tables(self, table_list, n=2, max_hops=1):
+        """
+        Get tables linked to the given tables by foreign keys, in either direction.
+
+        Up to 'n' related tables are picked per given table, closest first and
+        then by the number of foreign keys linking them. Tables further away
+        than 'max_hops' are ignored.
+        """
+        return self.get_foreign_key_graph().related_tables(table_list, n, max_hops)
@@ -0,0 +1,223 @@
+from collections import deque
+from contextlib import contextmanager
+import threading
+import time
+from typing import Dict
+import psycopg2
+from psycopg2.extensions import QueryCanceledError
+from psycopg2.pool import PoolError
+
+MIN_SIZE = 1
+MAX_SIZE = 10
+# close idle connections above min_size after this long
+MAX_IDLE_SECONDS = 300
+# connections idle for longer than this are pinged before being handed out
+HEALTH_CHECK_AFTER_SECONDS = 30
+# how long getconn() waits for a free connection when the pool is full
+TIMEOUT_SECONDS = 30
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of psycopg2 connections to one database.
+
+    Opening a connection costs a TCP + TLS + auth handshake, which dominates
+    small catalog and agent queries. The pool keeps between min_size and
+    max_size connections open, pings connections that sat idle before handing
+    them out, and closes connections idle for longer than max_idle_seconds.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        min_size: int = MIN_SIZE,
+        max_size: int = MAX_SIZE,
+        max_idle_seconds: float = MAX_IDLE_SECONDS,
+        health_check_after_seconds: float = HEALTH_CHECK_AFTER_SECONDS,
+        timeout: float = TIMEOUT_SECONDS,
+    ):
+        self.url = url
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_idle_seconds = max_idle_seconds
+        self.health_check_after_seconds = health_check_after_seconds
+        self.timeout = timeout
+
+        self.condition = threading.Condition()
+        # (connection, time it was returned) - newest on the right
+        self.idle = deque()
+        # open connections, idle or borrowed
+        self.size = 0
+        self.closed = False
+
+        for _ in range(min_size):
+            self.idle.append((self.connect(), time.monotonic()))
+            self.size += 1
+
+    def connect(self):
+        return psycopg2.connect(self.url)
+
+    def getconn(self):
+        """
+        Borrow a connection, waiting up to 'timeout' seconds if the pool is full
+        """
+        deadline = time.monotonic() + self.timeout
+
+        while True:
+            conn, returned_at = self.reserve(deadline)
+
+            if conn is None:
+                try:
+                    return self.connect()
+                except Exception:
+                    self.release_slot()
+                    raise
+
+            idle_seconds = time.monotonic() - returned_at
+            if idle_seconds < self.health_check_after_seconds or self.is_healthy(conn):
+                return conn
+
+            # stale connection - drop it and try again
+            self.discard(conn)
+
+    def reserve(self, deadline: float):
+        """
+        Take an idle connection, or reserve a slot to open a new one (None)
+        """
+        with self.condition:
+            while True:
+                if self.closed:
+                    raise PoolError("connection pool is closed")
+
+                self.evict_idle()
+
+                if self.idle:
+                    # most recently used first so spare connections can idle out
+                    return self.idle.pop()
+
+                if self.size < self.max_size:
+                    self.size += 1
+                    return None, None
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolError(
+                        f"no connection available within {self.timeout} seconds"
+                    )
+                self.condition.wait(remaining)
+
+    def putconn(self, conn, discard: bool = False):
+        """
+        Return a borrowed connection to the pool
+        """
+        if discard or self.closed or conn.closed:
+            self.discard(conn)
+            return
+
+        # end whatever transaction the borrower left open
+        try:
+            conn.rollback()
+        except psycopg2.Error:
+            self.discard(conn)
+            return
+
+        with self.condition:
+            self.idle.append((conn, time.monotonic()))
+            self.condition.notify()
+
+    @contextmanager
+    def connection(self, sql: str = None):
+        """
+        Borrow a connection for the duration of a 'with' block.
+        'sql' is the statement about to run, a pool serves one database
+        and ignores it (see ReplicaRouter).
+        """
+        conn = self.getconn()
+        try:
+            yield conn
+        except QueryCanceledError:
+            # a timed out or cancelled statement, the connection is fine
+            self.putconn(conn)
+            raise
+        except psycopg2.OperationalError:
+            # the connection itself is likely broken
+            self.putconn(conn, discard=True)
+            raise
+        except Exception:
+            self.putconn(conn)
+            raise
+        else:
+            self.putconn(conn)
+
+    def is_healthy(self, conn) -> bool:
+        if conn.closed:
+            return False
+        try:
+            cur = conn.cursor()
+            try:
+                cur.execute("SELECT 1")
+            finally:
+                cur.close()
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def evict_idle(self):
+        """
+        Close the oldest idle connections past max_idle_seconds, keeping min_size open.
+        Must be called with the condition held.
+        """
+        now = time.monotonic()
+        while (
+            self.idle
+            and self.size > self.min_size
+            and now - self.idle[0][1] > self.max_idle_seconds
+        ):
+            conn, _ = self.idle.popleft()
+            self.size -= 1
+            self.close_quietly(conn)
+
+    def discard(self, conn):
+        self.close_quietly(conn)
+        self.release_slot()
+
+    def release_slot(self):
+        with self.condition:
+            self.size -= 1
+            self.condition.notify()
+
+    def close_quietly(self, conn):
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+
+    def close(self):
+        """
+        Close all idle connections, borrowed ones are closed when returned
+        """
+        with self.condition:
+            self.closed = True
+            while self.idle:
+                conn, _ = self.idle.popleft()
+                self.size -= 1
+                self.close_quietly(conn)
+            self.condition.notify_all()
+
+
+# One pool per database url, shared by every PostgresManager in the process
+_pools: Dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(url: str, **kwargs) -> ConnectionPool:
+    """
+    Get the shared pool for a database url, creating it on first use
+    """
+    with _pools_lock:
+        pool = _pools.get(url)
+        if pool is None or pool.closed:
+            pool = ConnectionPool(url, **kwargs)
+            _pools[url] = pool
+        return pool
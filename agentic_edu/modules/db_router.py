@@ -0,0 +1,205 @@
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass, field
+import threading
+import time
+from typing import Dict, List, Optional
+import psycopg2
+from psycopg2.pool import PoolError
+from agentic_edu.modules.db import (
+    PostgresManager,
+    ResultLimiter,
+    is_read_only,
+    is_select,
+)
+from agentic_edu.modules.db_pool import ConnectionPool
+
+STRATEGIES = ("round_robin", "least_latency")
+
+# weight of the newest sample in the latency moving average
+LATENCY_SMOOTHING = 0.2
+
+# databases queried at once when fanning out
+MAX_FAN_OUT_WORKERS = 8
+
+# name of the column added to fanned out results
+DATABASE_COLUMN = "_database"
+
+
+class ReplicaRouter:
+    """
+    Spreads read-only agent queries over the connection pools of several
+    read replicas, everything else goes to the primary.
+
+    Has the same connection() interface as ConnectionPool, so a
+    PostgresManager connected to a router sends agent queries to replicas
+    without knowing about them. Only queries is_read_only accepts are
+    routed to a replica; writes, locking reads and calls without a statement
+    (catalog and fingerprint reads, which must see the current schema) use
+    the primary. "round_robin" rotates through the replicas, "least_latency"
+    picks the replica with the lowest moving average call time. A replica
+    that cannot hand out a connection is skipped for that call.
+    """
+
+    def __init__(
+        self,
+        primary: ConnectionPool,
+        pools: List[ConnectionPool],
+        strategy: str = "round_robin",
+    ):
+        if not pools:
+            raise ValueError("ReplicaRouter needs at least one replica pool")
+        if strategy not in STRATEGIES:
+            raise ValueError(
+                f"Unsupported strategy '{strategy}', expected one of {STRATEGIES}"
+            )
+
+        self.primary = primary
+        self.pools = pools
+        self.strategy = strategy
+        self.lock = threading.Lock()
+        self.next_index = 0
+        # pool index -> moving average seconds per call, unmeasured pools first
+        self.latencies = [None] * len(pools)
+
+    def ordered_pools(self) -> List[int]:
+        """
+        Pool indexes in the order they should be tried for the next call
+        """
+        with self.lock:
+            if self.strategy == "round_robin":
+                start = self.next_index
+                self.next_index = (self.next_index + 1) % len(self.pools)
+                return [(start + i) % len(self.pools) for i in range(len(self.pools))]
+
+            return sorted(
+                range(len(self.pools)),
+                key=lambda i: -1 if self.latencies[i] is None else self.latencies[i],
+            )
+
+    def record_latency(self, index: int, seconds: float):
+        with self.lock:
+            previous = self.latencies[index]
+            if previous is None:
+                self.latencies[index] = seconds
+            else:
+                self.latencies[index] = (
+                    1 - LATENCY_SMOOTHING
+                ) * previous + LATENCY_SMOOTHING * seconds
+
+    @contextmanager
+    def connection(self, sql: str = None):
+        """
+        Borrow a connection from the preferred replica that has one if 'sql'
+        is read only, from the primary otherwise
+        """
+        if sql is None or not is_read_only(sql):
+            with self.primary.connection() as conn:
+                yield conn
+            return
+
+        error = None
+        for index in self.ordered_pools():
+            stack = ExitStack()
+            try:
+                conn = stack.enter_context(self.pools[index].connection())
+            except (psycopg2.OperationalError, PoolError) as e:
+                # replica down or saturated, try the next one
+                error = e
+                continue
+
+            with stack:
+                started = time.monotonic()
+                yield conn
+                self.record_latency(index, time.monotonic() - started)
+            return
+
+        raise error
+
+    def close(self):
+        self.primary.close()
+        for pool in self.pools:
+            pool.close()
+
+
+@dataclass
+class FanOutResult:
+    columns: List[str]
+    # rows prefixed with the name of the database they came from
+    rows: List[tuple]
+    # database name -> error message for databases that failed
+    errors: Dict[str, str] = field(default_factory=dict)
+    truncated: bool = False
+
+
+def fetch_rows(
+    db: PostgresManager,
+    sql: str,
+    statement_timeout_ms: int = None,
+    limiter: Optional[ResultLimiter] = None,
+):
+    """
+    Columns and rows of a query, capped by 'limiter' if given
+    """
+    if limiter is not None and is_select(sql):
+        with db.stream_sql(sql, statement_timeout_ms=statement_timeout_ms) as (
+            columns,
+            batches,
+        ):
+            rows = [row for rows in limiter.limit(batches) for row in rows]
+        return columns, rows
+
+    with db.cursor(statement_timeout_ms) as cur:
+        cur.execute(sql)
+        columns = [desc[0] for desc in cur.description]
+        return columns, cur.fetchall()
+
+
+def fan_out(
+    databases: Dict[str, PostgresManager],
+    sql: str,
+    statement_timeout_ms: int = None,
+    max_rows: int = None,
+    max_bytes: int = None,
+    max_workers: int = MAX_FAN_OUT_WORKERS,
+) -> FanOutResult:
+    """
+    Run one query against several databases concurrently and merge the rows.
+
+    Every row gets a leading '_database' column naming its database.
+    Databases that fail, or return different columns than the first one, are
+    reported in 'errors' instead of failing the whole query. 'max_rows' and
+    'max_bytes' cap each database's rows.
+    """
+    names = list(databases)
+
+    def run(name):
+        limiter = None
+        if max_rows is not None or max_bytes is not None:
+            limiter = ResultLimiter(max_rows, max_bytes)
+        columns, rows = fetch_rows(databases[name], sql, statement_timeout_ms, limiter)
+        return columns, rows, limiter is not None and limiter.truncated
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(names) or 1)) as pool:
+        futures = {name: pool.submit(run, name) for name in names}
+
+    result = FanOutResult(columns=[], rows=[])
+    columns = None
+    for name in names:
+        try:
+            db_columns, rows, truncated = futures[name].result()
+        except Exception as e:
+            result.errors[name] = str(e).strip() or type(e).__name__
+            continue
+
+        if columns is None:
+            columns = db_columns
+        elif db_columns != columns:
+            result.errors[name] = f"returned columns {db_columns}, expected {columns}"
+            continue
+
+        result.rows.extend((name,) + tuple(row) for row in rows)
+        result.truncated = result.truncated or truncated
+
+    result.columns = [DATABASE_COLUMN] + (columns or [])
+    return result
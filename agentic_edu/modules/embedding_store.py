@@ -0,0 +1,159 @@
+import json
+import os
+from typing import Dict, Iterable, Optional
+import uuid
+import numpy as np
+
+
+class EmbeddingStore:
+    """
+    Persistent on-disk store of embeddings keyed by a content hash.
+
+    Embeddings live in a single memory-mapped .npy matrix and an index file maps
+    each key to its row, so loading the store is cheap no matter how many rows
+    it holds. New rows are kept in memory until save() is called.
+
+    Every save writes a new matrix file and the index names the one it
+    belongs to, so rows can be compacted without a reader ever pairing an
+    index with a matrix whose rows moved.
+    """
+
+    INDEX_FILE = "index.json"
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.map_key_to_row: Dict[str, int] = {}
+        self.matrix: Optional[np.ndarray] = None
+        # file name of the matrix, a new one per save
+        self.matrix_name: Optional[str] = None
+        self.pending: Dict[str, np.ndarray] = {}
+        self.load()
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.pending or key in self.map_key_to_row
+
+    def __len__(self) -> int:
+        return len(self.map_key_to_row) + len(self.pending)
+
+    @property
+    def matrix_file(self) -> Optional[str]:
+        if self.matrix_name is None:
+            return None
+        return os.path.join(self.directory, self.matrix_name)
+
+    @property
+    def index_file(self):
+        return os.path.join(self.directory, self.INDEX_FILE)
+
+    def load(self):
+        """
+        Load the index and memory-map the embedding matrix if they exist
+        """
+        if not os.path.exists(self.index_file):
+            return
+
+        with open(self.index_file, "r") as f:
+            index = json.load(f)
+
+        matrix_name = index["matrix"]
+        map_key_to_row = index["rows"]
+
+        try:
+            matrix = np.load(os.path.join(self.directory, matrix_name), mmap_mode="r")
+        except FileNotFoundError:
+            # replaced by a concurrent save
+            return
+
+        # a matrix shorter than the index means a partial write, start over
+        if map_key_to_row and max(map_key_to_row.values()) >= matrix.shape[0]:
+            return
+
+        self.map_key_to_row = map_key_to_row
+        self.matrix = matrix
+        self.matrix_name = matrix_name
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        """
+        Get the embedding stored for a key, or None on a cache miss
+        """
+        if key in self.pending:
+            return self.pending[key]
+
+        row = self.map_key_to_row.get(key)
+        if row is None:
+            return None
+
+        return np.asarray(self.matrix[row], dtype=np.float32)
+
+    def put(self, key: str, embedding: np.ndarray):
+        """
+        Stage an embedding to be written on the next save()
+        """
+        self.pending[key] = np.asarray(embedding, dtype=np.float32).reshape(-1)
+
+    def save(self, keep: Iterable[str] = None):
+        """
+        Write pending embeddings and rewrite the index.
+
+        With 'keep', the keys still in use (e.g. the hashes of the current
+        table definitions), every other row is dropped and the matrix
+        compacted, so altered tables don't leave their old rows behind.
+        """
+        stale = set()
+        if keep is not None:
+            keep = set(keep)
+            stale = {key for key in self.map_key_to_row if key not in keep}
+            self.pending = {
+                key: embedding for key, embedding in self.pending.items() if key in keep
+            }
+
+        if not self.pending and not stale:
+            return
+
+        os.makedirs(self.directory, exist_ok=True)
+
+        kept_keys = [key for key in self.map_key_to_row if key not in stale]
+        new_keys = [key for key in self.pending if key not in self.map_key_to_row]
+
+        rows = []
+        if kept_keys:
+            kept_rows = [self.map_key_to_row[key] for key in kept_keys]
+            rows.append(np.asarray(self.matrix[kept_rows], dtype=np.float32))
+        if new_keys:
+            rows.append(np.stack([self.pending[key] for key in new_keys]))
+
+        map_key_to_row = {key: row for row, key in enumerate(kept_keys + new_keys)}
+        if rows:
+            matrix = np.concatenate(rows)
+        else:
+            matrix = np.zeros((0, self.matrix.shape[1]), dtype=np.float32)
+
+        # overwrite rows for keys that were re-embedded
+        for key, embedding in self.pending.items():
+            matrix[map_key_to_row[key]] = embedding
+
+        # write the matrix before the index so the index only ever names a
+        # complete matrix
+        matrix_name = f"embeddings-{uuid.uuid4().hex}.npy"
+        matrix_file = os.path.join(self.directory, matrix_name)
+        with open(matrix_file + ".tmp", "wb") as f:
+            np.save(f, matrix)
+        os.replace(matrix_file + ".tmp", matrix_file)
+
+        tmp_index_file = f"{self.index_file}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_index_file, "w") as f:
+            json.dump({"matrix": matrix_name, "rows": map_key_to_row}, f)
+        os.replace(tmp_index_file, self.index_file)
+
+        # readers that mapped the old matrix keep it until they let go
+        if self.matrix_file is not None:
+            try:
+                os.remove(self.matrix_file)
+            except FileNotFoundError:
+                # already replaced by a concurrent save
+                pass
+
+        self.pending = {}
+        self.map_key_to_row = map_key_to_row
+        self.matrix_name = matrix_name
+        self.matrix = np.load(matrix_file, mmap_mode="r")
@@ -1,5 +1,60 @@
-from sklearn.metrics.pairwise import cosine_similarity
-from transformers import BertTokenizer, BertModel
+import hashlib
+import threading
+from typing import Dict, List, Tuple
+import numpy as np
+from agentic_edu.modules.embedding_store import EmbeddingStore
+from agentic_edu.modules.keyword_matcher import KeywordMatcher
+from agentic_edu.modules.quantization import QuantizedMatrix
+from agentic_edu.modules.vector_index import ExactIndex, VectorIndex
+
+BERT_MODEL_NAME = "bert-base-uncased"
+EMBEDDING_DIM = 768
+MAX_LENGTH = 512
+BATCH_SIZE = 16
+
+
+def table_definition_key(text_representation: str) -> str:
+    """
+    Content hash of a table definition, used as the embedding cache key.
+    The model name is part of the hash so switching models invalidates the cache.
+    """
+    content = f"{BERT_MODEL_NAME}\n{text_representation}"
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+# torch and transformers take seconds to import and BERT takes seconds to load,
+# so both happen on first use and the model is shared by every embedder
+_bert_lock = threading.Lock()
+_bert = None
+
+
+def load_bert():
+    """
+    Load the BERT tokenizer and model once per process and return both.
+    """
+    global _bert
+
+    with _bert_lock:
+        if _bert is None:
+            from transformers import BertTokenizer, BertModel
+
+            tokenizer = BertTokenizer.from_pretrained(BERT_MODEL_NAME)
+            model = BertModel.from_pretrained(BERT_MODEL_NAME)
+            model.eval()
+            _bert = (tokenizer, model)
+
+    return _bert
+
+
+def normalize_rows(matrix: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Scale every row to unit length so cosine similarity becomes a dot product.
+    Returns the normalized matrix and the original row norms.
+    """
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1)
+    safe_norms = np.where(norms == 0, 1, norms)
+    return matrix / safe_norms[:, None], norms.astype(np.float32)
 
 
 class DatabaseEmbedder:
@@ -8,32 +63,207 @@ class DatabaseEmbedder:
     computing similarity between user queries and table definitions.
     """
 
-    def __init__(self):
-        self.tokenizer = BertTokenizer.from_pretrained("bert-base-uncased")
-        self.model = BertModel.from_pretrained("bert-base-uncased")
-        self.map_name_to_embeddings = {}
+    def __init__(
+        self,
+        store: EmbeddingStore = None,
+        batch_size: int = BATCH_SIZE,
+        index: VectorIndex = None,
+        dtype: str = "float32",
+    ):
         self.map_name_to_table_def = {}
 
+        # All table embeddings in one contiguous (N, D) matrix,
+        # row i belongs to table_names[i]. Rows are unit length so a query is
+        # scored against every table with one matrix-vector product.
+        # dtype "float16" or "int8" trades a little accuracy for memory.
+        self.embeddings = QuantizedMatrix(EMBEDDING_DIM, dtype)
+        self.norms = np.zeros(0, dtype=np.float32)
+        self.table_names: List[str] = []
+        self.map_name_to_index: Dict[str, int] = {}
+
+        # Optional persistent cache - only new or altered tables get embedded
+        self.store = store
+
+        self.batch_size = batch_size
+
+        # Nearest-neighbour index over self.embeddings, rebuilt lazily on
+        # the first search after tables change
+        self.index = index or ExactIndex()
+        self.index_is_stale = True
+
+        # Table names compiled into one automaton for word matching
+        self.name_matcher = KeywordMatcher()
+
+    @property
+    def tokenizer(self):
+        return load_bert()[0]
+
+    @property
+    def model(self):
+        return load_bert()[1]
+
+    @property
+    def map_name_to_embeddings(self) -> Dict[str, np.ndarray]:
+        """
+        Map of table name to its original (1, D) embedding
+        """
+        return {
+            name: self.embeddings[idx : idx + 1] * self.norms[idx]
+            for name, idx in self.map_name_to_index.items()
+        }
+
     def add_table(self, table_name: str, text_representation: str):
         """
         Add a table to the database embedder.
         Map the table name to its embedding and text representation.
         """
-        self.map_name_to_embeddings[table_name] = self.compute_embeddings(
-            text_representation
+        self.add_tables({table_name: text_representation})
+
+    def add_tables(self, map_table_name_to_table_def: Dict[str, str]):
+        """
+        Add many tables at once.
+        Cache misses are embedded together in batches instead of one at a time.
+        """
+        names = list(map_table_name_to_table_def.keys())
+        texts = list(map_table_name_to_table_def.values())
+
+        embeddings = np.zeros((len(names), EMBEDDING_DIM), dtype=np.float32)
+
+        missing = []
+        for idx, text in enumerate(texts):
+            cached = None
+            if self.store is not None:
+                cached = self.store.get(table_definition_key(text))
+            if cached is None:
+                missing.append(idx)
+            else:
+                embeddings[idx] = cached
+
+        if missing:
+            computed = self.compute_embeddings_batch([texts[idx] for idx in missing])
+            embeddings[missing] = computed
+            if self.store is not None:
+                for idx, embedding in zip(missing, computed):
+                    self.store.put(table_definition_key(texts[idx]), embedding)
+
+        self.set_embeddings(names, embeddings)
+
+        self.map_name_to_table_def.update(map_table_name_to_table_def)
+
+    def set_embeddings(self, names: List[str], embeddings: np.ndarray):
+        """
+        Write embeddings into the matrix, overwriting rows for known tables
+        and appending new tables in a single allocation.
+        """
+        normalized, norms = normalize_rows(embeddings)
+
+        self.index_is_stale = True
+
+        new_names = []
+        new_rows = []
+        for name, row, norm in zip(names, normalized, norms):
+            if name in self.map_name_to_index:
+                idx = self.map_name_to_index[name]
+                self.embeddings[idx] = row
+                self.norms[idx] = norm
+            else:
+                new_names.append(name)
+                new_rows.append((row, norm))
+
+        if not new_names:
+            return
+
+        for name in new_names:
+            self.map_name_to_index[name] = len(self.table_names)
+            self.table_names.append(name)
+            self.name_matcher.add(name)
+
+        self.embeddings.append(np.asarray([row for row, _ in new_rows]))
+        self.norms = np.concatenate(
+            [self.norms, np.asarray([norm for _, norm in new_rows], dtype=np.float32)]
         )
 
-        self.map_name_to_table_def[table_name] = text_representation
+    def save(self):
+        """
+        Persist newly computed embeddings to the store, dropping those of
+        tables that no longer exist or have changed since
+        """
+        if self.store is not None:
+            self.store.save(
+                keep=[
+                    table_definition_key(text)
+                    for text in self.map_name_to_table_def.values()
+                ]
+            )
 
     def compute_embeddings(self, text):
         """
         Compute embeddings for a given text using the BERT model.
         """
-        inputs = self.tokenizer(
-            text, return_tensors="pt", truncation=True, padding=True, max_length=512
+        return self.compute_embeddings_batch([text])
+
+    def compute_embeddings_batch(self, texts: List[str]) -> np.ndarray:
+        """
+        Compute embeddings for many texts using the BERT model.
+
+        Texts are tokenized once, sorted by length and padded per batch to the
+        longest text in that batch, which keeps padding waste low.
+        Returns a (len(texts), D) float32 matrix in the order of `texts`.
+        """
+        result = np.zeros((len(texts), EMBEDDING_DIM), dtype=np.float32)
+        if not texts:
+            return result
+
+        import torch
+
+        tokenizer, model = load_bert()
+
+        encodings = tokenizer(texts, truncation=True, max_length=MAX_LENGTH)
+        features = [
+            {key: values[idx] for key, values in encodings.items()}
+            for idx in range(len(texts))
+        ]
+
+        order = sorted(
+            range(len(texts)), key=lambda idx: len(features[idx]["input_ids"])
         )
-        outputs = self.model(**inputs)
-        return outputs["pooler_output"].detach().numpy()
+
+        with torch.inference_mode():
+            for start in range(0, len(order), self.batch_size):
+                batch = order[start : start + self.batch_size]
+                inputs = tokenizer.pad(
+                    [features[idx] for idx in batch], return_tensors="pt"
+                )
+                outputs = model(**inputs)
+                result[batch] = outputs["pooler_output"].numpy()
+
+        return result
+
+    def search(self, query: str, n=3) -> List[Tuple[str, float]]:
+        """
+        Given a query, find the top 'n' tables by cosine similarity.
+
+        Args:
+        - query (str): The user's natural language query.
+        - n (int, optional): Number of top tables to return. Defaults to 3.
+
+        Returns:
+        - list: (table name, similarity score) pairs, most similar first.
+        """
+        if not self.table_names:
+            return []
+
+        query_embedding, _ = normalize_rows(self.compute_embeddings(query))
+
+        if self.index_is_stale:
+            self.index.build(self.embeddings)
+            self.index_is_stale = False
+
+        indices, scores = self.index.search(self.embeddings, query_embedding[0], n)
+
+        return [
+            (self.table_names[idx], float(score)) for idx, score in zip(indices, scores)
+        ]
 
     def get_similar_tables_via_embeddings(self, query, n=3):
         """
@@ -46,32 +276,18 @@ class DatabaseEmbedder:
         Returns:
         - list: Top 'n' table names ranked by their similarity to the query.
         """
-        # Compute the embedding for the user's query
-        query_embedding = self.compute_embeddings(query)
-        # Calculate cosine similarity between the query and all tables
-        similarities = {
-            table: cosine_similarity(query_embedding, emb)[0][0]
-            for table, emb in self.map_name_to_embeddings.items()
-        }
-        # Rank tables based on their similarity scores and return top 'n'
-        return sorted(similarities, key=similarities.get, reverse=True)[:n]
+        return [table_name for table_name, _ in self.search(query, n)]
 
     def get_similar_table_names_via_word_match(self, query: str):
         """
         if any word in our query is a table name, add the table to a list
         """
-
-        tables = []
-
-        for table_name in self.map_name_to_table_def.keys():
-            if table_name.lower() in query.lower():
-                tables.append(table_name)
-
-        return tables
+        return self.name_matcher.find(query)
 
     def get_similar_tables(self, query: str, n=3):
         """
         combines results from get_similar_tables_via_embeddings and get_similar_table_names_via_word_match
+        tables found by both are only returned once
         """
 
         similar_tables_via_embeddings = self.get_similar_tables_via_embeddings(query, n)
@@ -79,7 +295,9 @@ class DatabaseEmbedder:
             query
         )
 
-        return similar_tables_via_embeddings + similar_tables_via_word_match
+        return list(
+            dict.fromkeys(similar_tables_via_embeddings + similar_tables_via_word_match)
+        )
 
     def get_table_definitions_from_names(self, table_names: list) -> str:
         """
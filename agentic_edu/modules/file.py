@@ -1,4 +1,5 @@
 import json
+from typing import Callable, Iterable, List
 import yaml
 
 
@@ -33,3 +34,21 @@ def write_yml_file(fname, json_str: str):
     # Write the Python object to the file as YAML
     with open(fname, "w") as f:
         yaml.dump(data, f)
+
+
+def write_jsonl_file(
+    fname, columns: List[str], batches: Iterable[list], default: Callable = str
+) -> int:
+    """
+    Write rows to a JSON Lines file one batch at a time.
+    Returns the number of rows written.
+    """
+    row_count = 0
+    with open(fname, "w") as f:
+        for rows in batches:
+            f.writelines(
+                json.dumps(dict(zip(columns, row)), default=default) + "\n"
+                for row in rows
+            )
+            row_count += len(rows)
+    return row_count
@@ -0,0 +1,75 @@
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+
+class ForeignKeyGraph:
+    """
+    In-memory graph of foreign keys between tables.
+
+    Edges are treated as undirected for context selection: a table that
+    references ours and a table ours references are both related.
+    Parallel foreign keys between the same two tables add up to a stronger edge.
+    """
+
+    def __init__(self, edges: List[Tuple[str, str]]):
+        # (referencing table, referenced table) pairs, one per constraint
+        self.edges = [tuple(edge) for edge in edges]
+
+        # table -> neighbour -> number of foreign keys between them
+        self.adjacency: Dict[str, Dict[str, int]] = defaultdict(
+            lambda: defaultdict(int)
+        )
+        for source, target in self.edges:
+            if source == target:
+                continue
+            self.adjacency[source][target] += 1
+            self.adjacency[target][source] += 1
+
+    def expand(
+        self, tables: List[str], max_hops: int = 1
+    ) -> List[Tuple[str, int, int]]:
+        """
+        Breadth-first expansion from the given tables.
+
+        Returns (table, hops, edges) for every table within 'max_hops', where
+        edges counts the foreign keys linking it to the previous hop. Ranked by
+        hop distance, then edge count, then name so results are deterministic.
+        """
+        hops = {table: 0 for table in tables}
+        edges: Dict[str, int] = {}
+        frontier = list(dict.fromkeys(tables))
+
+        for hop in range(1, max_hops + 1):
+            next_frontier = []
+            for table in frontier:
+                for neighbour, count in self.adjacency.get(table, {}).items():
+                    if hops.get(neighbour, hop) < hop:
+                        continue
+                    if neighbour not in hops:
+                        hops[neighbour] = hop
+                        next_frontier.append(neighbour)
+                    edges[neighbour] = edges.get(neighbour, 0) + count
+            frontier = next_frontier
+
+        related = [(table, hops[table], count) for table, count in edges.items()]
+        return sorted(related, key=lambda item: (item[1], -item[2], item[0]))
+
+    def related_tables(
+        self, tables: List[str], n: int = 2, max_hops: int = 1
+    ) -> List[str]:
+        """
+        Up to 'n' related tables per given table, closest first and then by
+        the number of foreign keys linking them, merged across the given tables
+        """
+        # table -> best (hops, -edges) seen from any of the given tables
+        ranks = {}
+        for table in tables:
+            related = [
+                (name, hops, edges)
+                for name, hops, edges in self.expand([table], max_hops)
+                if name not in tables
+            ]
+            for name, hops, edges in related[:n]:
+                ranks[name] = min(ranks.get(name, (hops, -edges)), (hops, -edges))
+
+        return sorted(ranks, key=lambda name: (ranks[name], name))
@@ -0,0 +1,91 @@
+from collections import deque
+from typing import Dict, List
+
+
+class KeywordMatcher:
+    """
+    Case-insensitive multi-keyword substring matcher (Aho-Corasick).
+
+    All keywords are compiled into one automaton, so finding every keyword
+    that occurs in a text is a single pass over the text no matter how many
+    keywords there are. The automaton is rebuilt lazily after keywords change.
+    """
+
+    def __init__(self, keywords: List[str] = None):
+        self.keywords: List[str] = []
+        self.map_keyword_to_id: Dict[str, int] = {}
+
+        # automaton state - goto transitions, failure links and the keyword ids
+        # that end at each state (including those reached through failure links)
+        self.transitions: List[Dict[str, int]] = []
+        self.fail: List[int] = []
+        self.outputs: List[List[int]] = []
+        self.is_stale = True
+
+        for keyword in keywords or []:
+            self.add(keyword)
+
+    def __len__(self) -> int:
+        return len(self.keywords)
+
+    def add(self, keyword: str):
+        """
+        Add a keyword, ignored if it was already added
+        """
+        if not keyword or keyword in self.map_keyword_to_id:
+            return
+        self.map_keyword_to_id[keyword] = len(self.keywords)
+        self.keywords.append(keyword)
+        self.is_stale = True
+
+    def build(self):
+        """
+        Compile the keywords into the automaton
+        """
+        self.transitions = [{}]
+        self.fail = [0]
+        self.outputs = [[]]
+
+        for keyword_id, keyword in enumerate(self.keywords):
+            state = 0
+            for char in keyword.lower():
+                if char not in self.transitions[state]:
+                    self.transitions.append({})
+                    self.fail.append(0)
+                    self.outputs.append([])
+                    self.transitions[state][char] = len(self.transitions) - 1
+                state = self.transitions[state][char]
+            self.outputs[state].append(keyword_id)
+
+        # breadth first so a state's failure link is final before its children
+        queue = deque(self.transitions[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.transitions[state].items():
+                queue.append(next_state)
+
+                fallback = self.fail[state]
+                while fallback and char not in self.transitions[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[next_state] = self.transitions[fallback].get(char, 0)
+
+                self.outputs[next_state] += self.outputs[self.fail[next_state]]
+
+        self.is_stale = False
+
+    def find(self, text: str) -> List[str]:
+        """
+        Keywords that occur anywhere in the text, in the order they were added
+        """
+        if self.is_stale:
+            self.build()
+
+        found = set()
+        state = 0
+        for char in text.lower():
+            while state and char not in self.transitions[state]:
+                state = self.fail[state]
+            state = self.transitions[state].get(char, 0)
+            found.update(self.outputs[state])
+
+        return [self.keywords[keyword_id] for keyword_id in sorted(found)]
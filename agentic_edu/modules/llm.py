@@ -4,12 +4,23 @@ Purpose:
     Provide supporting prompt engineering functions.
 """
 
+import asyncio
+import functools
 import sys
 from dotenv import load_dotenv
 import os
-from typing import Any, Dict
+from typing import Any, Awaitable, Callable, Dict, List
 import openai
 import tiktoken
+from agentic_edu.modules.llm_cache import ResponseCache
+from agentic_edu.modules.rate_limit import RateLimiter
+from agentic_edu.modules.resilience import (
+    RetryPolicy,
+    ahedged,
+    get_circuit_breaker,
+    hedged,
+)
+from agentic_edu.modules.usage import UsageLedger
 
 # load .env file
 load_dotenv()
@@ -19,6 +30,18 @@ assert os.environ.get("OPENAI_API_KEY")
 # get openai api key
 openai.api_key = os.environ.get("OPENAI_API_KEY")
 
+# prompts in flight at once for prompt_batch / aprompt_batch
+MAX_CONCURRENCY = 8
+
+# seconds before an API request is abandoned
+REQUEST_TIMEOUT = 120
+
+# retries for transient API errors, shared by prompt() and aprompt()
+RETRY_POLICY = RetryPolicy()
+
+# an async callable (model, messages, timeout) -> response, replaceable in tests
+Transport = Callable[[str, List[Dict[str, str]], float], Awaitable[Dict[str, Any]]]
+
 # ------------------ helpers ------------------
 
 
@@ -43,14 +66,17 @@ def response_parser(response: Dict[str, Any]):
     return safe_get(response, "choices.0.message.content")
 
 
-# ------------------ content generators ------------------
-
-
-def prompt(prompt: str, model: str = "gpt-4") -> str:
+def endpoint_name(model: str) -> str:
     """
-    Generate a response from a prompt using the OpenAI API.
+    Circuit breakers are kept per API base and model
     """
+    return f"{openai.api_base}#{model}"
+
 
+# ------------------ content generators ------------------
+
+
+def require_api_key():
     if not openai.api_key:
         sys.exit(
             """
@@ -60,19 +86,151 @@ Example bash command:
             """
         )
 
-    response = openai.ChatCompletion.create(
+
+def prompt(
+    prompt: str,
+    model: str = "gpt-4",
+    retry_policy: RetryPolicy = RETRY_POLICY,
+    hedge_after: float = None,
+    cache: ResponseCache = None,
+    usage_ledger: UsageLedger = None,
+) -> str:
+    """
+    Generate a response from a prompt using the OpenAI API.
+    Transient errors are retried; with 'hedge_after' a second request is
+    sent if the first has not answered after that many seconds.
+    With a cache, a prompt already answered is not sent again.
+    With a usage_ledger, the tokens and cost of the call are recorded.
+    """
+
+    messages = [
+        {
+            "role": "user",
+            "content": prompt,
+        }
+    ]
+
+    if cache is not None:
+        cached = cache.get(model, None, messages)
+        if cached is not None:
+            return cached
+
+    require_api_key()
+
+    request = functools.partial(
+        openai.ChatCompletion.create,
         model=model,
-        messages=[
-            {
-                "role": "user",
-                "content": prompt,
-            }
-        ],
+        messages=messages,
+        request_timeout=REQUEST_TIMEOUT,
+    )
+    if hedge_after is not None:
+        request = functools.partial(hedged, request, hedge_after)
+
+    response = retry_policy.call(
+        request, breaker=get_circuit_breaker(endpoint_name(model))
+    )
+    content = response_parser(response)
+
+    if usage_ledger is not None:
+        usage_ledger.record_response(response, model)
+
+    if cache is not None and content is not None:
+        cache.put(model, None, messages, content)
+
+    return content
+
+
+async def openai_transport(
+    model: str, messages: List[Dict[str, str]], timeout: float
+) -> Dict[str, Any]:
+    """
+    Send a chat completion with the async OpenAI client.
+    Point openai.api_base at a local stub server to test without the API.
+    """
+    require_api_key()
+    return await openai.ChatCompletion.acreate(
+        model=model, messages=messages, request_timeout=timeout
+    )
+
+
+async def aprompt(
+    prompt: str,
+    model: str = "gpt-4",
+    transport: Transport = None,
+    rate_limiter: RateLimiter = None,
+    timeout: float = REQUEST_TIMEOUT,
+    retry_policy: RetryPolicy = RETRY_POLICY,
+    hedge_after: float = None,
+    usage_ledger: UsageLedger = None,
+) -> str:
+    """
+    Async version of prompt().
+    With a rate_limiter every request, retries and hedges included, waits
+    for request and token quota first.
+    """
+    transport = transport or openai_transport
+    messages = [{"role": "user", "content": prompt}]
+    prompt_tokens = 0
+    if rate_limiter is not None and rate_limiter.tokens:
+        prompt_tokens = count_tokens(prompt)
+
+    async def send():
+        if rate_limiter is not None:
+            await rate_limiter.acquire_async(prompt_tokens)
+        return await transport(model, messages, timeout)
+
+    request = send
+    if hedge_after is not None:
+        request = functools.partial(ahedged, send, hedge_after)
+
+    response = await retry_policy.acall(
+        request, breaker=get_circuit_breaker(endpoint_name(model))
     )
 
+    if usage_ledger is not None:
+        usage_ledger.record_response(response, model)
+
+    if rate_limiter is not None:
+        # the completion's tokens count against the quota too
+        rate_limiter.consume(safe_get(response, "usage.completion_tokens") or 0)
+
     return response_parser(response)
 
 
+async def aprompt_batch(
+    prompts: List[str],
+    model: str = "gpt-4",
+    max_concurrency: int = MAX_CONCURRENCY,
+    transport: Transport = None,
+    rate_limiter: RateLimiter = None,
+    timeout: float = REQUEST_TIMEOUT,
+    return_exceptions: bool = False,
+    retry_policy: RetryPolicy = RETRY_POLICY,
+) -> List[str]:
+    """
+    Run many prompts concurrently, at most 'max_concurrency' at a time.
+    Responses come back in the order of the prompts.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run(text: str) -> str:
+        async with semaphore:
+            return await aprompt(
+                text, model, transport, rate_limiter, timeout, retry_policy
+            )
+
+    return await asyncio.gather(
+        *(run(text) for text in prompts), return_exceptions=return_exceptions
+    )
+
+
+def prompt_batch(prompts: List[str], model: str = "gpt-4", **kwargs) -> List[str]:
+    """
+    Blocking wrapper around aprompt_batch() for synchronous callers
+    """
+    return asyncio.run(aprompt_batch(prompts, model, **kwargs))
+
+
 def add_cap_ref(
     prompt: str, prompt_suffix: str, cap_ref: str, cap_ref_content: str
 ) -> str:
@@ -91,26 +249,38 @@ def add_cap_ref(
     return new_prompt
 
 
+@functools.lru_cache(maxsize=None)
+def get_encoding(name: str = "cl100k_base") -> tiktoken.Encoding:
+    """
+    Load a tiktoken encoding once per process, building it parses the whole BPE file.
+    """
+    return tiktoken.get_encoding(name)
+
+
 def count_tokens(text: str):
     """
     Count the number of tokens in a string.
     """
-    enc = tiktoken.get_encoding("cl100k_base")
-    return len(enc.encode(text))
+    return len(get_encoding().encode(text))
 
 
-def estimate_price_and_tokens(text):
+def estimate_price(tokens: int) -> float:
     """
-    Conservative estimate the price and tokens for a given text.
+    Conservative estimate of the price of a number of tokens.
     """
     # round up to the output tokens
     COST_PER_1k_TOKENS = 0.06
 
-    tokens = count_tokens(text)
-
     estimated_cost = (tokens / 1000) * COST_PER_1k_TOKENS
 
     # round
-    estimated_cost = round(estimated_cost, 2)
+    return round(estimated_cost, 2)
+
+
+def estimate_price_and_tokens(text):
+    """
+    Conservative estimate the price and tokens for a given text.
+    """
+    tokens = count_tokens(text)
 
-    return estimated_cost, tokens
+    return estimate_price(tokens), tokens
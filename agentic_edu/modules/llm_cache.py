@@ -0,0 +1,300 @@
+"""
+Purpose:
+    Cache LLM responses across sessions so identical prompts (gate checks,
+    insight prompts, agent turns) are only paid for once.
+"""
+
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+import autogen
+import numpy as np
+from agentic_edu.modules.embeddings import normalize_rows
+
+# 256MB of cached responses
+MAX_BYTES = 256 * 1024 * 1024
+
+# cosine similarity above which a temperature 0 prompt counts as a near-duplicate
+SIMILARITY_THRESHOLD = 0.97
+
+# parts of a message a near-duplicate must repeat exactly: quoted text,
+# numbers and snake_case names (e.g. 2023, 'gmail.com', user_accounts)
+LITERAL_PATTERN = re.compile(r"'[^']*'|\"[^\"]*\"|`[^`]*`|\b\w*[\d_]\w*\b")
+
+# message fields that change the response, autogen adds others (e.g. "context")
+MESSAGE_FIELDS = ("role", "content", "name", "function_call")
+
+CREATE_TABLE_STMT = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    scope TEXT NOT NULL,
+    response TEXT NOT NULL,
+    embedding BLOB,
+    bytes INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL
+)
+"""
+
+CREATE_SCOPE_INDEX_STMT = (
+    "CREATE INDEX IF NOT EXISTS responses_scope ON responses (scope)"
+)
+
+
+def canonical_messages(messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [
+        {field: message[field] for field in MESSAGE_FIELDS if field in message}
+        for message in messages
+    ]
+
+
+def message_literals(message: Dict[str, Any]) -> List[str]:
+    return sorted(set(LITERAL_PATTERN.findall(str(message.get("content") or ""))))
+
+
+def hash_json(value) -> str:
+    content = json.dumps(value, sort_keys=True, default=str)
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    SQLite backed cache of chat completions.
+
+    Responses are keyed on (model, temperature, messages, functions), so by
+    default only exact repeats are served. With an 'embedder' (a
+    DatabaseEmbedder, or anything with compute_embeddings) a temperature 0
+    miss falls back to the most similar cached prompt whose model, functions
+    and earlier messages are identical, whose last message has the same
+    literals (numbers, quoted text, snake_case names) and is at least
+    'similarity_threshold' similar. Least recently used responses are
+    evicted once the cache exceeds 'max_bytes'.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_bytes: int = MAX_BYTES,
+        embedder=None,
+        similarity_threshold: float = SIMILARITY_THRESHOLD,
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.embedder = embedder
+        self.similarity_threshold = similarity_threshold
+        self.lock = threading.Lock()
+
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(CREATE_TABLE_STMT)
+        self.conn.execute(CREATE_SCOPE_INDEX_STMT)
+        self.conn.commit()
+
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def close(self):
+        self.conn.close()
+
+    def make_keys(
+        self,
+        model: str,
+        temperature: Optional[float],
+        messages: List[Dict[str, Any]],
+        functions: Optional[List[dict]] = None,
+    ):
+        """
+        (exact key, scope) - the scope is everything but the last message,
+        plus that message's literals, near-duplicates are only looked for
+        within it
+        """
+        messages = canonical_messages(messages)
+        key = hash_json([model, temperature, messages, functions])
+        literals = message_literals(messages[-1]) if messages else []
+        scope = hash_json([model, temperature, messages[:-1], functions, literals])
+        return key, scope
+
+    def semantic_enabled(self, temperature: Optional[float]) -> bool:
+        # sampled responses differ anyway, only reuse deterministic ones
+        return self.embedder is not None and temperature == 0
+
+    def embed(self, messages: List[Dict[str, Any]]) -> np.ndarray:
+        text = str(messages[-1].get("content") or "") if messages else ""
+        embedding, _ = normalize_rows(self.embedder.compute_embeddings(text))
+        return embedding[0]
+
+    def get(
+        self,
+        model: str,
+        temperature: Optional[float],
+        messages: List[Dict[str, Any]],
+        functions: Optional[List[dict]] = None,
+    ):
+        """
+        Cached response for a request, None on a miss
+        """
+        key, scope = self.make_keys(model, temperature, messages, functions)
+
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT response FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None:
+                self.touch(key)
+                self.hits += 1
+                return json.loads(row[0])
+
+        if self.semantic_enabled(temperature):
+            response = self.get_similar(scope, self.embed(messages))
+            if response is not None:
+                return response
+
+        with self.lock:
+            self.misses += 1
+        return None
+
+    def get_similar(self, scope: str, embedding: np.ndarray):
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT key, response, embedding FROM responses "
+                "WHERE scope = ? AND embedding IS NOT NULL",
+                (scope,),
+            ).fetchall()
+            if not rows:
+                return None
+
+            matrix = np.stack([np.frombuffer(row[2], dtype=np.float32) for row in rows])
+            scores = matrix @ embedding
+            best = int(np.argmax(scores))
+            if scores[best] < self.similarity_threshold:
+                return None
+
+            self.touch(rows[best][0])
+            self.semantic_hits += 1
+            return json.loads(rows[best][1])
+
+    def put(
+        self,
+        model: str,
+        temperature: Optional[float],
+        messages: List[Dict[str, Any]],
+        response,
+        functions: Optional[List[dict]] = None,
+    ):
+        """
+        Store a response (text or function call), evicting old ones to stay under max_bytes
+        """
+        key, scope = self.make_keys(model, temperature, messages, functions)
+        content = json.dumps(response)
+
+        embedding = None
+        if self.semantic_enabled(temperature):
+            embedding = self.embed(messages).astype(np.float32).tobytes()
+
+        size = len(content) + (len(embedding) if embedding else 0)
+        if size > self.max_bytes:
+            return
+
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, scope, content, embedding, size, now, now),
+            )
+            self.evict()
+            self.conn.commit()
+
+    def touch(self, key: str):
+        """
+        Mark an entry as used, lock must be held
+        """
+        self.conn.execute(
+            "UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key)
+        )
+        self.conn.commit()
+
+    def evict(self):
+        """
+        Drop least recently used entries until the cache fits, lock must be held
+        """
+        total = self.conn.execute(
+            "SELECT COALESCE(SUM(bytes), 0) FROM responses"
+        ).fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        rows = self.conn.execute(
+            "SELECT key, bytes FROM responses ORDER BY last_access"
+        ).fetchall()
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            self.conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+            self.evictions += 1
+
+    @property
+    def metrics(self) -> Dict[str, int]:
+        with self.lock:
+            entries, total = self.conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM responses"
+            ).fetchone()
+            return {
+                "hits": self.hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": entries,
+                "bytes": total,
+            }
+
+
+def llm_config_model(llm_config: dict) -> str:
+    config = (llm_config.get("config_list") or [llm_config])[0]
+    return config.get("model", "gpt-4")
+
+
+def register_response_cache(agent, cache: ResponseCache):
+    """
+    Serve an autogen agent's LLM replies from 'cache'.
+
+    The cached reply function runs just before the agent's own
+    generate_oai_reply, so termination, function call and code execution
+    replies are unaffected.
+    """
+
+    def cached_reply(recipient, messages=None, sender=None, config=None):
+        llm_config = recipient.llm_config
+        if llm_config is False:
+            return False, None
+        if messages is None:
+            messages = recipient._oai_messages[sender]
+
+        model = llm_config_model(llm_config)
+        temperature = llm_config.get("temperature")
+        functions = llm_config.get("functions")
+        request = recipient._oai_system_message + messages
+
+        reply = cache.get(model, temperature, request, functions)
+        if reply is not None:
+            return True, reply
+
+        final, reply = recipient.generate_oai_reply(messages, sender)
+        if final and reply is not None:
+            cache.put(model, temperature, request, reply, functions)
+        return final, reply
+
+    position = next(
+        (
+            idx
+            for idx, entry in enumerate(agent._reply_func_list)
+            if getattr(entry["reply_func"], "__name__", None) == "generate_oai_reply"
+        ),
+        len(agent._reply_func_list),
+    )
+    agent.register_reply([autogen.Agent, None], cached_reply, position=position)
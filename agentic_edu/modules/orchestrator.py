@@ -1,10 +1,100 @@
 import dataclasses
+import functools
 import json
+import threading
 from typing import List, Optional, Tuple
 import autogen
 from agentic_edu.agents.instruments import AgentInstruments
 from agentic_edu.modules import llm
-from agentic_edu.types import Chat, ConversationResult
+from agentic_edu.modules.llm_cache import ResponseCache, register_response_cache
+from agentic_edu.modules.resilience import (
+    CircuitOpenError,
+    RetryPolicy,
+    get_circuit_breaker,
+)
+from agentic_edu.modules.usage import UsageLedger
+from agentic_edu.types import Chat, ConversationResult, TokenUsage
+
+
+class ConversationStopped(Exception):
+    pass
+
+
+class DeadlineExceeded(ConversationStopped):
+    pass
+
+
+class LLMUnavailable(ConversationStopped):
+    pass
+
+
+class TokenBudgetExceeded(ConversationStopped):
+    pass
+
+
+def message_as_str(message) -> str:
+    """
+    Text of a message - its content or function call, "" for empty messages
+    """
+    if message is None:
+        return ""
+
+    if isinstance(message, dict):
+        content_from_dict = message.get("content", None)
+        func_call_from_dict = message.get("function_call", None)
+        content = content_from_dict or func_call_from_dict
+        if not content:
+            return ""
+        return str(content)
+
+    return str(message)
+
+
+def agent_endpoint(agent: autogen.ConversableAgent) -> str:
+    """
+    Endpoint name of the model an agent talks to, for its circuit breaker
+    """
+    llm_config = agent.llm_config if isinstance(agent.llm_config, dict) else {}
+    config = (llm_config.get("config_list") or [llm_config])[0]
+    return llm.endpoint_name(config.get("model", "gpt-4"))
+
+
+def with_deadline(conversation):
+    """
+    Run a conversation under the orchestrator's deadline.
+    When it passes, running queries are cancelled and the conversation
+    stops at its next message with a failed ConversationResult.
+    An LLM endpoint that stays unavailable, or a spent token budget, ends
+    it the same way.
+    """
+
+    @functools.wraps(conversation)
+    def wrapper(self, *args, **kwargs) -> ConversationResult:
+        self.deadline_event.clear()
+        timer = None
+        if self.deadline_seconds is not None:
+            timer = threading.Timer(self.deadline_seconds, self.on_deadline)
+            timer.daemon = True
+            timer.start()
+
+        try:
+            return conversation(self, *args, **kwargs)
+        except ConversationStopped as e:
+            print(f"❌ Orchestrator stopped: {e}")
+            cost, tokens = self.get_cost_and_tokens()
+            return ConversationResult(
+                success=False,
+                messages=self.messages,
+                cost=cost,
+                tokens=tokens,
+                last_message_str=self.last_message_always_string,
+                error_message=str(e),
+            )
+        finally:
+            if timer is not None:
+                timer.cancel()
+
+    return wrapper
 
 
 class Orchestrator:
@@ -18,6 +108,11 @@ class Orchestrator:
         agents: List[autogen.ConversableAgent],
         instruments: AgentInstruments,
         validate_results_func: callable = None,
+        deadline_seconds: float = None,
+        retry_policy: RetryPolicy = llm.RETRY_POLICY,
+        response_cache: ResponseCache = None,
+        token_budget: int = None,
+        usage_ledger: UsageLedger = None,
     ):
         # Name of agent team
         self.name = name
@@ -28,6 +123,16 @@ class Orchestrator:
         # List of raw messages - partially redundant due to self.chats
         self.messages = []
 
+        # Name of the agent that wrote each message, None for prompts
+        self.message_authors: List[Optional[str]] = []
+
+        # Tokens per message, counted lazily up to len(self.message_tokens)
+        self.message_tokens: List[int] = []
+        self.token_usage = TokenUsage()
+
+        # Tokens a conversation may use before it is stopped, None for no limit
+        self.token_budget = token_budget
+
         # Agent instruments - state and functions that agents can use
         self.instruments = instruments
 
@@ -37,9 +142,27 @@ class Orchestrator:
         # Function to validate results at the end of every conversation
         self.validate_results_func: callable = validate_results_func
 
+        # Wall clock budget for each conversation, None for no limit
+        self.deadline_seconds = deadline_seconds
+        self.deadline_event = threading.Event()
+
+        # Retries for transient LLM errors while agents generate replies
+        self.retry_policy = retry_policy
+
         if len(self.agents) < 2:
             raise Exception("Orchestrator needs at least two agents")
 
+        # Shared cache of LLM replies - repeated turns are not paid for twice
+        self.response_cache = response_cache
+        if response_cache is not None:
+            for agent in dict.fromkeys(self.agents):
+                register_response_cache(agent, response_cache)
+
+        # Real token usage and cost of this team's LLM calls
+        self.usage_ledger = None
+        if usage_ledger is not None:
+            self.usage_ledger = usage_ledger.child(team=self.name)
+
     @property
     def total_agents(self):
         return len(self.agents)
@@ -84,6 +207,59 @@ class Orchestrator:
             return self.validate_results_func()
         return True, ""
 
+    def on_deadline(self):
+        """
+        Called from the timer thread when the deadline passes
+        """
+        self.deadline_event.set()
+        if self.instruments is not None:
+            self.instruments.cancel()
+
+    def check_deadline(self):
+        if self.deadline_event.is_set():
+            raise DeadlineExceeded(
+                f"{self.name} exceeded its deadline of {self.deadline_seconds} seconds"
+            )
+
+    def check_token_budget(self):
+        if self.token_budget is None:
+            return
+        tokens = self.update_token_usage().total_tokens
+        if tokens > self.token_budget:
+            raise TokenBudgetExceeded(
+                f"{self.name} used {tokens} tokens, over its budget of {self.token_budget}"
+            )
+
+    def generate_reply(
+        self, agent: autogen.ConversableAgent, sender: autogen.ConversableAgent
+    ):
+        """
+        Ask an agent for its reply, retrying transient LLM errors so one
+        429 does not throw away the conversation so far
+        """
+
+        def attempt():
+            self.check_deadline()
+            if self.usage_ledger is None:
+                return agent.generate_reply(sender=sender)
+            # completions made for this reply are billed to the team
+            with self.usage_ledger.recording():
+                return agent.generate_reply(sender=sender)
+
+        try:
+            return self.retry_policy.call(
+                attempt, breaker=get_circuit_breaker(agent_endpoint(agent))
+            )
+        except CircuitOpenError as e:
+            raise LLMUnavailable(str(e)) from e
+        except Exception as e:
+            if self.retry_policy.retryable(e):
+                raise LLMUnavailable(
+                    f"{agent.name} could not reach the LLM after "
+                    f"{self.retry_policy.max_attempts} attempts: {e}"
+                ) from e
+            raise
+
     def send_message(
         self,
         from_agent: autogen.ConversableAgent,
@@ -94,6 +270,8 @@ class Orchestrator:
         Send a message from one agent to another.
         Record the message in chat log in the orchestrator
         """
+        self.check_deadline()
+        self.check_token_budget()
 
         from_agent.send(message, to_agent)
 
@@ -105,37 +283,53 @@ class Orchestrator:
             )
         )
 
-    def add_message(self, message: str):
+    def add_message(self, message: str, agent_name: str = None):
         """
-        Add a message to the orchestrator
+        Add a message to the orchestrator.
+        Messages from an agent count as completions, the rest as prompts.
         """
         self.messages.append(message)
+        self.message_authors.append(agent_name)
 
     def get_message_as_str(self):
         """
         Get all messages as a string
         """
+        return "".join(message_as_str(message) for message in self.messages)
 
-        messages_as_str = ""
-
-        for message in self.messages:
-            if message is None:
-                continue
+    def update_token_usage(self) -> TokenUsage:
+        """
+        Count the tokens of the messages added since the last update only
+        """
+        for idx in range(len(self.message_tokens), len(self.messages)):
+            tokens = llm.count_tokens(message_as_str(self.messages[idx]))
+            self.message_tokens.append(tokens)
 
-            if isinstance(message, dict):
-                content_from_dict = message.get("content", None)
-                func_call_from_dict = message.get("function_call", None)
-                content = content_from_dict or func_call_from_dict
-                if not content:
-                    continue
-                messages_as_str += str(content)
+            author = (
+                self.message_authors[idx] if idx < len(self.message_authors) else None
+            )
+            if author is None:
+                self.token_usage.prompt_tokens += tokens
             else:
-                messages_as_str += str(message)
+                self.token_usage.completion_tokens += tokens
+                self.token_usage.by_agent[author] = (
+                    self.token_usage.by_agent.get(author, 0) + tokens
+                )
 
-        return messages_as_str
+        return self.token_usage
 
     def get_cost_and_tokens(self):
-        return llm.estimate_price_and_tokens(self.get_message_as_str())
+        """
+        Cost and tokens billed for the team's LLM calls when a usage ledger
+        recorded them, otherwise an estimate from the messages
+        """
+        if self.usage_ledger is not None:
+            usage = self.usage_ledger.total
+            if usage.calls:
+                return usage.cost, usage.total_tokens
+
+        tokens = self.update_token_usage().total_tokens
+        return llm.estimate_price(tokens), tokens
 
     def has_functions(self, agent: autogen.ConversableAgent):
         return len(agent._function_map) > 0
@@ -150,9 +344,9 @@ class Orchestrator:
 
         self.send_message(agent_a, agent_b, message)
 
-        reply = agent_b.generate_reply(sender=agent_a)
+        reply = self.generate_reply(agent_b, agent_a)
 
-        self.add_message(reply)
+        self.add_message(reply, agent_b.name)
 
         print(f"basic_chat(): replied with:", reply)
 
@@ -166,11 +360,11 @@ class Orchestrator:
 
         self.send_message(agent_a, agent_b, message)
 
-        reply = agent_b.generate_reply(sender=agent_a)
+        reply = self.generate_reply(agent_b, agent_a)
 
         self.send_message(agent_b, agent_b, message)
 
-        self.add_message(reply)
+        self.add_message(reply, agent_b.name)
 
     def function_chat(
         self,
@@ -191,11 +385,11 @@ class Orchestrator:
 
         self.send_message(agent, agent, message)
 
-        reply = agent.generate_reply(sender=agent)
+        reply = self.generate_reply(agent, agent)
 
         self.send_message(agent, agent, message)
 
-        self.add_message(reply)
+        self.add_message(reply, agent.name)
 
         print(f"self_function_chat(): replied with:", reply)
 
@@ -210,6 +404,7 @@ class Orchestrator:
             with open(file_name, "w") as f:
                 f.write(json.dumps(conversations, indent=4))
 
+    @with_deadline
     def sequential_conversation(self, prompt: str) -> ConversationResult:
         """
         Runs a sequential conversation between agents.
@@ -264,6 +459,7 @@ class Orchestrator:
                     error_message=error_message,
                 )
 
+    @with_deadline
     def broadcast_conversation(self, prompt: str) -> ConversationResult:
         """
         Broadcast a message from agent_a to all agents.
@@ -316,6 +512,7 @@ class Orchestrator:
             error_message=error_message,
         )
 
+    @with_deadline
     def round_robin_conversation(
         self, prompt: str, loops: int = 1
     ) -> ConversationResult:
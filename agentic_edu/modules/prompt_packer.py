@@ -0,0 +1,227 @@
+"""
+Purpose:
+    Fit table definitions into a token budget for the TABLE_DEFINITIONS
+    prompt context: the most relevant tables first, in a compact form, and
+    no more than the budget allows.
+"""
+
+from dataclasses import dataclass, field
+import re
+from typing import Dict, List, Optional, Tuple
+from agentic_edu.modules import llm
+from agentic_edu.modules.fk_graph import ForeignKeyGraph
+
+# tokens of table definitions per prompt
+TOKEN_BUDGET = 3000
+
+# relevance kept per foreign key hop away from a matched table
+HOP_DECAY = 0.5
+
+# base type names as format_type writes them, without modifier or array brackets
+TYPE_ABBREVIATIONS = {
+    "timestamp without time zone": "timestamp",
+    "timestamp with time zone": "timestamptz",
+    "time without time zone": "time",
+    "time with time zone": "timetz",
+    "character varying": "varchar",
+    "double precision": "float8",
+    "character": "char",
+    "boolean": "bool",
+    "integer": "int",
+    "bigint": "int8",
+    "smallint": "int2",
+}
+
+# a type modifier, e.g. the (3) of "timestamp(3) without time zone"
+TYPE_MODIFIER_PATTERN = re.compile(r"\([^)]*\)")
+
+# bookkeeping columns that rarely matter for answering a question
+LOW_VALUE_COLUMN_PATTERN = re.compile(
+    r"^(created_by|updated_by|modified_by|deleted_by|updated_at|modified_at"
+    r"|last_modified|last_updated|deleted_at|row_version|etag|checksum"
+    r"|_.*)$"
+)
+
+CREATE_TABLE_PATTERN = re.compile(
+    r"^CREATE TABLE (?P<name>\S+) \(\n(?P<columns>.*)\n\);$", re.DOTALL
+)
+
+
+@dataclass
+class TableCandidate:
+    name: str
+    definition: str
+    # similarity to the question, decayed per foreign key hop
+    relevance: float
+    # foreign key hops from a matched table, 0 for matched tables
+    hops: int = 0
+
+
+@dataclass
+class PackedTables:
+    text: str
+    tokens: int
+    # tables in the prompt, most relevant first
+    tables: List[str] = field(default_factory=list)
+    # tables in the prompt with low value columns left out
+    compressed: List[str] = field(default_factory=list)
+    # tables that did not fit the budget
+    omitted: List[str] = field(default_factory=list)
+
+
+def abbreviate_type(column_type: str) -> str:
+    """
+    Short name of a type, keeping its modifier and array brackets:
+    "timestamp(3) without time zone[]" -> "timestamp(3)[]"
+    """
+    match = TYPE_MODIFIER_PATTERN.search(column_type)
+    modifier = match.group(0) if match else ""
+    base = TYPE_MODIFIER_PATTERN.sub("", column_type, count=1)
+
+    name = base.rstrip("[]")
+    if name not in TYPE_ABBREVIATIONS:
+        return column_type
+    return TYPE_ABBREVIATIONS[name] + modifier + base[len(name) :]
+
+
+def parse_table_definition(definition: str) -> Optional[Tuple[str, List[List[str]]]]:
+    """
+    (table name, [[column, type], ...]) of a 'create' definition built by
+    format_create_table, None for any other text
+    """
+    match = CREATE_TABLE_PATTERN.match(definition.strip())
+    if match is None:
+        return None
+
+    columns = []
+    for line in match.group("columns").split(",\n"):
+        column, _, column_type = line.strip().partition(" ")
+        columns.append([column, column_type])
+    return match.group("name"), columns
+
+
+def is_low_value_column(column: str, keep_terms: set) -> bool:
+    if column.lower() in keep_terms:
+        return False
+    if column == "id" or column.endswith("_id"):
+        # join keys
+        return False
+    return LOW_VALUE_COLUMN_PATTERN.match(column.lower()) is not None
+
+
+def rank_tables(
+    scores: Dict[str, float],
+    definitions: Dict[str, str],
+    fk_graph: ForeignKeyGraph = None,
+    max_hops: int = 1,
+    hop_decay: float = HOP_DECAY,
+) -> List[TableCandidate]:
+    """
+    Candidates for the prompt: the matched tables with their similarity
+    scores, plus tables within 'max_hops' foreign keys of them scored
+    by the best matched table times hop_decay per hop. Most relevant first.
+    """
+    candidates = {
+        name: TableCandidate(name, definitions[name], score, 0)
+        for name, score in scores.items()
+        if name in definitions
+    }
+
+    if fk_graph is not None and max_hops > 0 and scores:
+        best_score = max(scores.values())
+        for name, hops, _ in fk_graph.expand(list(scores), max_hops):
+            if name in candidates or name not in definitions:
+                continue
+            candidates[name] = TableCandidate(
+                name, definitions[name], best_score * hop_decay**hops, hops
+            )
+
+    return sorted(
+        candidates.values(),
+        key=lambda candidate: (-candidate.relevance, candidate.hops, candidate.name),
+    )
+
+
+class PromptPacker:
+    """
+    Greedily packs the most relevant table definitions into a token budget.
+
+    Every table is written compactly, with abbreviated types and one line per
+    column. A table that does not fit is retried without its bookkeeping
+    columns (audit timestamps, *_by, underscore prefixed). Tables that still
+    don't fit are skipped, and smaller, less relevant tables may fill the
+    remaining space. Columns named in the question are always kept.
+    """
+
+    def __init__(
+        self,
+        token_budget: int = TOKEN_BUDGET,
+        abbreviate_types: bool = True,
+        drop_low_value_columns: bool = True,
+    ):
+        self.token_budget = token_budget
+        self.abbreviate_types = abbreviate_types
+        self.drop_low_value_columns = drop_low_value_columns
+
+    def render(self, name: str, columns: List[List[str]], omitted: int = 0) -> str:
+        lines = []
+        for column, column_type in columns:
+            if self.abbreviate_types:
+                column_type = abbreviate_type(column_type)
+            lines.append(f"{column} {column_type}".strip())
+
+        text = f"CREATE TABLE {name} (\n" + ",\n".join(lines)
+        if omitted:
+            text += f"\n-- {omitted} more columns omitted"
+        return text + "\n);"
+
+    def variants(self, candidate: TableCandidate, keep_terms: set) -> List[str]:
+        """
+        Ways to write a table, most complete first
+        """
+        parsed = parse_table_definition(candidate.definition)
+        if parsed is None:
+            return [candidate.definition]
+
+        name, columns = parsed
+        variants = [self.render(name, columns)]
+
+        if self.drop_low_value_columns:
+            kept = [
+                column
+                for column in columns
+                if not is_low_value_column(column[0], keep_terms)
+            ]
+            if len(kept) < len(columns):
+                variants.append(self.render(name, kept, len(columns) - len(kept)))
+
+        return variants
+
+    def pack(self, candidates: List[TableCandidate], query: str = "") -> PackedTables:
+        """
+        Fill the budget with 'candidates', which must be ranked most relevant first
+        """
+        keep_terms = set(re.findall(r"\w+", query.lower()))
+        separator_tokens = llm.count_tokens("\n\n")
+
+        packed = PackedTables(text="", tokens=0)
+        sections = []
+
+        for candidate in candidates:
+            # the separator is only paid for from the second table on
+            overhead = separator_tokens if sections else 0
+
+            for idx, text in enumerate(self.variants(candidate, keep_terms)):
+                tokens = llm.count_tokens(text) + overhead
+                if packed.tokens + tokens <= self.token_budget:
+                    sections.append(text)
+                    packed.tokens += tokens
+                    packed.tables.append(candidate.name)
+                    if idx > 0:
+                        packed.compressed.append(candidate.name)
+                    break
+            else:
+                packed.omitted.append(candidate.name)
+
+        packed.text = "\n\n".join(sections)
+        return packed
@@ -0,0 +1,100 @@
+"""
+Purpose:
+    Compact storage for embedding matrices.
+    float16 halves memory, int8 with a per-vector scale quarters it.
+    NumPy has no fast float16 kernels, so float16 is the slowest to score;
+    int8 is both the smallest and close to float32 speed.
+"""
+
+from typing import Tuple
+import numpy as np
+
+SUPPORTED_DTYPES = ("float32", "float16", "int8")
+
+
+class QuantizedMatrix:
+    """
+    An (N, D) embedding matrix stored as float32, float16 or int8 codes.
+
+    int8 rows are stored as round(row / scale) with one float32 scale per
+    row, so a dot product is (codes @ query) * scale. Reads always come
+    back as float32, which lets vector indexes use this in place of a plain
+    ndarray: it supports len(), slicing / fancy indexing and `@ query`.
+    """
+
+    CHUNK_SIZE = 4096
+
+    def __init__(self, dim: int, dtype: str = "float32"):
+        if dtype not in SUPPORTED_DTYPES:
+            raise ValueError(
+                f"Unsupported dtype '{dtype}', expected one of {SUPPORTED_DTYPES}"
+            )
+
+        self.dim = dim
+        self.dtype = dtype
+        self.codes = np.zeros((0, dim), dtype=np.dtype(dtype))
+        self.scales = np.zeros(0, dtype=np.float32)
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.codes.shape
+
+    @property
+    def nbytes(self) -> int:
+        if self.dtype == "int8":
+            return self.codes.nbytes + self.scales.nbytes
+        return self.codes.nbytes
+
+    def quantize(self, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Encode float rows, returning (codes, scales)
+        """
+        rows = np.asarray(rows, dtype=np.float32).reshape(-1, self.dim)
+
+        if self.dtype != "int8":
+            return rows.astype(self.dtype), np.ones(len(rows), dtype=np.float32)
+
+        scales = np.abs(rows).max(axis=1) / 127
+        scales = np.where(scales == 0, 1, scales).astype(np.float32)
+        codes = np.clip(np.rint(rows / scales[:, None]), -127, 127).astype(np.int8)
+        return codes, scales
+
+    def dequantize(self, codes: np.ndarray, scales: np.ndarray) -> np.ndarray:
+        if self.dtype != "int8":
+            return codes.astype(np.float32)
+        return codes.astype(np.float32) * scales[..., None]
+
+    def append(self, rows: np.ndarray):
+        codes, scales = self.quantize(rows)
+        self.codes = np.concatenate([self.codes, codes])
+        self.scales = np.concatenate([self.scales, scales])
+
+    def __setitem__(self, idx: int, row: np.ndarray):
+        codes, scales = self.quantize(row)
+        self.codes[idx] = codes[0]
+        self.scales[idx] = scales[0]
+
+    def __getitem__(self, idx) -> np.ndarray:
+        return self.dequantize(self.codes[idx], self.scales[idx])
+
+    def to_array(self) -> np.ndarray:
+        return self[:]
+
+    def __matmul__(self, query: np.ndarray) -> np.ndarray:
+        """
+        Score every row against a float32 query vector.
+        Work is chunked so no full float32 copy of the matrix is made.
+        """
+        if self.dtype == "float32":
+            return self.codes @ query
+
+        scores = np.zeros(len(self.codes), dtype=np.float32)
+        for start in range(0, len(self.codes), self.CHUNK_SIZE):
+            end = start + self.CHUNK_SIZE
+            scores[start:end] = self.codes[start:end].astype(np.float32) @ query
+        if self.dtype == "int8":
+            scores *= self.scales
+        return scores
@@ -0,0 +1,224 @@
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional, Tuple
+import uuid
+from agentic_edu.modules.db import scan_sql
+
+# 512MB of cached results
+MAX_BYTES = 512 * 1024 * 1024
+# cached results older than this are treated as misses
+TTL_SECONDS = 60 * 60
+
+# whitespace before / after these characters carries no meaning outside literals
+NO_SPACE_BEFORE = ",)"
+NO_SPACE_AFTER = ",("
+
+CREATE_TABLE_STMT = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    file TEXT NOT NULL,
+    bytes INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL,
+    summary TEXT
+)
+"""
+
+
+def normalize_sql(sql: str) -> str:
+    """
+    Canonical form of a query for cache lookups.
+
+    Comments are dropped, whitespace is collapsed and everything outside
+    string literals and quoted identifiers is lowercased, so trivially
+    different spellings of the same query share one cache entry.
+    """
+    out = []
+    skip_space = False
+
+    for kind, text in scan_sql(sql):
+        if kind == "quoted":
+            # literals, quoted identifiers and dollar quoted strings verbatim
+            out.append(text)
+            skip_space = False
+        elif kind == "comment" or text.isspace():
+            if out and out[-1] != " " and not skip_space:
+                out.append(" ")
+        else:
+            if text in NO_SPACE_BEFORE and out and out[-1] == " ":
+                out.pop()
+            out.append(text.lower())
+            # swallow the whitespace that follows
+            skip_space = text in NO_SPACE_AFTER
+
+    return "".join(out).strip().rstrip(";").strip()
+
+
+class QueryResultCache:
+    """
+    On-disk cache of run_sql results files.
+
+    Entries are keyed on the database, the normalized SQL, the schema version
+    and the results format, so any schema change invalidates every cached
+    result and databases with the same schema never share results. Entries
+    expire after 'ttl_seconds' and the least recently used are evicted once
+    the cached files exceed 'max_bytes'. The index is a SQLite database next
+    to the files, so sessions and processes share the cache safely.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        max_bytes: int = MAX_BYTES,
+        ttl_seconds: float = TTL_SECONDS,
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.index_path = os.path.join(directory, "index.sqlite")
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(self.index_path, check_same_thread=False)
+        self.conn.execute(CREATE_TABLE_STMT)
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def make_key(
+        self, sql: str, schema_version: str, results_format: str, database: str = ""
+    ) -> str:
+        content = json.dumps(
+            [database, normalize_sql(sql), schema_version, results_format]
+        )
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    def get(
+        self, sql: str, schema_version: str, results_format: str, database: str = ""
+    ) -> Optional[Tuple[str, Optional[dict]]]:
+        """
+        Look up cached results, returning (path of the cached file, summary)
+        """
+        key = self.make_key(sql, schema_version, results_format, database)
+
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT file, created_at, summary FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            fname, created_at, summary = row
+            path = os.path.join(self.directory, fname)
+            now = time.time()
+            expired = now - created_at > self.ttl_seconds
+            # the file is gone if another process evicted the entry
+            if expired or not os.path.exists(path):
+                self.remove(key, fname)
+                self.conn.commit()
+                if expired:
+                    self.expirations += 1
+                self.misses += 1
+                return None
+
+            self.conn.execute(
+                "UPDATE entries SET last_access = ? WHERE key = ?", (now, key)
+            )
+            self.conn.commit()
+            self.hits += 1
+            return path, json.loads(summary)
+
+    def put(
+        self,
+        sql: str,
+        schema_version: str,
+        results_format: str,
+        path: str,
+        summary: dict = None,
+        database: str = "",
+    ):
+        """
+        Copy a results file into the cache, evicting old entries to stay under max_bytes
+        """
+        size = os.path.getsize(path)
+        if size > self.max_bytes:
+            return
+
+        key = self.make_key(sql, schema_version, results_format, database)
+        fname = key + os.path.splitext(path)[1]
+        # copy under a unique temporary name so readers never see a partial file
+        tmp_path = os.path.join(self.directory, f"{fname}.{uuid.uuid4().hex}.tmp")
+        shutil.copyfile(path, tmp_path)
+
+        with self.lock:
+            os.replace(tmp_path, os.path.join(self.directory, fname))
+            now = time.time()
+            self.conn.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)",
+                (key, fname, size, now, now, json.dumps(summary)),
+            )
+            self.evict(keep=key)
+            self.conn.commit()
+
+    def evict(self, keep: str = None):
+        """
+        Drop least recently used entries until the cache fits, lock must be held
+        """
+        total = self.total_bytes
+        if total <= self.max_bytes:
+            return
+
+        rows = self.conn.execute(
+            "SELECT key, file, bytes FROM entries ORDER BY last_access"
+        ).fetchall()
+        for key, fname, size in rows:
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            self.remove(key, fname)
+            total -= size
+            self.evictions += 1
+
+    def remove(self, key: str, fname: str):
+        """
+        Drop an entry and its file, lock must be held
+        """
+        self.conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+        try:
+            os.remove(os.path.join(self.directory, fname))
+        except FileNotFoundError:
+            pass
+
+    @property
+    def total_bytes(self) -> int:
+        return self.conn.execute(
+            "SELECT COALESCE(SUM(bytes), 0) FROM entries"
+        ).fetchone()[0]
+
+    @property
+    def metrics(self) -> Dict[str, int]:
+        with self.lock:
+            entries, total = self.conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM entries"
+            ).fetchone()
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "expirations": self.expirations,
+                "evictions": self.evictions,
+                "entries": entries,
+                "bytes": total,
+            }
@@ -0,0 +1,138 @@
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+from agentic_edu.modules.db import is_select, split_sql
+
+# Planner cost units (roughly sequential page reads), well above any sane agent query
+MAX_COST = 1_000_000
+# Planner row estimate for the query's result
+MAX_ROWS = 1_000_000
+# Rows kept when the guard limits a query instead of rejecting it
+LIMIT_ROWS = 10_000
+# Timeout attached to expensive queries the guard lets through
+STATEMENT_TIMEOUT_MS = 30_000
+
+ACTIONS = ("reject", "limit")
+
+MULTIPLE_STATEMENTS_ERROR = {
+    "error": "multiple_statements",
+    "reason": "Only one statement can be run at a time",
+    "suggestion": "Send each statement in its own call.",
+}
+
+
+@dataclass
+class GuardDecision:
+    # the query to run, possibly wrapped in a LIMIT
+    sql: str
+    statement_timeout_ms: Optional[int] = None
+    # set when the query was wrapped in a LIMIT
+    row_limit: Optional[int] = None
+    # planner row estimate of 'sql', None if it cannot be explained
+    estimated_rows: Optional[int] = None
+    # whether the guard explained the query, so estimated_rows is known
+    explained: bool = False
+    # structured error for the agent when the query is rejected
+    error: Optional[dict] = None
+
+    @property
+    def allowed(self) -> bool:
+        return self.error is None
+
+
+class QueryGuard:
+    """
+    Pre-flight check of agent SQL against the planner's estimates.
+
+    EXPLAIN costs a planning round trip but never runs the query, so a
+    missing join condition is caught before it pins the database.
+    With action="reject" expensive queries come back as a structured error
+    the agent can act on; with action="limit" they run wrapped in a LIMIT
+    and under a statement_timeout instead.
+    """
+
+    def __init__(
+        self,
+        max_cost: float = MAX_COST,
+        max_rows: float = MAX_ROWS,
+        action: str = "reject",
+        limit_rows: int = LIMIT_ROWS,
+        statement_timeout_ms: int = STATEMENT_TIMEOUT_MS,
+    ):
+        if action not in ACTIONS:
+            raise ValueError(
+                f"Unsupported action '{action}', expected one of {ACTIONS}"
+            )
+
+        self.max_cost = max_cost
+        self.max_rows = max_rows
+        self.action = action
+        self.limit_rows = limit_rows
+        self.statement_timeout_ms = statement_timeout_ms
+
+    def check(
+        self, sql: str, explain: Callable[[str], Optional[dict]]
+    ) -> GuardDecision:
+        """
+        Decide how to run a query. 'explain' returns the top plan node or None.
+        """
+        if len(split_sql(sql)) > 1:
+            # EXPLAIN would only plan the first statement and run the others
+            return GuardDecision(sql, error=MULTIPLE_STATEMENTS_ERROR)
+
+        plan = explain(sql)
+        if plan is None:
+            # not a plannable query, nothing to estimate
+            return GuardDecision(sql, explained=True)
+
+        estimated_rows = int(plan["Plan Rows"])
+        violations = self.violations(plan)
+        if not violations:
+            return GuardDecision(sql, estimated_rows=estimated_rows, explained=True)
+
+        if self.action == "reject":
+            return GuardDecision(sql, error=self.rejection(plan, violations))
+
+        row_limit = None
+        if "rows" in violations and is_select(sql):
+            sql = limit_sql(sql, self.limit_rows)
+            row_limit = self.limit_rows
+            estimated_rows = min(estimated_rows, row_limit)
+        return GuardDecision(
+            sql,
+            statement_timeout_ms=self.statement_timeout_ms,
+            row_limit=row_limit,
+            estimated_rows=estimated_rows,
+            explained=True,
+        )
+
+    def violations(self, plan: dict) -> List[str]:
+        violations = []
+        if plan["Total Cost"] > self.max_cost:
+            violations.append("cost")
+        if plan["Plan Rows"] > self.max_rows:
+            violations.append("rows")
+        return violations
+
+    def rejection(self, plan: dict, violations: List[str]) -> dict:
+        return {
+            "error": "query_rejected",
+            "reason": "Estimated "
+            + " and ".join(violations)
+            + " exceed the limits for agent queries",
+            "estimated_cost": plan["Total Cost"],
+            "estimated_rows": plan["Plan Rows"],
+            "max_cost": self.max_cost,
+            "max_rows": self.max_rows,
+            "plan_node": plan["Node Type"],
+            "suggestion": "Check every join has a join condition, filter earlier "
+            "or aggregate, and add a LIMIT if only a sample is needed.",
+        }
+
+
+def limit_sql(sql: str, limit_rows: int) -> str:
+    """
+    Wrap a single query so at most 'limit_rows' rows come back
+    """
+    # without comments or semicolons, either would break the nesting
+    query = split_sql(sql)[0]
+    return f"SELECT * FROM (\n{query}\n) AS limited_query LIMIT {int(limit_rows)}"
@@ -0,0 +1,95 @@
+import asyncio
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    A bucket holding up to 'capacity' units, refilled at 'rate_per_minute'.
+    The balance may go negative when usage is recorded after the fact;
+    the debt is paid back by the refill before anything else is taken.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: float = None):
+        self.rate_per_second = rate_per_minute / 60
+        # by default a full minute of quota can be spent at once
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.balance = self.capacity
+        self.updated_at = time.monotonic()
+
+    def refill(self, now: float):
+        elapsed = now - self.updated_at
+        self.balance = min(self.capacity, self.balance + elapsed * self.rate_per_second)
+        self.updated_at = now
+
+    def wait_time(self, amount: float) -> float:
+        """
+        Seconds until 'amount' units are available, 0 if they are now
+        """
+        # a request bigger than the bucket would wait forever, let it drain the bucket
+        amount = min(amount, self.capacity)
+        missing = amount - self.balance
+        if missing <= 0:
+            return 0.0
+        return missing / self.rate_per_second
+
+
+class RateLimiter:
+    """
+    Requests-per-minute and tokens-per-minute quotas as two token buckets.
+
+    reserve() only takes from the buckets when both have room, so a request
+    never holds request quota while it waits for token quota. Either quota
+    can be None to leave it unlimited.
+    """
+
+    def __init__(self, rpm: float = None, tpm: float = None):
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.lock = threading.Lock()
+
+    def reserve(self, tokens: int = 0) -> float:
+        """
+        Take one request and 'tokens' tokens if available.
+        Returns 0 on success, otherwise the seconds to wait before trying again.
+        """
+        with self.lock:
+            now = time.monotonic()
+            wait = 0.0
+            for bucket, amount in ((self.requests, 1), (self.tokens, tokens)):
+                if bucket is not None:
+                    bucket.refill(now)
+                    wait = max(wait, bucket.wait_time(amount))
+
+            if wait > 0:
+                return wait
+
+            if self.requests is not None:
+                self.requests.balance -= 1
+            if self.tokens is not None:
+                self.tokens.balance -= min(tokens, self.tokens.capacity)
+            return 0.0
+
+    def consume(self, tokens: int):
+        """
+        Record tokens used beyond the reservation, e.g. the completion
+        """
+        if self.tokens is None or tokens <= 0:
+            return
+        with self.lock:
+            self.tokens.refill(time.monotonic())
+            self.tokens.balance -= tokens
+
+    def acquire(self, tokens: int = 0):
+        """
+        Block until a request with 'tokens' tokens fits in the quotas
+        """
+        while (wait := self.reserve(tokens)) > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens: int = 0):
+        """
+        Like acquire() but yields to the event loop while waiting
+        """
+        while (wait := self.reserve(tokens)) > 0:
+            await asyncio.sleep(wait)
@@ -0,0 +1,311 @@
+"""
+Purpose:
+    Keep transient LLM endpoint failures (429 / 5xx / dropped connections)
+    from killing a conversation: retries with jittered exponential backoff
+    that honour Retry-After, a circuit breaker per endpoint, and hedged
+    requests for latency sensitive calls.
+"""
+
+import asyncio
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from email.utils import parsedate_to_datetime
+import random
+import threading
+import time
+from typing import Callable, Dict, Optional
+import openai
+
+# attempts per call, including the first one
+MAX_ATTEMPTS = 5
+# backoff before the second attempt, doubled for every further attempt
+BASE_DELAY = 1.0
+# ceiling of the computed backoff, Retry-After may ask for longer
+MAX_DELAY = 60.0
+
+# consecutive failures that open an endpoint's circuit
+FAILURE_THRESHOLD = 5
+# seconds an open circuit rejects calls before letting one through to probe
+RESET_TIMEOUT = 30.0
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+RETRYABLE_ERRORS = (
+    openai.error.RateLimitError,
+    openai.error.ServiceUnavailableError,
+    openai.error.APIConnectionError,
+    openai.error.Timeout,
+    TimeoutError,
+    ConnectionError,
+)
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+def is_retryable(error: BaseException) -> bool:
+    """
+    Transient errors worth another attempt: throttling, server errors, timeouts
+    """
+    if isinstance(error, RETRYABLE_ERRORS):
+        return True
+    return getattr(error, "http_status", None) in RETRYABLE_STATUS
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """
+    Seconds the server asked us to wait via the Retry-After header, if any
+    """
+    headers = getattr(error, "headers", None) or {}
+    value = headers.get("retry-after") or headers.get("Retry-After")
+    if value is None:
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    # Retry-After may also be an HTTP date
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class CircuitBreaker:
+    """
+    Stops calling an endpoint after 'failure_threshold' consecutive failures.
+
+    While open every call fails fast with CircuitOpenError. After
+    'reset_timeout' seconds one call is let through (half open): its success
+    closes the circuit, its failure opens it again.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = FAILURE_THRESHOLD,
+        reset_timeout: float = RESET_TIMEOUT,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.lock = threading.Lock()
+
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    def before_call(self):
+        with self.lock:
+            if self.state == "closed":
+                return
+
+            if self.state == "open":
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    raise CircuitOpenError(f"Circuit for '{self.name}' is open")
+                self.state = "half_open"
+                self.probing = False
+
+            # half open - only one probe at a time
+            if self.probing:
+                raise CircuitOpenError(f"Circuit for '{self.name}' is half open")
+            self.probing = True
+
+    def record_success(self):
+        with self.lock:
+            self.state = "closed"
+            self.failures = 0
+            self.probing = False
+
+    def release(self):
+        """
+        End a call that says nothing about the endpoint's health, e.g. one
+        that failed with a non retryable error, without changing the state
+        """
+        with self.lock:
+            self.probing = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            self.probing = False
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+
+# endpoint name -> breaker, shared by every caller in the process
+circuit_breakers: Dict[str, CircuitBreaker] = {}
+circuit_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(endpoint: str) -> CircuitBreaker:
+    with circuit_breakers_lock:
+        if endpoint not in circuit_breakers:
+            circuit_breakers[endpoint] = CircuitBreaker(endpoint)
+        return circuit_breakers[endpoint]
+
+
+class RetryPolicy:
+    """
+    Retries transient failures with "full jitter" exponential backoff.
+
+    The n-th retry waits a random time up to base_delay * 2**(n-1), capped at
+    max_delay, or longer if the server sent Retry-After. Non retryable errors
+    and an open circuit are raised straight away.
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = MAX_ATTEMPTS,
+        base_delay: float = BASE_DELAY,
+        max_delay: float = MAX_DELAY,
+        retryable: Callable[[BaseException], bool] = is_retryable,
+    ):
+        if max_attempts < 1:
+            raise ValueError("max_attempts must be at least 1")
+
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retryable = retryable
+
+    def delay(self, attempt: int, error: BaseException) -> float:
+        """
+        Seconds to wait after the 'attempt'-th attempt (1 based) failed
+        """
+        backoff = random.uniform(
+            0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        )
+        server_delay = retry_after(error)
+        if server_delay is not None:
+            return max(backoff, server_delay)
+        return backoff
+
+    def failed(
+        self, attempt: int, error: BaseException, breaker: CircuitBreaker = None
+    ) -> float:
+        """
+        Handle a failed attempt: re-raise if it should not be retried,
+        otherwise return the delay before the next attempt
+        """
+        if not self.retryable(error):
+            # settle a half open probe, or every later call fails fast for good
+            if breaker is not None:
+                breaker.release()
+            raise error
+
+        if breaker is not None:
+            breaker.record_failure()
+
+        if attempt >= self.max_attempts:
+            raise error
+
+        return self.delay(attempt, error)
+
+    def call(self, func: Callable, *args, breaker: CircuitBreaker = None, **kwargs):
+        for attempt in range(1, self.max_attempts + 1):
+            if breaker is not None:
+                breaker.before_call()
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                time.sleep(self.failed(attempt, e, breaker))
+                continue
+            except BaseException:
+                if breaker is not None:
+                    breaker.release()
+                raise
+
+            if breaker is not None:
+                breaker.record_success()
+            return result
+
+    async def acall(
+        self, func: Callable, *args, breaker: CircuitBreaker = None, **kwargs
+    ):
+        """
+        Like call() for coroutine functions
+        """
+        for attempt in range(1, self.max_attempts + 1):
+            if breaker is not None:
+                breaker.before_call()
+            try:
+                result = await func(*args, **kwargs)
+            except Exception as e:
+                await asyncio.sleep(self.failed(attempt, e, breaker))
+                continue
+            except BaseException:
+                # e.g. the task was cancelled
+                if breaker is not None:
+                    breaker.release()
+                raise
+
+            if breaker is not None:
+                breaker.record_success()
+            return result
+
+
+def hedged(func: Callable, hedge_after: float, max_hedges: int = 1):
+    """
+    Call 'func' and, if it has not returned after 'hedge_after' seconds, call
+    it again in parallel (up to 'max_hedges' extra times). The first result
+    wins; the slower calls are abandoned. Only use for idempotent calls.
+    """
+    executor = ThreadPoolExecutor(max_workers=max_hedges + 1)
+    try:
+        pending = {executor.submit(func)}
+        launched = 1
+        error = None
+
+        while pending:
+            timeout = hedge_after if launched <= max_hedges else None
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+
+            # a failed or slow call both start the next hedge
+            if launched <= max_hedges:
+                pending.add(executor.submit(func))
+                launched += 1
+
+        raise error
+    finally:
+        # don't wait for the losers
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def ahedged(func: Callable, hedge_after: float, max_hedges: int = 1):
+    """
+    Like hedged() for coroutine functions, the losers are cancelled
+    """
+    pending = {asyncio.ensure_future(func())}
+    launched = 1
+    error = None
+
+    try:
+        while pending:
+            timeout = hedge_after if launched <= max_hedges else None
+            done, pending = await asyncio.wait(
+                pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+            )
+
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+
+            if launched <= max_hedges:
+                pending.add(asyncio.ensure_future(func()))
+                launched += 1
+
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
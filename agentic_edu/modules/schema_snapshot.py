@@ -0,0 +1,114 @@
+import hashlib
+import json
+import os
+from typing import Dict, List, Tuple
+import uuid
+
+
+def schema_version(fingerprints: Dict[str, str]) -> str:
+    """
+    A single fingerprint for a whole schema from its per-table fingerprints
+    """
+    content = json.dumps(fingerprints, sort_keys=True)
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+class SchemaSnapshot:
+    """
+    Local copy of a database's table definitions.
+
+    Every table is stored with a fingerprint (an md5 of its column list
+    computed by Postgres), so comparing the snapshot against a fresh set of
+    fingerprints tells us exactly which tables need to be re-read.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        # table name -> {"fingerprint": str, "definition": str}
+        self.tables: Dict[str, Dict[str, str]] = {}
+        # foreign keys as (referencing table, referenced table) pairs
+        self.foreign_keys: List[List[str]] = []
+        self.foreign_keys_fingerprint = None
+        self.load()
+
+    def load(self):
+        """
+        Load the snapshot from disk if it exists
+        """
+        if not os.path.exists(self.path):
+            return
+
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+            self.tables = data["tables"]
+            self.foreign_keys = data["foreign_keys"]["edges"]
+            self.foreign_keys_fingerprint = data["foreign_keys"]["fingerprint"]
+        except (json.JSONDecodeError, KeyError, TypeError):
+            # a corrupt snapshot is just a cold cache
+            self.tables = {}
+            self.foreign_keys = []
+            self.foreign_keys_fingerprint = None
+
+    def save(self):
+        """
+        Write the snapshot to disk atomically
+        """
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # a unique temporary name so concurrent refreshes never share one
+        tmp_path = f"{self.path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(
+                {
+                    "tables": self.tables,
+                    "foreign_keys": {
+                        "fingerprint": self.foreign_keys_fingerprint,
+                        "edges": self.foreign_keys,
+                    },
+                },
+                f,
+            )
+        os.replace(tmp_path, self.path)
+
+    @property
+    def definitions(self) -> Dict[str, str]:
+        return {name: table["definition"] for name, table in self.tables.items()}
+
+    @property
+    def version(self) -> str:
+        """
+        A single fingerprint for the whole schema
+        """
+        return schema_version(
+            {name: table["fingerprint"] for name, table in self.tables.items()}
+        )
+
+    def diff(self, fingerprints: Dict[str, str]) -> Tuple[List[str], List[str]]:
+        """
+        Compare fresh fingerprints with the snapshot.
+        Returns the tables that are new or altered and the tables that were dropped.
+        """
+        changed = [
+            name
+            for name, fingerprint in fingerprints.items()
+            if self.tables.get(name, {}).get("fingerprint") != fingerprint
+        ]
+        removed = [name for name in self.tables if name not in fingerprints]
+        return changed, removed
+
+    def update(self, tables: Dict[str, Tuple[str, str]], removed: List[str] = None):
+        """
+        Store (fingerprint, definition) for changed tables and forget dropped ones
+        """
+        for name, (fingerprint, definition) in tables.items():
+            self.tables[name] = {"fingerprint": fingerprint, "definition": definition}
+
+        for name in removed or []:
+            self.tables.pop(name, None)
+
+    def update_foreign_keys(self, fingerprint: str, edges: List[Tuple[str, str]]):
+        self.foreign_keys_fingerprint = fingerprint
+        self.foreign_keys = [list(edge) for edge in edges]
@@ -0,0 +1,196 @@
+"""
+Purpose:
+    Account for what LLM calls actually cost, from the 'usage' block of every
+    completion response, priced per model and rolled up per session, team
+    and model.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+import threading
+from typing import Dict, List, Optional, Tuple
+import autogen
+
+# USD per 1k (prompt, completion) tokens
+MODEL_PRICING: Dict[str, Tuple[float, float]] = {
+    "gpt-4": (0.03, 0.06),
+    "gpt-4-32k": (0.06, 0.12),
+    "gpt-4-1106-preview": (0.01, 0.03),
+    "gpt-3.5-turbo": (0.0015, 0.002),
+    "gpt-3.5-turbo-16k": (0.003, 0.004),
+    "gpt-3.5-turbo-1106": (0.001, 0.002),
+}
+
+# unknown models are priced like gpt-4 to stay on the conservative side
+DEFAULT_PRICING = MODEL_PRICING["gpt-4"]
+
+# ledger the autogen completions of the running code are recorded in
+current_ledger: ContextVar[Optional["UsageLedger"]] = ContextVar(
+    "current_ledger", default=None
+)
+
+# the ChatCompletion.create installed by record_chat_completions
+recording_create = None
+
+
+def model_pricing(
+    model: str, pricing: Dict[str, Tuple[float, float]] = MODEL_PRICING
+) -> Tuple[float, float]:
+    """
+    Pricing of a model, matching snapshots like "gpt-4-0613" to "gpt-4"
+    and Azure deployments of "gpt-35-turbo" to "gpt-3.5-turbo"
+    """
+    model = model.replace("gpt-35-turbo", "gpt-3.5-turbo")
+    if model in pricing:
+        return pricing[model]
+
+    prefixes = [name for name in pricing if model.startswith(name + "-")]
+    if not prefixes:
+        return DEFAULT_PRICING
+    return pricing[max(prefixes, key=len)]
+
+
+@dataclass
+class Usage:
+    calls: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cost: float = 0.0
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    def add(self, other: "Usage"):
+        self.calls += other.calls
+        self.prompt_tokens += other.prompt_tokens
+        self.completion_tokens += other.completion_tokens
+        self.cost += other.cost
+
+
+class UsageLedger:
+    """
+    Records the token usage and cost of LLM calls.
+
+    Ledgers nest: child(team=...) returns a ledger whose records are also
+    added to this one with the child's labels, so a session ledger sees
+    every team's calls and by("team") splits them up again.
+    """
+
+    def __init__(
+        self,
+        labels: Dict[str, str] = None,
+        pricing: Dict[str, Tuple[float, float]] = MODEL_PRICING,
+        parent: "UsageLedger" = None,
+    ):
+        self.labels = dict(labels or {})
+        self.pricing = pricing
+        self.parent = parent
+        self.lock = threading.Lock()
+
+        # (labels, usage) of every call, labels include "model"
+        self.records: List[Tuple[Dict[str, str], Usage]] = []
+
+    def child(self, **labels) -> "UsageLedger":
+        return UsageLedger({**self.labels, **labels}, self.pricing, parent=self)
+
+    def record(self, model: str, prompt_tokens: int, completion_tokens: int) -> Usage:
+        """
+        Record one call and return its priced usage
+        """
+        prompt_price, completion_price = model_pricing(model, self.pricing)
+        usage = Usage(
+            calls=1,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            cost=(prompt_tokens * prompt_price + completion_tokens * completion_price)
+            / 1000,
+        )
+        self.add_record({**self.labels, "model": model}, usage)
+        return usage
+
+    def add_record(self, labels: Dict[str, str], usage: Usage):
+        with self.lock:
+            self.records.append((labels, usage))
+        if self.parent is not None:
+            self.parent.add_record(labels, usage)
+
+    def record_response(self, response, model: str = None):
+        """
+        Record the usage block of a chat completion response.
+        Responses without one (e.g. served from a cache) cost nothing.
+        """
+        usage = response.get("usage") if response else None
+        if not usage:
+            return None
+        return self.record(
+            response.get("model") or model or "unknown",
+            usage.get("prompt_tokens", 0),
+            usage.get("completion_tokens", 0),
+        )
+
+    @contextmanager
+    def recording(self):
+        """
+        Record every autogen chat completion made in this context, e.g.
+
+            with ledger.recording():
+                agent.generate_reply(sender=sender)
+        """
+        record_chat_completions()
+        token = current_ledger.set(self)
+        try:
+            yield self
+        finally:
+            current_ledger.reset(token)
+
+    @property
+    def total(self) -> Usage:
+        total = Usage()
+        with self.lock:
+            for _, usage in self.records:
+                total.add(usage)
+        return total
+
+    def by(self, label: str) -> Dict[str, Usage]:
+        """
+        Totals grouped by a label, e.g. "model", "team" or "session"
+        """
+        totals: Dict[str, Usage] = {}
+        with self.lock:
+            for labels, usage in self.records:
+                totals.setdefault(labels.get(label), Usage()).add(usage)
+        return totals
+
+
+def record_chat_completions():
+    """
+    Wrap autogen's ChatCompletion.create, once, so the usage block of every
+    completion is recorded in the ledger of the current context (see
+    UsageLedger.recording). autogen drops the response after extracting
+    the reply, this is the one place that sees every one of them.
+    """
+    global recording_create
+
+    if vars(autogen.oai.ChatCompletion).get("create") is recording_create:
+        return
+
+    create = autogen.oai.ChatCompletion.create
+
+    def record_create(*args, **kwargs):
+        ledger = current_ledger.get()
+        # create calls itself for every config_list entry it tries, only the
+        # outermost call records, with the response that was used
+        token = current_ledger.set(None)
+        try:
+            response = create(*args, **kwargs)
+        finally:
+            current_ledger.reset(token)
+
+        if ledger is not None and response != -1:
+            ledger.record_response(response, kwargs.get("model"))
+        return response
+
+    recording_create = staticmethod(record_create)
+    autogen.oai.ChatCompletion.create = recording_create
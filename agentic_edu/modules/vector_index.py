@@ -0,0 +1,174 @@
+"""
+Purpose:
+    Nearest-neighbour indexes over unit-length embedding matrices.
+    Exact search scores every row, IVF trades a little recall for
+    scoring only the rows in the clusters closest to the query.
+"""
+
+import math
+from typing import Optional, Tuple
+import numpy as np
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Indices of the 'k' highest scores, best first.
+    argpartition finds the top k in O(N), only those k are then sorted.
+    """
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    if k < len(scores):
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(len(scores))
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+class VectorIndex:
+    """
+    Base class for indexes over an (N, D) matrix of unit-length vectors.
+
+    The index does not own the vectors: build() sees the matrix once and
+    search() is handed the same matrix again, so the embedder stays the
+    single owner of the embedding memory.
+    """
+
+    def build(self, vectors: np.ndarray):
+        """
+        (Re)build the index for the given vectors
+        """
+        raise NotImplementedError
+
+    def search(
+        self, vectors: np.ndarray, query: np.ndarray, k: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return the row indices and scores of the 'k' best matches, best first
+        """
+        raise NotImplementedError
+
+
+class ExactIndex(VectorIndex):
+    """
+    Brute-force search: one matrix-vector product over every row
+    """
+
+    def build(self, vectors: np.ndarray):
+        pass
+
+    def search(
+        self, vectors: np.ndarray, query: np.ndarray, k: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        scores = vectors @ query
+        indices = top_k(scores, k)
+        return indices, scores[indices]
+
+
+class IVFIndex(VectorIndex):
+    """
+    Inverted file index.
+
+    Vectors are clustered with spherical k-means into 'n_lists' lists. A query
+    is scored against the centroids first and only the rows of the 'n_probe'
+    closest lists are scored exactly. Raising n_probe raises recall and
+    latency; n_probe == n_lists is exact search.
+
+    Indexes smaller than 'min_vectors' are searched exhaustively since
+    clustering buys nothing at that size.
+    """
+
+    def __init__(
+        self,
+        n_lists: Optional[int] = None,
+        n_probe: int = 8,
+        n_iter: int = 10,
+        min_vectors: int = 1024,
+        seed: int = 0,
+    ):
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.n_iter = n_iter
+        self.min_vectors = min_vectors
+        self.seed = seed
+
+        self.centroids: Optional[np.ndarray] = None
+        # CSR layout: rows of list i are members[offsets[i] : offsets[i + 1]]
+        self.members: Optional[np.ndarray] = None
+        self.offsets: Optional[np.ndarray] = None
+
+    def build(self, vectors: np.ndarray):
+        self.centroids = None
+        self.members = None
+        self.offsets = None
+
+        total = len(vectors)
+        if total < self.min_vectors:
+            return
+
+        n_lists = self.n_lists or int(math.sqrt(total))
+        n_lists = max(1, min(n_lists, total))
+
+        self.centroids = self.train_centroids(vectors, n_lists)
+
+        assignments = self.assign(vectors, self.centroids)
+        self.members = np.argsort(assignments, kind="stable")
+        counts = np.bincount(assignments, minlength=n_lists)
+        self.offsets = np.concatenate([[0], np.cumsum(counts)])
+
+    def train_centroids(self, vectors: np.ndarray, n_lists: int) -> np.ndarray:
+        """
+        Spherical k-means on a sample of the vectors
+        """
+        rng = np.random.default_rng(self.seed)
+
+        # a few hundred points per list is plenty to place the centroids
+        sample_size = min(len(vectors), 256 * n_lists)
+        sample_rows = np.sort(rng.choice(len(vectors), sample_size, replace=False))
+        sample = np.asarray(vectors[sample_rows], dtype=np.float32)
+
+        centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+
+        for _ in range(self.n_iter):
+            assignments = self.assign(sample, centroids)
+
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, sample)
+
+            # keep the previous centroid for lists that lost all their members
+            empty = np.bincount(assignments, minlength=n_lists) == 0
+            sums[empty] = centroids[empty]
+
+            norms = np.linalg.norm(sums, axis=1)
+            centroids = sums / np.where(norms == 0, 1, norms)[:, None]
+
+        return centroids.astype(np.float32)
+
+    def assign(
+        self, vectors: np.ndarray, centroids: np.ndarray, chunk_size: int = 8192
+    ) -> np.ndarray:
+        """
+        Index of the closest centroid for every vector, in chunks to bound memory
+        """
+        assignments = np.zeros(len(vectors), dtype=np.int64)
+        for start in range(0, len(vectors), chunk_size):
+            chunk = np.asarray(vectors[start : start + chunk_size], dtype=np.float32)
+            assignments[start : start + chunk_size] = np.argmax(
+                chunk @ centroids.T, axis=1
+            )
+        return assignments
+
+    def search(
+        self, vectors: np.ndarray, query: np.ndarray, k: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        if self.centroids is None:
+            return ExactIndex().search(vectors, query, k)
+
+        probes = top_k(self.centroids @ query, self.n_probe)
+        candidates = np.concatenate(
+            [self.members[self.offsets[p] : self.offsets[p + 1]] for p in probes]
+        )
+
+        scores = vectors[candidates] @ query
+        best = top_k(scores, k)
+        return candidates[best], scores[best]
@@ -1,5 +1,5 @@
-from dataclasses import dataclass
-from typing import List
+from dataclasses import dataclass, field
+from typing import Dict, List
 
 
 @dataclass
@@ -17,3 +17,17 @@ class ConversationResult:
     tokens: int
     last_message_str: str
     error_message: str
+
+
+@dataclass
+class TokenUsage:
+    # tokens of prompts handed to the team
+    prompt_tokens: int = 0
+    # tokens of the agents' replies
+    completion_tokens: int = 0
+    # agent name -> tokens of its replies
+    by_agent: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
@@ -0,0 +1,59 @@
+"""
+Purpose:
+    Measure how float16 / int8 embedding storage affects table retrieval.
+    Reports memory per table and recall@k / top-1 agreement / score error
+    against the float32 baseline.
+
+Usage:
+    poetry run python benchmarks/quantization_benchmark.py --tables 20000
+"""
+
+import argparse
+import numpy as np
+from agentic_edu.modules.quantization import QuantizedMatrix, SUPPORTED_DTYPES
+from agentic_edu.modules.vector_index import ExactIndex
+from vector_index_benchmark import make_embeddings, recall_at_k, run_queries
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tables", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    vectors = make_embeddings(args.tables, args.dim, args.clusters)
+    queries = make_embeddings(args.queries, args.dim, args.clusters, seed=1)
+
+    index = ExactIndex()
+    baseline = QuantizedMatrix(args.dim)
+    baseline.append(vectors)
+    baseline_results, baseline_latencies = run_queries(index, baseline, queries, args.k)
+
+    print(f"tables={args.tables} dim={args.dim} queries={args.queries} k={args.k}")
+    print(
+        f"{'dtype':<10}{'bytes/table':>12}{'recall@k':>10}{'top1':>8}"
+        f"{'max_err':>10}{'p50_ms':>10}"
+    )
+
+    for dtype in SUPPORTED_DTYPES:
+        matrix = QuantizedMatrix(args.dim, dtype)
+        matrix.append(vectors)
+        results, latencies = run_queries(index, matrix, queries, args.k)
+
+        top1 = np.mean([r[0] == b[0] for r, b in zip(results, baseline_results)])
+        max_error = max(
+            np.abs((matrix @ query) - (baseline @ query)).max() for query in queries
+        )
+
+        print(
+            f"{dtype:<10}{matrix.nbytes / args.tables:>12.0f}"
+            f"{recall_at_k(results, baseline_results):>10.3f}{top1:>8.3f}"
+            f"{max_error:>10.5f}{np.percentile(latencies, 50):>10.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Purpose:
+    Compare approximate (IVF) table retrieval against exact search.
+    Reports recall@k and p50/p99 query latency on synthetic clustered
+    embeddings shaped like BERT table embeddings.
+
+Usage:
+    poetry run python benchmarks/vector_index_benchmark.py --tables 50000
+"""
+
+import argparse
+import time
+import numpy as np
+from agentic_edu.modules.vector_index import ExactIndex, IVFIndex, VectorIndex
+
+
+def make_embeddings(n: int, dim: int, clusters: int, seed: int = 0) -> np.ndarray:
+    """
+    Unit-length vectors grouped around random centers, like tenant schemas
+    that share most of their table shapes.
+    """
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    noise = rng.standard_normal((n, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, n)] + 0.5 * noise
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def run_queries(index: VectorIndex, vectors: np.ndarray, queries: np.ndarray, k: int):
+    """
+    Run every query, returning the result indices and per-query latency in ms
+    """
+    results = []
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        indices, _ = index.search(vectors, query, k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append(indices)
+    return results, np.array(latencies)
+
+
+def recall_at_k(approximate: list, exact: list) -> float:
+    hits = sum(
+        len(set(a.tolist()) & set(e.tolist())) for a, e in zip(approximate, exact)
+    )
+    return hits / sum(len(e) for e in exact)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tables", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--n-lists", type=int, default=None)
+    parser.add_argument("--n-probe", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    args = parser.parse_args()
+
+    vectors = make_embeddings(args.tables, args.dim, args.clusters)
+    queries = make_embeddings(args.queries, args.dim, args.clusters, seed=1)
+
+    exact_index = ExactIndex()
+    exact_results, exact_latencies = run_queries(exact_index, vectors, queries, args.k)
+
+    print(f"tables={args.tables} dim={args.dim} queries={args.queries} k={args.k}")
+    print(f"{'index':<24}{'build_s':>10}{'recall@k':>10}{'p50_ms':>10}{'p99_ms':>10}")
+    print(
+        f"{'exact':<24}{0.0:>10.2f}{1.0:>10.3f}"
+        f"{np.percentile(exact_latencies, 50):>10.3f}"
+        f"{np.percentile(exact_latencies, 99):>10.3f}"
+    )
+
+    ivf_index = IVFIndex(n_lists=args.n_lists, min_vectors=0)
+    start = time.perf_counter()
+    ivf_index.build(vectors)
+    build_seconds = time.perf_counter() - start
+
+    for n_probe in args.n_probe:
+        ivf_index.n_probe = n_probe
+        results, latencies = run_queries(ivf_index, vectors, queries, args.k)
+        name = f"ivf(lists={len(ivf_index.centroids)},probe={n_probe})"
+        print(
+            f"{name:<24}{build_seconds:>10.2f}"
+            f"{recall_at_k(results, exact_results):>10.3f}"
+            f"{np.percentile(latencies, 50):>10.3f}"
+            f"{np.percentile(latencies, 99):>10.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
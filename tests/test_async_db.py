@@ -0,0 +1,211 @@
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+from agentic_edu.modules import async_db
+from agentic_edu.modules.async_db import AsyncPostgresManager
+from agentic_edu.modules.db import GET_FOREIGN_KEYS_STMT, GET_TABLE_FINGERPRINTS_STMT
+from agentic_edu.modules.schema_snapshot import SchemaSnapshot
+
+
+class FakeRecord(dict):
+    """
+    asyncpg records support both dict() and positional access
+    """
+
+    def __iter__(self):
+        return iter(self.values())
+
+    def __getitem__(self, key):
+        if isinstance(key, int):
+            return list(self.values())[key]
+        return super().__getitem__(key)
+
+    def keys(self):
+        return list(super().keys())
+
+
+def fake_pool(responses):
+    """
+    A pool whose connections answer fetch(sql) from a {sql: records} map
+    """
+    conn = MagicMock()
+    conn.fetch = AsyncMock(side_effect=lambda sql, *args: responses[sql])
+    conn.execute = AsyncMock()
+
+    @asynccontextmanager
+    async def transaction():
+        yield
+
+    conn.transaction = transaction
+
+    @asynccontextmanager
+    async def acquire():
+        yield conn
+
+    pool = MagicMock()
+    pool.acquire = acquire
+    pool.close = AsyncMock()
+    return pool, conn
+
+
+class TestAsyncPostgresManager(unittest.TestCase):
+    def make_manager(self, responses, snapshot=None):
+        pool, conn = fake_pool(responses)
+        manager = AsyncPostgresManager(snapshot=snapshot)
+        manager.connect_with_pool(pool)
+        return manager, pool, conn
+
+    def test_run_sql(self):
+        sql = "SELECT * FROM users"
+        manager, _, _ = self.make_manager(
+            {sql: [FakeRecord({"id": 1, "created_at": datetime(2023, 1, 1, 9, 30)})]}
+        )
+
+        result = asyncio.run(manager.run_sql(sql))
+
+        self.assertEqual(
+            json.loads(result), [{"id": 1, "created_at": "2023-01-01T09:30:00"}]
+        )
+
+    def test_run_sql_with_statement_timeout(self):
+        sql = "SELECT 1"
+        manager, _, conn = self.make_manager({sql: []})
+
+        asyncio.run(manager.run_sql(sql, statement_timeout_ms=5000))
+
+        conn.execute.assert_awaited_once_with(
+            "SELECT set_config('statement_timeout', $1, true)", "5000"
+        )
+
+    def test_get_all_table_names(self):
+        manager, _, _ = self.make_manager(
+            {
+                async_db.GET_ALL_TABLE_NAMES_STMT: [
+                    FakeRecord({"tablename": "users"}),
+                    FakeRecord({"tablename": "orders"}),
+                ]
+            }
+        )
+        self.assertEqual(
+            asyncio.run(manager.get_all_table_names()), ["users", "orders"]
+        )
+
+    def test_get_table_definition(self):
+        manager, _, conn = self.make_manager(
+            {
+                async_db.ASYNC_GET_TABLE_DEFINITIONS_FOR_TABLES_STMT: [
+                    FakeRecord(
+                        {
+                            "tablename": "users",
+                            "columns": "id integer",
+                            "fingerprint": "fp",
+                        }
+                    )
+                ]
+            }
+        )
+
+        definition = asyncio.run(manager.get_table_definition("users"))
+
+        self.assertEqual(definition, "CREATE TABLE users (\nid integer\n);")
+        conn.fetch.assert_awaited_once_with(
+            async_db.ASYNC_GET_TABLE_DEFINITIONS_FOR_TABLES_STMT, ["users"]
+        )
+        self.assertIn(
+            "ANY($1::text[])", async_db.ASYNC_GET_TABLE_DEFINITIONS_FOR_TABLES_STMT
+        )
+
+    def test_get_related_tables(self):
+        manager, _, conn = self.make_manager(
+            {
+                GET_FOREIGN_KEYS_STMT: [
+                    FakeRecord({"src": "orders", "dst": "users"}),
+                    FakeRecord({"src": "order_items", "dst": "orders"}),
+                    FakeRecord({"src": "order_items", "dst": "products"}),
+                ]
+            }
+        )
+
+        async def run():
+            first = await manager.get_related_tables(["orders"], n=5)
+            second = await manager.get_related_tables(["order_items"], n=5)
+            return first, second
+
+        first, second = asyncio.run(run())
+
+        self.assertEqual(first, ["order_items", "users"])
+        self.assertEqual(second, ["orders", "products"])
+        # the graph is loaded once
+        self.assertEqual(conn.fetch.await_count, 1)
+
+    def test_snapshot_only_rereads_changed_tables(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            snapshot = SchemaSnapshot(os.path.join(tmp_dir, "snapshot.json"))
+            snapshot.update({"users": ("fp1", "CREATE TABLE users (\nid integer\n);")})
+            manager, _, conn = self.make_manager(
+                {
+                    GET_TABLE_FINGERPRINTS_STMT: [
+                        FakeRecord({"tablename": "users", "fingerprint": "fp1"}),
+                        FakeRecord({"tablename": "orders", "fingerprint": "fp2"}),
+                    ],
+                    async_db.ASYNC_GET_TABLE_DEFINITIONS_FOR_TABLES_STMT: [
+                        FakeRecord(
+                            {
+                                "tablename": "orders",
+                                "columns": "id integer",
+                                "fingerprint": "fp2",
+                            }
+                        )
+                    ],
+                },
+                snapshot=snapshot,
+            )
+
+            definitions = asyncio.run(manager.get_table_definition_map())
+
+        self.assertEqual(sorted(definitions), ["orders", "users"])
+        conn.fetch.assert_any_await(
+            async_db.ASYNC_GET_TABLE_DEFINITIONS_FOR_TABLES_STMT, ["orders"]
+        )
+
+    def test_concurrent_calls(self):
+        sql = "SELECT 1"
+        manager, _, conn = self.make_manager({sql: [FakeRecord({"x": 1})]})
+
+        async def run():
+            return await asyncio.gather(*(manager.run_sql(sql) for _ in range(10)))
+
+        self.assertEqual(len(asyncio.run(run())), 10)
+        self.assertEqual(conn.fetch.await_count, 10)
+
+    def test_connect_with_url_owns_pool(self):
+        pool = MagicMock()
+        pool.close = AsyncMock()
+        asyncpg = MagicMock()
+        asyncpg.create_pool = AsyncMock(return_value=pool)
+
+        async def run():
+            async with AsyncPostgresManager() as manager:
+                await manager.connect_with_url("postgres://", max_size=4)
+
+        with patch.object(async_db, "load_asyncpg", return_value=asyncpg):
+            asyncio.run(run())
+
+        asyncpg.create_pool.assert_awaited_once_with(
+            "postgres://", min_size=1, max_size=4
+        )
+        pool.close.assert_awaited_once()
+
+    def test_borrowed_pool_is_not_closed(self):
+        manager, pool, _ = self.make_manager({})
+        asyncio.run(manager.close())
+        pool.close.assert_not_awaited()
+
+
+if __name__ == "__main__":
+    unittest.main()
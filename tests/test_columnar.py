@@ -0,0 +1,121 @@
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+import json
+import os
+from agentic_edu.modules import columnar
+import pytest
+
+
+def make_rows(n=2000):
+    start = datetime(2023, 1, 1, 12, 0)
+    return [
+        (
+            i,
+            f"customer_{i % 50}",
+            Decimal(f"{i}.25"),
+            start + timedelta(minutes=i),
+            date(2023, 1, 1) + timedelta(days=i % 365),
+            i % 3 == 0,
+        )
+        for i in range(n)
+    ]
+
+
+COLUMNS = ["id", "name", "amount", "created_at", "day", "flag"]
+
+
+def test_npz_round_trip_preserves_types(tmp_path):
+    fname = str(tmp_path / "results.npz")
+    rows = [
+        (1, "a", Decimal("10.10"), datetime(2023, 5, 1, 8, 30), date(2023, 5, 1), True),
+        (2, None, None, None, None, False),
+    ]
+    row_count = columnar.write_npz_file(fname, COLUMNS, iter([rows[:1], rows[1:]]))
+    assert row_count == 2
+
+    data = columnar.read_npz_file(fname)
+    assert list(data) == COLUMNS
+    assert data["id"] == [1, 2]
+    assert data["name"] == ["a", None]
+    assert data["amount"] == [Decimal("10.10"), None]
+    assert data["created_at"] == [datetime(2023, 5, 1, 8, 30), None]
+    assert data["day"] == [date(2023, 5, 1), None]
+    assert data["flag"] == [True, False]
+
+
+def test_npz_timezone_aware_timestamps(tmp_path):
+    fname = str(tmp_path / "results.npz")
+    tz = timezone(timedelta(hours=2))
+    created_at = datetime(2023, 5, 1, 10, 0, tzinfo=tz)
+    columnar.write_npz_file(fname, ["created_at"], iter([[(created_at,)]]))
+
+    (value,) = columnar.read_npz_file(fname)["created_at"]
+    assert value == created_at
+    assert value.tzinfo == timezone.utc
+
+
+def test_npz_null_timezone_aware_timestamp(tmp_path):
+    fname = str(tmp_path / "results.npz")
+    created_at = datetime(2023, 5, 1, 10, 0, tzinfo=timezone.utc)
+    columnar.write_npz_file(fname, ["created_at"], iter([[(created_at,), (None,)]]))
+
+    assert columnar.read_npz_file(fname)["created_at"] == [created_at, None]
+
+
+def test_npz_empty_result(tmp_path):
+    fname = str(tmp_path / "results.npz")
+    assert columnar.write_npz_file(fname, ["id"], iter([])) == 0
+    assert columnar.read_npz_file(fname) == {"id": []}
+
+
+def test_npz_is_much_smaller_than_json(tmp_path):
+    rows = make_rows()
+    fname = str(tmp_path / "results.npz")
+    columnar.write_npz_file(fname, COLUMNS, iter([rows]))
+
+    as_json = json.dumps(
+        [dict(zip(COLUMNS, row)) for row in rows], indent=4, default=str
+    )
+    assert os.path.getsize(fname) * 5 < len(as_json)
+
+
+def test_unsupported_format(tmp_path):
+    with pytest.raises(ValueError):
+        columnar.write_columnar_file(str(tmp_path / "x"), ["id"], iter([]), fmt="csv")
+
+
+@pytest.mark.skipif(columnar.pa is None, reason="pyarrow is not installed")
+def test_parquet_round_trip(tmp_path):
+    fname = str(tmp_path / "results.parquet")
+    rows = make_rows(10)
+    row_count = columnar.write_parquet_file(fname, COLUMNS, iter([rows[:5], rows[5:]]))
+    assert row_count == 10
+
+    table = columnar.pq.read_table(fname)
+    assert table.column_names == COLUMNS
+    assert table.column("amount").to_pylist() == [row[2] for row in rows]
+
+
+@pytest.mark.skipif(columnar.pa is None, reason="pyarrow is not installed")
+def test_parquet_column_null_in_first_batch(tmp_path):
+    fname = str(tmp_path / "results.parquet")
+    batches = [[(1, None), (2, None)], [(3, "c")], [(4, None)]]
+    row_count = columnar.write_parquet_file(fname, ["id", "name"], iter(batches))
+    assert row_count == 4
+
+    table = columnar.pq.read_table(fname)
+    assert table.schema.field("name").type == columnar.pa.string()
+    assert table.column("name").to_pylist() == [None, None, "c", None]
+
+
+@pytest.mark.skipif(columnar.pa is None, reason="pyarrow is not installed")
+def test_parquet_decimal_grows_across_batches(tmp_path):
+    fname = str(tmp_path / "results.parquet")
+    totals = [Decimal("1.50"), Decimal("25.75"), Decimal("123456789012345.25")]
+    batches = [[(total,)] for total in totals]
+    row_count = columnar.write_parquet_file(fname, ["total"], iter(batches))
+    assert row_count == 3
+
+    table = columnar.pq.read_table(fname)
+    assert table.schema.field("total").type == columnar.pa.decimal128(38, 2)
+    assert table.column("total").to_pylist() == totals
@@ -1,6 +1,13 @@
+import json
+import os
+import tempfile
+import threading
 import unittest
-from unittest.mock import patch, MagicMock
-from agentic_edu.modules.db import PostgresManager
+from unittest.mock import patch, MagicMock, mock_open
+import psycopg2
+from psycopg2.extensions import QueryCanceledError
+from agentic_edu.modules.db import PostgresManager, ResultLimiter
+from agentic_edu.modules.schema_snapshot import SchemaSnapshot
 
 
 class TestPostgresManager(unittest.TestCase):
@@ -32,24 +39,215 @@ class TestPostgresManager(unittest.TestCase):
         expected_result = '[\n    {\n        "column1": "value1",\n        "column2": "value2"\n    }\n]'
         self.assertEqual(result, expected_result)
 
+    def test_stream_sql(self):
+        self.mock_cur.description = [("column1",), ("column2",)]
+        self.mock_cur.fetchmany.side_effect = [
+            [("a", 1), ("b", 2)],
+            [("c", 3)],
+            [],
+        ]
+
+        with self.manager.stream_sql("SELECT * FROM table", batch_size=2) as (
+            columns,
+            batches,
+        ):
+            self.assertEqual(columns, ["column1", "column2"])
+            self.assertEqual(list(batches), [[("a", 1), ("b", 2)], [("c", 3)]])
+
+        # rows come from a named (server-side) cursor
+        self.assertIn("name", self.mock_conn.cursor.call_args.kwargs)
+        self.assertEqual(self.mock_cur.itersize, 2)
+        self.mock_cur.close.assert_called_once()
+
+    def test_stream_sql_empty_result(self):
+        self.mock_cur.description = [("column1",)]
+        self.mock_cur.fetchmany.return_value = []
+
+        with self.manager.stream_sql("SELECT * FROM table") as (columns, batches):
+            self.assertEqual(columns, ["column1"])
+            self.assertEqual(list(batches), [])
+
+    def test_estimate_rows(self):
+        self.mock_cur.fetchone.return_value = (
+            [{"Plan": {"Node Type": "Seq Scan", "Plan Rows": 2500000}}],
+        )
+        self.assertEqual(self.manager.estimate_rows("SELECT * FROM events;"), 2500000)
+        self.mock_cur.execute.assert_called_with(
+            "EXPLAIN (FORMAT JSON) SELECT * FROM events"
+        )
+
+    def test_estimate_rows_unexplainable(self):
+        self.mock_cur.execute.side_effect = psycopg2.ProgrammingError("syntax error")
+        self.assertIsNone(self.manager.estimate_rows("VACUUM events"))
+        self.mock_conn.rollback.assert_called_once()
+
+    def test_explain_drops_comments(self):
+        self.mock_cur.fetchone.return_value = [[{"Plan": {"Plan Rows": 5}}]]
+        plan = self.manager.explain("SELECT * FROM orders; -- all orders")
+
+        self.assertEqual(plan, {"Plan Rows": 5})
+        self.mock_cur.execute.assert_any_call(
+            "EXPLAIN (FORMAT JSON) SELECT * FROM orders"
+        )
+
+    def test_explain_multiple_statements(self):
+        self.assertIsNone(self.manager.explain("SELECT 1; DELETE FROM events"))
+        self.mock_cur.execute.assert_not_called()
+
+    def test_copy_sql_to_file(self):
+        self.mock_cur.rowcount = 3
+        with patch("builtins.open", mock_open()) as mock_file:
+            row_count = self.manager.copy_sql_to_file(
+                "SELECT * FROM events;\n", "out.csv"
+            )
+
+        self.assertEqual(row_count, 3)
+        mock_file.assert_called_once_with("out.csv", "w")
+        self.mock_cur.copy_expert.assert_called_once_with(
+            "COPY (SELECT * FROM events) TO STDOUT WITH (FORMAT csv, HEADER)",
+            mock_file(),
+        )
+
+    def test_copy_sql_to_file_drops_comments(self):
+        with patch("builtins.open", mock_open()) as mock_file:
+            self.manager.copy_sql_to_file(
+                "SELECT * FROM orders -- all orders", "out.csv"
+            )
+
+        self.mock_cur.copy_expert.assert_called_once_with(
+            "COPY (SELECT * FROM orders) TO STDOUT WITH (FORMAT csv, HEADER)",
+            mock_file(),
+        )
+
+    def test_copy_sql_to_file_rejects_statements(self):
+        with self.assertRaises(ValueError):
+            self.manager.copy_sql_to_file("DELETE FROM orders", "out.csv")
+        self.mock_cur.copy_expert.assert_not_called()
+
+    def test_copy_sql_to_file_unsupported_format(self):
+        with self.assertRaises(ValueError):
+            self.manager.copy_sql_to_file("SELECT 1", "out.txt", fmt="text")
+
+    def test_get_schema_version_changes_with_schema(self):
+        self.mock_cur.fetchall.return_value = [("users", "fp1"), ("orders", "fp2")]
+        version = self.manager.get_schema_version()
+        self.mock_cur.fetchall.return_value = [("orders", "fp2"), ("users", "fp1")]
+        self.assertEqual(self.manager.get_schema_version(), version)
+        self.mock_cur.fetchall.return_value = [("users", "fp3"), ("orders", "fp2")]
+        self.assertNotEqual(self.manager.get_schema_version(), version)
+
+    def test_run_sql_with_statement_timeout(self):
+        self.mock_cur.description = [("column1",)]
+        self.mock_cur.fetchall.return_value = [("value1",)]
+
+        self.manager.run_sql("SELECT 1", statement_timeout_ms=5000)
+
+        self.mock_cur.execute.assert_any_call(
+            "SELECT set_config('statement_timeout', %s, true)", ("5000",)
+        )
+        # the transaction, and the timeout with it, ends after the call
+        self.mock_conn.rollback.assert_called_once()
+
+    def test_run_sql_with_limiter_stops_fetching(self):
+        self.mock_cur.description = [("id",)]
+        self.mock_cur.fetchmany.side_effect = [[(1,), (2,)], [(3,), (4,)], [(5,)]]
+        limiter = ResultLimiter(max_rows=3)
+
+        result = self.manager.run_sql("SELECT id FROM events", limiter=limiter)
+
+        self.assertEqual(
+            result, json.dumps([{"id": 1}, {"id": 2}, {"id": 3}], indent=4)
+        )
+        self.assertTrue(limiter.truncated)
+        # rows come from a named cursor and the third batch is never fetched
+        self.assertIn("name", self.mock_conn.cursor.call_args.kwargs)
+        self.assertEqual(self.mock_cur.fetchmany.call_count, 2)
+
+    def test_cancel_interrupts_calls_in_flight(self):
+        started = threading.Event()
+        cancelled = threading.Event()
+
+        def execute(sql):
+            started.set()
+            cancelled.wait(timeout=5)
+            raise QueryCanceledError("canceling statement due to user request")
+
+        self.mock_cur.execute.side_effect = execute
+        self.mock_conn.cancel.side_effect = cancelled.set
+        errors = []
+
+        def run():
+            try:
+                self.manager.run_sql("SELECT pg_sleep(600)")
+            except QueryCanceledError as e:
+                errors.append(e)
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        started.wait(timeout=5)
+        self.manager.cancel()
+        thread.join(timeout=5)
+
+        self.mock_conn.cancel.assert_called_once()
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(self.manager.active_connections, [])
+
+    def test_cancel_without_calls_in_flight(self):
+        self.manager.cancel()
+        self.mock_conn.cancel.assert_not_called()
+
     def test_close(self):
         self.manager.close()
-        self.mock_cur.close.assert_called_once()
         self.mock_conn.close.assert_called_once()
 
-    @patch("agentic_edu.modules.db.PostgresManager.get_all_table_names")
-    def test_get_table_definitions_for_prompt(self, mock_get_all_table_names):
-        mock_get_all_table_names.return_value = ["table1", "table2"]
+    def test_cursor_per_call(self):
+        self.mock_cur.fetchall.return_value = [("table1",)]
+        self.manager.get_all_table_names()
+        self.manager.get_all_table_names()
+        self.assertEqual(self.mock_conn.cursor.call_count, 2)
+        self.assertEqual(self.mock_cur.close.call_count, 2)
+
+    def test_pooled_calls_borrow_and_return_connections(self):
+        mock_pool = MagicMock()
+        mock_pool.connection.return_value.__enter__.return_value = self.mock_conn
+        manager = PostgresManager()
+        manager.connect_with_pool(mock_pool)
+
+        self.mock_cur.fetchall.return_value = [("table1",)]
+        self.assertEqual(manager.get_all_table_names(), ["table1"])
+        mock_pool.connection.return_value.__exit__.assert_called_once()
+
+        # the pool owns its connections
+        manager.close()
+        self.mock_conn.close.assert_not_called()
+
+    def test_pooled_calls_pass_agent_queries_to_the_pool(self):
+        mock_pool = MagicMock()
+        mock_pool.connection.return_value.__enter__.return_value = self.mock_conn
+        manager = PostgresManager()
+        manager.connect_with_pool(mock_pool)
+
+        self.mock_cur.description = [("id",)]
+        self.mock_cur.fetchall.return_value = [(1,)]
+        manager.run_sql("SELECT id FROM users")
+        mock_pool.connection.assert_called_with("SELECT id FROM users")
+
+        # catalog reads are not agent queries
+        manager.get_all_table_names()
+        mock_pool.connection.assert_called_with(None)
+
+    def test_get_table_definitions_for_prompt(self):
         self.mock_cur.fetchall.return_value = [
-            ("table1", 1, "column1", "integer"),
-            ("table2", 2, "column2", "varchar"),
+            ("table1", "column1 integer,\ncolumn2 varchar", "fp1"),
+            ("table2", "column1 integer", "fp2"),
         ]
         result = self.manager.get_table_definitions_for_prompt()
         expected_result = (
             "CREATE TABLE table1 (\ncolumn1 integer,\ncolumn2 varchar\n);\n\n"
-            "CREATE TABLE table2 (\ncolumn1 integer,\ncolumn2 varchar\n);"
+            "CREATE TABLE table2 (\ncolumn1 integer\n);"
         )
         self.assertEqual(result, expected_result)
+        self.mock_cur.execute.assert_called_once()
 
     def test_get_all_table_names(self):
         self.mock_cur.fetchall.return_value = [("table1",), ("table2",)]
@@ -66,12 +264,10 @@ class TestPostgresManager(unittest.TestCase):
             result, "CREATE TABLE table1 (\ncolumn1 integer,\ncolumn2 varchar\n);"
         )
 
-    @patch("agentic_edu.modules.db.PostgresManager.get_all_table_names")
-    def test_get_table_definition_map_for_embeddings(self, mock_get_all_table_names):
-        mock_get_all_table_names.return_value = ["table1", "table2"]
+    def test_get_table_definition_map_for_embeddings(self):
         self.mock_cur.fetchall.return_value = [
-            ("table1", 1, "column1", "integer"),
-            ("table1", 2, "column2", "varchar"),
+            ("table1", "column1 integer,\ncolumn2 varchar", "fp1"),
+            ("table2", "column1 integer,\ncolumn2 varchar", "fp2"),
         ]
         result = self.manager.get_table_definition_map_for_embeddings()
         self.assertEqual(
@@ -81,12 +277,132 @@ class TestPostgresManager(unittest.TestCase):
                 "table2": "CREATE TABLE table2 (\ncolumn1 integer,\ncolumn2 varchar\n);",
             },
         )
+        # the whole schema is read in one round trip
+        self.mock_cur.execute.assert_called_once()
+
+    def test_get_table_definition_map_with_snapshot(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            snapshot = SchemaSnapshot(os.path.join(tmp_dir, "snapshot.json"))
+            snapshot.update(
+                {
+                    "table1": ("fp1", "CREATE TABLE table1 (\ncolumn1 integer\n);"),
+                    "table2": ("fp2", "CREATE TABLE table2 (\ncolumn1 integer\n);"),
+                    "table3": ("fp3", "CREATE TABLE table3 (\ncolumn1 integer\n);"),
+                }
+            )
+            self.manager.snapshot = snapshot
+
+            # table1 unchanged, table2 altered, table3 dropped, table4 added
+            self.mock_cur.fetchall.side_effect = [
+                [("table1", "fp1"), ("table2", "fp2b"), ("table4", "fp4")],
+                [
+                    ("table2", "column1 bigint", "fp2b"),
+                    ("table4", "column1 text", "fp4"),
+                ],
+            ]
+            result = self.manager.get_table_definition_map()
+
+            self.assertEqual(
+                result,
+                {
+                    "table1": "CREATE TABLE table1 (\ncolumn1 integer\n);",
+                    "table2": "CREATE TABLE table2 (\ncolumn1 bigint\n);",
+                    "table4": "CREATE TABLE table4 (\ncolumn1 text\n);",
+                },
+            )
+            # only the changed tables were re-read
+            self.assertEqual(
+                self.mock_cur.execute.call_args[0][1], (["table2", "table4"],)
+            )
+            self.assertEqual(
+                SchemaSnapshot(snapshot.path).definitions, snapshot.definitions
+            )
+
+    def test_get_table_definition_map_with_fresh_snapshot(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            snapshot = SchemaSnapshot(os.path.join(tmp_dir, "snapshot.json"))
+            snapshot.update(
+                {"table1": ("fp1", "CREATE TABLE table1 (\ncolumn1 integer\n);")}
+            )
+            self.manager.snapshot = snapshot
+
+            self.mock_cur.fetchall.return_value = [("table1", "fp1")]
+            result = self.manager.get_table_definition_map()
+
+            self.assertEqual(list(result), ["table1"])
+            self.mock_cur.execute.assert_called_once()
+            self.assertFalse(os.path.exists(snapshot.path))
 
     def test_get_related_tables(self):
-        self.mock_cur.fetchall.side_effect = [[("table2",)], [("table3",)]]
+        self.mock_cur.fetchall.return_value = [
+            ("table2", "table1"),
+            ("table1", "table3"),
+        ]
         result = self.manager.get_related_tables(["table1"])
         self.assertEqual(sorted(result), sorted(["table2", "table3"]))
 
+    def test_get_related_tables_loads_graph_once(self):
+        self.mock_cur.fetchall.return_value = [("table2", "table1")]
+        self.manager.get_related_tables(["table1"])
+        self.manager.get_related_tables(["table2"])
+        self.mock_cur.execute.assert_called_once()
+
+    def test_get_related_tables_ranks_by_hops_then_edges(self):
+        self.mock_cur.fetchall.return_value = [
+            ("orders", "users"),
+            ("orders", "products"),
+            ("orders", "products"),
+            ("products", "suppliers"),
+            ("reviews", "users"),
+        ]
+        result = self.manager.get_related_tables(["orders"], n=3, max_hops=2)
+        self.assertEqual(result, ["products", "users", "reviews"])
+
+    def test_get_related_tables_excludes_given_tables(self):
+        self.mock_cur.fetchall.return_value = [("table2", "table1")]
+        result = self.manager.get_related_tables(["table1", "table2"])
+        self.assertEqual(result, [])
+
+    def test_get_foreign_key_graph_uses_snapshot(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            snapshot = SchemaSnapshot(os.path.join(tmp_dir, "snapshot.json"))
+            snapshot.update_foreign_keys("fk_fp", [("table2", "table1")])
+            self.manager.snapshot = snapshot
+
+            # fingerprint unchanged - the edges come from the snapshot
+            self.mock_cur.fetchone.return_value = ("fk_fp",)
+            result = self.manager.get_related_tables(["table1"])
+
+            self.assertEqual(result, ["table2"])
+            self.mock_cur.execute.assert_called_once()
+            self.mock_cur.fetchall.assert_not_called()
+
 
 if __name__ == "__main__":
     unittest.main()
+
+
+class TestResultLimiter(unittest.TestCase):
+    def test_no_caps(self):
+        limiter = ResultLimiter()
+        self.assertEqual(list(limiter.limit([[(1,)], [(2,)]])), [[(1,)], [(2,)]])
+        self.assertFalse(limiter.truncated)
+
+    def test_max_rows(self):
+        limiter = ResultLimiter(max_rows=3)
+        batches = list(limiter.limit([[(1,), (2,)], [(3,), (4,)], [(5,)]]))
+        self.assertEqual(batches, [[(1,), (2,)], [(3,)]])
+        self.assertTrue(limiter.truncated)
+        self.assertEqual(limiter.row_count, 3)
+
+    def test_exactly_max_rows_is_not_truncated(self):
+        limiter = ResultLimiter(max_rows=2)
+        self.assertEqual(list(limiter.limit([[(1,), (2,)]])), [[(1,), (2,)]])
+        self.assertFalse(limiter.truncated)
+
+    def test_max_bytes(self):
+        limiter = ResultLimiter(max_bytes=10)
+        batches = list(limiter.limit([[("aaaa",), ("bbbb",), ("cccc",)]]))
+        self.assertEqual(batches, [[("aaaa",), ("bbbb",)]])
+        self.assertTrue(limiter.truncated)
+        self.assertEqual(limiter.byte_count, 8)
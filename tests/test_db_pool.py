@@ -0,0 +1,128 @@
+import threading
+import unittest
+from unittest.mock import patch, MagicMock
+import psycopg2
+from psycopg2.extensions import QueryCanceledError
+from psycopg2.pool import PoolError
+from agentic_edu.modules import db_pool
+from agentic_edu.modules.db_pool import ConnectionPool
+
+
+def make_connection():
+    conn = MagicMock()
+    conn.closed = 0
+    return conn
+
+
+class TestConnectionPool(unittest.TestCase):
+    def setUp(self):
+        patcher = patch("psycopg2.connect", side_effect=lambda url: make_connection())
+        self.mock_connect = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.now = 1000.0
+        clock = patch(
+            "agentic_edu.modules.db_pool.time.monotonic", side_effect=lambda: self.now
+        )
+        clock.start()
+        self.addCleanup(clock.stop)
+
+    def test_opens_min_size_connections(self):
+        pool = ConnectionPool("url", min_size=2, max_size=4)
+        self.assertEqual(self.mock_connect.call_count, 2)
+        self.assertEqual(pool.size, 2)
+
+    def test_reuses_returned_connection(self):
+        pool = ConnectionPool("url", min_size=0, max_size=2)
+        conn = pool.getconn()
+        pool.putconn(conn)
+        self.assertIs(pool.getconn(), conn)
+        self.assertEqual(self.mock_connect.call_count, 1)
+
+    def test_putconn_rolls_back_open_transaction(self):
+        pool = ConnectionPool("url", min_size=0)
+        conn = pool.getconn()
+        pool.putconn(conn)
+        conn.rollback.assert_called_once()
+
+    def test_full_pool_times_out(self):
+        pool = ConnectionPool("url", min_size=0, max_size=1, timeout=0)
+        pool.getconn()
+        with self.assertRaises(PoolError):
+            pool.getconn()
+
+    def test_waiting_borrower_gets_returned_connection(self):
+        pool = ConnectionPool("url", min_size=0, max_size=1, timeout=5)
+        conn = pool.getconn()
+        timer = threading.Timer(0.05, pool.putconn, args=(conn,))
+        timer.start()
+        with patch("agentic_edu.modules.db_pool.time.monotonic", return_value=0):
+            self.assertIs(pool.getconn(), conn)
+        timer.join()
+
+    def test_idle_connections_are_evicted_down_to_min_size(self):
+        pool = ConnectionPool("url", min_size=1, max_size=3, max_idle_seconds=60)
+        conns = [pool.getconn() for _ in range(3)]
+        for conn in conns:
+            pool.putconn(conn)
+        self.assertEqual(pool.size, 3)
+
+        self.now += 61
+        conn = pool.getconn()
+        self.assertEqual(pool.size, 1)
+        self.assertIs(conn, conns[-1])
+        conns[0].close.assert_called_once()
+        conns[1].close.assert_called_once()
+
+    def test_stale_connection_is_health_checked_and_replaced(self):
+        pool = ConnectionPool("url", min_size=0, health_check_after_seconds=30)
+        broken = pool.getconn()
+        pool.putconn(broken)
+        broken.cursor.return_value.execute.side_effect = psycopg2.OperationalError
+
+        self.now += 31
+        conn = pool.getconn()
+
+        self.assertIsNot(conn, broken)
+        broken.close.assert_called_once()
+        self.assertEqual(pool.size, 1)
+
+    def test_recently_used_connection_skips_health_check(self):
+        pool = ConnectionPool("url", min_size=0, health_check_after_seconds=30)
+        conn = pool.getconn()
+        pool.putconn(conn)
+        pool.getconn()
+        conn.cursor.assert_not_called()
+
+    def test_connection_context_discards_broken_connection(self):
+        pool = ConnectionPool("url", min_size=0)
+        with self.assertRaises(psycopg2.OperationalError):
+            with pool.connection() as conn:
+                raise psycopg2.OperationalError("server closed the connection")
+        conn.close.assert_called_once()
+        self.assertEqual(pool.size, 0)
+
+    def test_connection_context_keeps_connection_after_timeout(self):
+        pool = ConnectionPool("url", min_size=0)
+        with self.assertRaises(QueryCanceledError):
+            with pool.connection() as conn:
+                raise QueryCanceledError("canceling statement due to statement timeout")
+        conn.close.assert_not_called()
+        self.assertEqual(len(pool.idle), 1)
+
+    def test_close(self):
+        pool = ConnectionPool("url", min_size=2)
+        pool.close()
+        self.assertEqual(pool.size, 0)
+        with self.assertRaises(PoolError):
+            pool.getconn()
+
+    def test_get_pool_is_shared_per_url(self):
+        with patch.dict(db_pool._pools, clear=True):
+            pool = db_pool.get_pool("url_a", min_size=0)
+            self.assertIs(db_pool.get_pool("url_a"), pool)
+            self.assertIsNot(db_pool.get_pool("url_b", min_size=0), pool)
+
+
+if __name__ == "__main__":
+    unittest.main()
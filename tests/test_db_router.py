@@ -0,0 +1,152 @@
+from contextlib import contextmanager
+import unittest
+from unittest.mock import MagicMock, patch
+import psycopg2
+from psycopg2.pool import PoolError
+from agentic_edu.modules.db_router import DATABASE_COLUMN, ReplicaRouter, fan_out
+
+
+def make_pool(name, error=None):
+    """
+    A stand-in for ConnectionPool whose connection() yields 'name'
+    """
+    pool = MagicMock()
+
+    @contextmanager
+    def connection(sql=None):
+        if error is not None:
+            raise error
+        yield name
+
+    pool.connection.side_effect = connection
+    return pool
+
+
+def make_db(columns, rows=None, error=None):
+    db = MagicMock()
+    cur = db.cursor.return_value.__enter__.return_value
+    cur.description = [(column,) for column in columns]
+    if error is not None:
+        cur.execute.side_effect = error
+    cur.fetchall.return_value = rows or []
+    return db
+
+
+class TestReplicaRouter(unittest.TestCase):
+    def borrow(self, router, sql="SELECT 1"):
+        with router.connection(sql) as conn:
+            return conn
+
+    def test_round_robin(self):
+        router = ReplicaRouter(
+            make_pool("primary"), [make_pool("a"), make_pool("b"), make_pool("c")]
+        )
+        self.assertEqual([self.borrow(router) for _ in range(4)], ["a", "b", "c", "a"])
+
+    def test_least_latency_prefers_fastest_replica(self):
+        router = ReplicaRouter(
+            make_pool("primary"), [make_pool("a"), make_pool("b")], "least_latency"
+        )
+        # unmeasured replicas are tried first
+        self.assertEqual(self.borrow(router), "a")
+        self.assertEqual(self.borrow(router), "b")
+
+        router.latencies = [0.5, 0.1]
+        self.assertEqual(self.borrow(router), "b")
+
+    def test_latency_is_a_moving_average(self):
+        router = ReplicaRouter(make_pool("primary"), [make_pool("a")], "least_latency")
+        router.record_latency(0, 1.0)
+        router.record_latency(0, 0.0)
+        self.assertAlmostEqual(router.latencies[0], 0.8)
+
+    def test_skips_unavailable_replica(self):
+        router = ReplicaRouter(
+            make_pool("primary"),
+            [make_pool("a", psycopg2.OperationalError("down")), make_pool("b")],
+        )
+        self.assertEqual(self.borrow(router), "b")
+
+    def test_raises_when_every_replica_is_unavailable(self):
+        router = ReplicaRouter(
+            make_pool("primary"),
+            [make_pool("a", PoolError("full")), make_pool("b", PoolError("full"))],
+        )
+        with self.assertRaises(PoolError):
+            self.borrow(router)
+
+    def test_errors_in_the_call_are_not_retried(self):
+        pool_a, pool_b = make_pool("a"), make_pool("b")
+        router = ReplicaRouter(make_pool("primary"), [pool_a, pool_b])
+        with self.assertRaises(psycopg2.ProgrammingError):
+            with router.connection("SELECT 1"):
+                raise psycopg2.ProgrammingError("syntax error")
+        pool_b.connection.assert_not_called()
+
+    def test_only_read_only_queries_go_to_replicas(self):
+        router = ReplicaRouter(make_pool("primary"), [make_pool("a")])
+        self.assertEqual(self.borrow(router, "-- top users\nSELECT 1"), "a")
+        self.assertEqual(self.borrow(router, "UPDATE users SET name = 'a'"), "primary")
+        self.assertEqual(self.borrow(router, "SELECT 1; DELETE FROM users"), "primary")
+        for sql in [
+            "WITH d AS (DELETE FROM users RETURNING *) SELECT * FROM d",
+            "SELECT * FROM users FOR UPDATE",
+            "SELECT * FROM users FOR KEY SHARE",
+            "SELECT nextval('users_id_seq')",
+            "SELECT * INTO users_copy FROM users",
+        ]:
+            self.assertEqual(self.borrow(router, sql), "primary", sql)
+        self.assertEqual(
+            self.borrow(router, "SELECT 'update' AS note -- delete later"), "a"
+        )
+        # catalog and fingerprint reads don't pass a statement
+        self.assertEqual(self.borrow(router, None), "primary")
+
+    def test_invalid_arguments(self):
+        with self.assertRaises(ValueError):
+            ReplicaRouter(make_pool("primary"), [])
+        with self.assertRaises(ValueError):
+            ReplicaRouter(make_pool("primary"), [make_pool("a")], "random")
+
+
+class TestFanOut(unittest.TestCase):
+    def test_merges_rows_with_database_column(self):
+        result = fan_out(
+            {
+                "tenant_a": make_db(["id"], [(1,), (2,)]),
+                "tenant_b": make_db(["id"], [(3,)]),
+            },
+            "SELECT id FROM users",
+        )
+        self.assertEqual(result.columns, [DATABASE_COLUMN, "id"])
+        self.assertEqual(
+            result.rows, [("tenant_a", 1), ("tenant_a", 2), ("tenant_b", 3)]
+        )
+        self.assertEqual(result.errors, {})
+
+    def test_failed_databases_are_reported(self):
+        result = fan_out(
+            {
+                "tenant_a": make_db(["id"], [(1,)]),
+                "tenant_b": make_db(["id"], error=psycopg2.OperationalError("down")),
+                "tenant_c": make_db(["name"], [("x",)]),
+            },
+            "SELECT id FROM users",
+        )
+        self.assertEqual(result.rows, [("tenant_a", 1)])
+        self.assertEqual(result.errors["tenant_b"], "down")
+        self.assertIn("expected ['id']", result.errors["tenant_c"])
+
+    def test_caps_rows_per_database(self):
+        db = MagicMock()
+        db.stream_sql.return_value.__enter__.return_value = (
+            ["id"],
+            iter([[(1,), (2,), (3,)]]),
+        )
+        result = fan_out({"tenant_a": db}, "SELECT id FROM users", max_rows=2)
+        self.assertEqual(result.rows, [("tenant_a", 1), ("tenant_a", 2)])
+        self.assertTrue(result.truncated)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+from agentic_edu.modules.embedding_store import EmbeddingStore
+import numpy as np
+
+
+def test_get_missing_key():
+    store = EmbeddingStore("does_not_exist")
+    assert store.get("missing") is None
+    assert len(store) == 0
+
+
+def test_put_then_get_before_save(tmp_path):
+    store = EmbeddingStore(str(tmp_path))
+    store.put("key1", np.ones((1, 4)))
+    assert "key1" in store
+    assert store.get("key1").shape == (4,)
+
+
+def test_save_and_reload(tmp_path):
+    store = EmbeddingStore(str(tmp_path))
+    store.put("key1", np.array([[1.0, 2.0, 3.0]]))
+    store.put("key2", np.array([[4.0, 5.0, 6.0]]))
+    store.save()
+
+    reloaded = EmbeddingStore(str(tmp_path))
+    assert len(reloaded) == 2
+    assert reloaded.pending == {}
+    np.testing.assert_array_equal(reloaded.get("key2"), [4.0, 5.0, 6.0])
+
+
+def test_save_appends_without_moving_existing_rows(tmp_path):
+    store = EmbeddingStore(str(tmp_path))
+    store.put("key1", np.array([1.0, 1.0]))
+    store.save()
+    row_before = store.map_key_to_row["key1"]
+
+    store = EmbeddingStore(str(tmp_path))
+    store.put("key2", np.array([2.0, 2.0]))
+    store.save()
+
+    assert store.map_key_to_row["key1"] == row_before
+    assert store.matrix.shape == (2, 2)
+    np.testing.assert_array_equal(store.get("key1"), [1.0, 1.0])
+    np.testing.assert_array_equal(store.get("key2"), [2.0, 2.0])
+
+
+def test_load_ignores_truncated_matrix(tmp_path):
+    store = EmbeddingStore(str(tmp_path))
+    store.put("key1", np.array([1.0, 1.0]))
+    store.save()
+
+    # simulate a crash that left the index ahead of the matrix
+    np.save(store.matrix_file, np.zeros((0, 2), dtype=np.float32))
+
+    reloaded = EmbeddingStore(str(tmp_path))
+    assert reloaded.get("key1") is None
+
+
+def test_save_compacts_rows_not_kept(tmp_path):
+    store = EmbeddingStore(str(tmp_path))
+    store.put("old", np.array([1.0, 1.0]))
+    store.put("unchanged", np.array([2.0, 2.0]))
+    store.save()
+
+    # the table behind "old" was altered and re-embedded under a new key
+    store = EmbeddingStore(str(tmp_path))
+    store.put("new", np.array([3.0, 3.0]))
+    store.save(keep=["unchanged", "new"])
+
+    reloaded = EmbeddingStore(str(tmp_path))
+    assert reloaded.matrix.shape == (2, 2)
+    assert reloaded.get("old") is None
+    np.testing.assert_array_equal(reloaded.get("unchanged"), [2.0, 2.0])
+    np.testing.assert_array_equal(reloaded.get("new"), [3.0, 3.0])
+    # only the current matrix is left on disk
+    assert sorted(p.name for p in tmp_path.iterdir()) == sorted(
+        ["index.json", reloaded.matrix_name]
+    )
+
+
+def test_save_compacts_without_pending_rows(tmp_path):
+    store = EmbeddingStore(str(tmp_path))
+    store.put("dropped", np.array([1.0, 1.0]))
+    store.save()
+
+    store = EmbeddingStore(str(tmp_path))
+    store.save(keep=[])
+
+    reloaded = EmbeddingStore(str(tmp_path))
+    assert len(reloaded) == 0
+    assert reloaded.matrix.shape == (0, 2)
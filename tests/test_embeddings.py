@@ -1,4 +1,12 @@
-from agentic_edu.modules.embeddings import DatabaseEmbedder
+from agentic_edu.modules.embeddings import (
+    DatabaseEmbedder,
+    normalize_rows,
+    table_definition_key,
+)
+from agentic_edu.modules.vector_index import IVFIndex
+from agentic_edu.modules.embedding_store import EmbeddingStore
+from unittest.mock import patch
+import numpy as np
 import pytest
 
 
@@ -51,3 +59,131 @@ def test_get_table_definitions_from_names_nonexistent():
     db_embedder.add_table("table1", "This is a test table")
     with pytest.raises(KeyError):
         db_embedder.get_table_definitions_from_names(["nonexistent"])
+
+
+def test_add_table_uses_store(tmp_path):
+    store = EmbeddingStore(str(tmp_path))
+    db_embedder = DatabaseEmbedder(store=store)
+    db_embedder.add_table("table1", "This is a test table")
+    db_embedder.save()
+
+    db_embedder = DatabaseEmbedder(store=EmbeddingStore(str(tmp_path)))
+    with patch.object(db_embedder, "compute_embeddings_batch") as mock_compute:
+        db_embedder.add_table("table1", "This is a test table")
+    mock_compute.assert_not_called()
+    assert db_embedder.map_name_to_embeddings["table1"].shape == (1, 768)
+
+
+def test_add_tables():
+    db_embedder = DatabaseEmbedder()
+    db_embedder.add_tables(
+        {"table1": "This is a test table", "table2": "Another much longer test table"}
+    )
+    assert db_embedder.table_names == ["table1", "table2"]
+    assert db_embedder.embeddings.shape == (2, 768)
+    assert db_embedder.embeddings.to_array().dtype == np.float32
+    assert "table2" in db_embedder.map_name_to_table_def
+
+
+def test_compute_embeddings_batch_preserves_order():
+    db_embedder = DatabaseEmbedder(batch_size=2)
+    texts = ["a much longer sentence than the others", "short", "medium sentence"]
+    batched = db_embedder.compute_embeddings_batch(texts)
+    for idx, text in enumerate(texts):
+        single = db_embedder.compute_embeddings(text)
+        np.testing.assert_allclose(batched[idx : idx + 1], single, atol=1e-4)
+
+
+def test_add_table_overwrites_existing_row():
+    db_embedder = DatabaseEmbedder()
+    db_embedder.add_table("table1", "This is a test table")
+    db_embedder.add_table("table1", "Something else entirely")
+    assert db_embedder.embeddings.shape == (1, 768)
+    assert db_embedder.map_name_to_table_def["table1"] == "Something else entirely"
+
+
+def test_table_definition_key_changes_with_definition():
+    key1 = table_definition_key("CREATE TABLE a (\nid integer\n);")
+    key2 = table_definition_key("CREATE TABLE a (\nid bigint\n);")
+    assert key1 != key2
+    assert key1 == table_definition_key("CREATE TABLE a (\nid integer\n);")
+
+
+def test_search_returns_scores_best_first():
+    db_embedder = DatabaseEmbedder()
+    db_embedder.add_tables(
+        {
+            "users": "CREATE TABLE users (\nid integer,\nemail text\n);",
+            "jobs": "CREATE TABLE jobs (\nid integer,\nstatus text\n);",
+            "products": "CREATE TABLE products (\nid integer,\nprice numeric\n);",
+        }
+    )
+    results = db_embedder.search("users email", 2)
+    assert len(results) == 2
+    scores = [score for _, score in results]
+    assert scores == sorted(scores, reverse=True)
+    assert all(-1.0 <= score <= 1.0 + 1e-6 for score in scores)
+
+
+def test_search_empty_embedder():
+    db_embedder = DatabaseEmbedder()
+    assert db_embedder.search("anything") == []
+
+
+def test_embeddings_are_unit_length():
+    db_embedder = DatabaseEmbedder()
+    db_embedder.add_tables({"table1": "first table", "table2": "second table"})
+    np.testing.assert_allclose(
+        np.linalg.norm(db_embedder.embeddings.to_array(), axis=1), [1.0, 1.0], rtol=1e-5
+    )
+
+
+def test_search_with_ivf_index():
+    db_embedder = DatabaseEmbedder(index=IVFIndex(n_lists=2, min_vectors=0))
+    db_embedder.add_tables({f"table{i}": f"test table number {i}" for i in range(8)})
+    results = db_embedder.search("test table number 3", 1)
+    assert len(results) == 1
+    assert db_embedder.index.centroids is not None
+    assert not db_embedder.index_is_stale
+
+
+def test_normalize_rows_handles_zero_vector():
+    normalized, norms = normalize_rows(np.array([[3.0, 4.0], [0.0, 0.0]]))
+    np.testing.assert_allclose(normalized, [[0.6, 0.8], [0.0, 0.0]])
+    np.testing.assert_allclose(norms, [5.0, 0.0])
+
+
+def test_get_similar_tables_deduplicates():
+    db_embedder = DatabaseEmbedder()
+    db_embedder.add_table("table1", "This is a test table")
+    tables = db_embedder.get_similar_tables("table1", 1)
+    assert tables == ["table1"]
+
+
+@pytest.mark.parametrize("dtype", ["float16", "int8"])
+def test_quantized_embeddings_match_float32_search(dtype):
+    tables = {f"table{i}": f"test table {i} with column {i * 7}" for i in range(20)}
+    baseline = DatabaseEmbedder()
+    baseline.add_tables(tables)
+    quantized = DatabaseEmbedder(dtype=dtype)
+    quantized.add_tables(tables)
+
+    assert quantized.embeddings.nbytes < baseline.embeddings.nbytes
+    assert [name for name, _ in quantized.search("test table 3", 1)] == [
+        name for name, _ in baseline.search("test table 3", 1)
+    ]
+
+
+def test_model_is_shared_between_embedders():
+    assert DatabaseEmbedder().model is DatabaseEmbedder().model
+
+
+def test_cache_hits_never_load_the_model(tmp_path):
+    db_embedder = DatabaseEmbedder(store=EmbeddingStore(str(tmp_path)))
+    db_embedder.add_table("table1", "This is a test table")
+    db_embedder.save()
+
+    with patch("agentic_edu.modules.embeddings.load_bert") as mock_load_bert:
+        db_embedder = DatabaseEmbedder(store=EmbeddingStore(str(tmp_path)))
+        db_embedder.add_table("table1", "This is a test table")
+    mock_load_bert.assert_not_called()
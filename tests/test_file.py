@@ -38,6 +38,22 @@ class TestFileMethods(unittest.TestCase):
         calls = [call("key"), call(":"), call(" "), call("value"), call("\n")]
         mock_file().write.assert_has_calls(calls, any_order=True)
 
+    @patch("builtins.open", new_callable=mock_open)
+    def test_write_jsonl_file(self, mock_file):
+        batches = iter([[(1, "a"), (2, "b")], [(3, "c")]])
+        row_count = file.write_jsonl_file("test.jsonl", ["id", "name"], batches)
+        self.assertEqual(row_count, 3)
+        mock_file.assert_called_once_with("test.jsonl", "w")
+        written = "".join(
+            "".join(lines)
+            for args in mock_file().writelines.call_args_list
+            for lines in args[0]
+        )
+        self.assertEqual(
+            written,
+            '{"id": 1, "name": "a"}\n{"id": 2, "name": "b"}\n{"id": 3, "name": "c"}\n',
+        )
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,42 @@
+from agentic_edu.modules.fk_graph import ForeignKeyGraph
+
+
+def test_expand_one_hop_both_directions():
+    graph = ForeignKeyGraph([("orders", "users"), ("users", "accounts")])
+    assert graph.expand(["users"]) == [("accounts", 1, 1), ("orders", 1, 1)]
+
+
+def test_expand_multi_hop():
+    graph = ForeignKeyGraph([("a", "b"), ("b", "c"), ("c", "d")])
+    assert graph.expand(["a"], max_hops=2) == [("b", 1, 1), ("c", 2, 1)]
+    assert [name for name, _, _ in graph.expand(["a"], max_hops=3)] == [
+        "b",
+        "c",
+        "d",
+    ]
+
+
+def test_expand_ranks_by_edge_count():
+    graph = ForeignKeyGraph(
+        [("orders", "users"), ("orders", "products"), ("orders", "products")]
+    )
+    assert graph.expand(["orders"]) == [("products", 1, 2), ("users", 1, 1)]
+
+
+def test_expand_counts_edges_from_every_table_in_previous_hop():
+    graph = ForeignKeyGraph([("a", "b"), ("a", "c"), ("b", "d"), ("c", "d")])
+    assert graph.expand(["a"], max_hops=2) == [("b", 1, 1), ("c", 1, 1), ("d", 2, 2)]
+
+
+def test_expand_ignores_self_references_and_unknown_tables():
+    graph = ForeignKeyGraph([("employees", "employees")])
+    assert graph.expand(["employees"]) == []
+    assert graph.expand(["missing"]) == []
+
+
+def test_related_tables_merges_and_excludes_given_tables():
+    graph = ForeignKeyGraph(
+        [("orders", "users"), ("order_items", "orders"), ("order_items", "products")]
+    )
+    assert graph.related_tables(["orders", "order_items"], n=1) == ["products", "users"]
+    assert graph.related_tables(["users"], n=2, max_hops=2) == ["orders", "order_items"]
@@ -1,9 +1,15 @@
 from agentic_edu.agents.instruments import AgentInstruments
-from agentic_edu.agents.instruments import PostgresAgentInstruments
+from agentic_edu.agents.instruments import PostgresAgentInstruments, min_timeout
 from agentic_edu.modules.db import PostgresManager
+from agentic_edu.modules.db_router import FanOutResult, ReplicaRouter
+from agentic_edu.modules.query_cache import QueryResultCache
+from agentic_edu.modules.query_guard import QueryGuard
+from psycopg2.extensions import QueryCanceledError
 import pytest
 from pytest_mock import mocker
+import json
 import os
+import tempfile
 
 
 def test_agent_instruments_init():
@@ -51,8 +57,14 @@ def test_postgres_agent_instruments_make_agent_chat_file():
     assert postgres_agent_instruments.make_agent_chat_file(team_name) == expected_path
 
 
+def test_min_timeout():
+    assert min_timeout(None, None) is None
+    assert min_timeout(5000, None) == 5000
+    assert min_timeout(5000, 1000) == 1000
+
+
 import unittest
-from unittest.mock import Mock, patch, mock_open
+from unittest.mock import MagicMock, Mock, patch, mock_open
 
 
 class TestPostgresAgentInstruments(unittest.TestCase):
@@ -71,9 +83,21 @@ class TestPostgresAgentInstruments(unittest.TestCase):
         expected_path = os.path.join(instruments.root_dir, "test_file")
         self.assertEqual(instruments.get_file_path("test_file"), expected_path)
 
+    def test_schema_snapshot_file_is_per_database(self):
+        instruments_a = PostgresAgentInstruments("db_url_a", "session_a")
+        instruments_b = PostgresAgentInstruments("db_url_b", "session_a")
+        self.assertNotEqual(
+            instruments_a.schema_snapshot_file, instruments_b.schema_snapshot_file
+        )
+        self.assertEqual(
+            instruments_a.schema_snapshot_file,
+            PostgresAgentInstruments("db_url_a", "session_b").schema_snapshot_file,
+        )
+
     @patch("agentic_edu.modules.db.PostgresManager")
     def test_run_sql(self, mock_manager):
         mock_manager.run_sql.return_value = "test_results"
+        mock_manager.estimate_rows.return_value = 10
         instruments = PostgresAgentInstruments("test_db_url", "test_session")
         instruments.db = mock_manager
         with patch("builtins.open", mock_open()) as mock_file:
@@ -81,13 +105,404 @@ class TestPostgresAgentInstruments(unittest.TestCase):
         self.assertEqual(result, "Successfully delivered results to json file")
         mock_file.assert_called_once_with(instruments.run_sql_results_file, "w")
 
+    def test_run_sql_streams_jsonl(self):
+        instruments = PostgresAgentInstruments(
+            "test_db_url", "test_session", results_format="jsonl"
+        )
+        instruments.db = MagicMock()
+        instruments.db.estimate_rows.return_value = 10
+        instruments.db.stream_sql.return_value.__enter__.return_value = (
+            ["id"],
+            iter([[(1,), (2,)]]),
+        )
+        with patch(
+            "agentic_edu.modules.file.write_jsonl_file", return_value=2
+        ) as mock_write:
+            result = instruments.run_sql("SELECT id FROM test_table")
+
+        self.assertTrue(instruments.run_sql_results_file.endswith(".jsonl"))
+        self.assertEqual(mock_write.call_args[0][0], instruments.run_sql_results_file)
+        self.assertIn('"row_count": 2', result)
+        instruments.db.run_sql.assert_not_called()
+
+    def test_run_sql_columnar(self):
+        instruments = PostgresAgentInstruments(
+            "test_db_url", "test_session", results_format="columnar"
+        )
+        self.assertIn(instruments.results_format, ("parquet", "npz"))
+        instruments.db = MagicMock()
+        instruments.db.estimate_rows.return_value = 10
+        instruments.db.stream_sql.return_value.__enter__.return_value = (
+            ["id"],
+            iter([[(1,), (2,)]]),
+        )
+        with patch(
+            "agentic_edu.modules.columnar.write_columnar_file", return_value=2
+        ) as mock_write:
+            result = instruments.run_sql("SELECT id FROM test_table")
+
+        mock_write.assert_called_once()
+        self.assertEqual(mock_write.call_args[0][0], instruments.run_sql_results_file)
+        self.assertEqual(mock_write.call_args[1]["fmt"], instruments.results_format)
+        self.assertIn('"row_count": 2', result)
+
+    def test_run_sql_copies_large_results(self):
+        instruments = PostgresAgentInstruments(
+            "test_db_url", "test_session", copy_row_threshold=1000
+        )
+        instruments.db = MagicMock()
+        instruments.db.estimate_rows.return_value = 5_000_000
+        instruments.db.copy_sql_to_file.return_value = 5_000_000
+
+        result = instruments.run_sql("SELECT * FROM events")
+
+        instruments.db.copy_sql_to_file.assert_called_once_with(
+            "SELECT * FROM events",
+            instruments.run_sql_copy_results_file,
+            fmt="csv",
+            statement_timeout_ms=None,
+        )
+        instruments.db.run_sql.assert_not_called()
+        self.assertIn('"row_count": 5000000', result)
+        self.assertIn("csv file instead of json", result)
+        self.assertEqual(
+            instruments.last_run_sql_results_file,
+            instruments.run_sql_copy_results_file,
+        )
+
+        with patch("builtins.open", mock_open(read_data="id")) as mock_file:
+            instruments.validate_run_sql()
+        mock_file.assert_called_once_with(instruments.run_sql_copy_results_file, "rb")
+
+    def test_run_sql_without_estimate_does_not_copy(self):
+        instruments = PostgresAgentInstruments(
+            "test_db_url", "test_session", copy_row_threshold=1000
+        )
+        instruments.db = MagicMock()
+        instruments.db.estimate_rows.return_value = None
+        instruments.db.run_sql.return_value = "[]"
+
+        with patch("builtins.open", mock_open()):
+            instruments.run_sql("CREATE TABLE t (id int)")
+
+        instruments.db.copy_sql_to_file.assert_not_called()
+
+    def test_large_statements_are_not_copied(self):
+        instruments = PostgresAgentInstruments(
+            "test_db_url", "test_session", copy_row_threshold=1000
+        )
+        instruments.db = MagicMock()
+        instruments.db.estimate_rows.return_value = 5_000_000
+        self.assertFalse(
+            instruments.should_copy_sql_results("DELETE FROM events RETURNING *")
+        )
+
+    def test_large_npz_results_are_copied(self):
+        instruments = PostgresAgentInstruments(
+            "test_db_url", "test_session", results_format="npz", copy_row_threshold=1000
+        )
+        instruments.db = MagicMock()
+        instruments.db.estimate_rows.return_value = 5_000_000
+        self.assertTrue(instruments.should_copy_sql_results("SELECT * FROM events"))
+
+        instruments.results_format = "parquet"
+        self.assertFalse(instruments.should_copy_sql_results("SELECT * FROM events"))
+
+    def test_copy_disabled(self):
+        instruments = PostgresAgentInstruments(
+            "test_db_url", "test_session", copy_row_threshold=None
+        )
+        instruments.db = MagicMock()
+        self.assertFalse(instruments.should_copy_sql_results("SELECT 1"))
+        instruments.db.estimate_rows.assert_not_called()
+
+    def test_run_sql_query_cache(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache = QueryResultCache(os.path.join(tmp_dir, "cache"))
+
+            def run(session_id):
+                with patch("agentic_edu.agents.instruments.BASE_DIR", tmp_dir):
+                    instruments = PostgresAgentInstruments(
+                        "test_db_url", session_id, query_cache=cache
+                    )
+                    instruments.reset_files()
+                    instruments.db = MagicMock()
+                    instruments.db.get_schema_version.return_value = "v1"
+                    instruments.db.estimate_rows.return_value = 10
+                    instruments.db.run_sql.return_value = '[{"id": 1}]'
+                    result = instruments.run_sql("SELECT id FROM users")
+                    with open(instruments.last_run_sql_results_file) as f:
+                        content = f.read()
+                return instruments, result, content
+
+            first, first_result, _ = run("session_1")
+            second, second_result, content = run("session_2")
+
+        first.db.run_sql.assert_called_once()
+        second.db.run_sql.assert_not_called()
+        self.assertEqual(first_result, second_result)
+        self.assertEqual(content, '[{"id": 1}]')
+        self.assertEqual(cache.metrics["hits"], 1)
+
+    def test_query_cache_is_per_database(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache = QueryResultCache(os.path.join(tmp_dir, "cache"))
+
+            def run(db_url):
+                with patch("agentic_edu.agents.instruments.BASE_DIR", tmp_dir):
+                    instruments = PostgresAgentInstruments(
+                        db_url, "test_session", query_cache=cache
+                    )
+                    instruments.reset_files()
+                    instruments.db = MagicMock()
+                    instruments.db.get_schema_version.return_value = "v1"
+                    instruments.db.estimate_rows.return_value = 10
+                    instruments.db.run_sql.return_value = "[]"
+                    instruments.run_sql("SELECT id FROM users")
+                return instruments
+
+            run("postgresql://prod/app")
+            staging = run("postgresql://staging/app")
+
+        staging.db.run_sql.assert_called_once()
+        self.assertEqual(cache.metrics["hits"], 0)
+
+    def test_run_sql_rejected_by_query_guard(self):
+        instruments = PostgresAgentInstruments(
+            "test_db_url", "test_session", query_guard=QueryGuard(max_cost=1000)
+        )
+        instruments.db = MagicMock()
+        instruments.db.explain.return_value = {
+            "Node Type": "Nested Loop",
+            "Total Cost": 1e9,
+            "Plan Rows": 10,
+        }
+
+        result = instruments.run_sql("SELECT count(*) FROM users, orders")
+
+        self.assertTrue(result.startswith("Query was not run"))
+        error = json.loads(result.split(": ", 1)[1])
+        self.assertEqual(error["error"], "query_rejected")
+        instruments.db.run_sql.assert_not_called()
+        self.assertFalse(instruments.validate_run_sql()[0])
+
+    def test_run_sql_limited_by_query_guard(self):
+        guard = QueryGuard(max_rows=1000, action="limit", limit_rows=10)
+        instruments = PostgresAgentInstruments(
+            "test_db_url", "test_session", query_guard=guard, results_format="jsonl"
+        )
+        instruments.db = MagicMock()
+        instruments.db.explain.return_value = {
+            "Node Type": "Seq Scan",
+            "Total Cost": 10,
+            "Plan Rows": 1e6,
+        }
+        instruments.db.estimate_rows.return_value = 10
+        instruments.db.stream_sql.return_value.__enter__.return_value = (
+            ["id"],
+            iter([]),
+        )
+
+        with patch("agentic_edu.modules.file.write_jsonl_file", return_value=10):
+            result = instruments.run_sql("SELECT id FROM events")
+
+        sql = instruments.db.stream_sql.call_args[0][0]
+        self.assertTrue(sql.endswith("LIMIT 10"))
+        self.assertEqual(
+            instruments.db.stream_sql.call_args[1]["statement_timeout_ms"],
+            guard.statement_timeout_ms,
+        )
+        self.assertIn('"row_limit": 10', result)
+
+    def test_run_sql_reuses_guard_plan_for_copy(self):
+        instruments = PostgresAgentInstruments(
+            "test_db_url",
+            "test_session",
+            query_guard=QueryGuard(),
+            copy_row_threshold=1000,
+        )
+        instruments.db = MagicMock()
+        instruments.db.explain.return_value = {
+            "Node Type": "Seq Scan",
+            "Total Cost": 10,
+            "Plan Rows": 5000,
+        }
+        instruments.db.copy_sql_to_file.return_value = 5000
+
+        instruments.run_sql("SELECT * FROM events")
+
+        instruments.db.explain.assert_called_once()
+        instruments.db.estimate_rows.assert_not_called()
+        instruments.db.copy_sql_to_file.assert_called_once()
+
+    def test_query_guard_runs_before_query_cache(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache = QueryResultCache(os.path.join(tmp_dir, "cache"))
+
+            def run(guard, plan_rows):
+                with patch("agentic_edu.agents.instruments.BASE_DIR", tmp_dir):
+                    instruments = PostgresAgentInstruments(
+                        "test_db_url",
+                        "test_session",
+                        query_cache=cache,
+                        query_guard=guard,
+                        results_format="jsonl",
+                    )
+                    instruments.reset_files()
+                    instruments.db = MagicMock()
+                    instruments.db.get_schema_version.return_value = "v1"
+                    instruments.db.explain.return_value = {
+                        "Node Type": "Seq Scan",
+                        "Total Cost": 10,
+                        "Plan Rows": plan_rows,
+                    }
+                    instruments.db.stream_sql.return_value.__enter__.return_value = (
+                        ["id"],
+                        iter([[(1,)]]),
+                    )
+                    result = instruments.run_sql("SELECT id FROM events")
+                return instruments, result
+
+            # cached while the table was small
+            run(QueryGuard(max_rows=1000), 10)
+
+            # a stricter guard rejects the query even though it is cached
+            _, result = run(QueryGuard(max_rows=1), 10)
+            self.assertIn('"error": "query_rejected"', result)
+
+            # a limited query is a different query, not the cached full result
+            limited, result = run(
+                QueryGuard(max_rows=1, action="limit", limit_rows=5), 10
+            )
+            limited.db.stream_sql.assert_called_once()
+            self.assertIn('"row_limit": 5', result)
+            self.assertEqual(cache.metrics["hits"], 0)
+
+    def test_run_sql_statement_timeout(self):
+        instruments = PostgresAgentInstruments(
+            "test_db_url",
+            "test_session",
+            query_guard=QueryGuard(max_cost=1000, action="limit"),
+        )
+        instruments.db = MagicMock()
+        instruments.db.explain.return_value = {
+            "Node Type": "Aggregate",
+            "Total Cost": 1e9,
+            "Plan Rows": 1,
+        }
+        instruments.db.estimate_rows.return_value = 1
+        instruments.db.run_sql.side_effect = QueryCanceledError("canceling statement")
+
+        result = instruments.run_sql("SELECT count(*) FROM users, orders")
+
+        self.assertIn('"error": "query_cancelled"', result)
+
+    def test_run_sql_reports_truncated_results(self):
+        instruments = PostgresAgentInstruments(
+            "test_db_url",
+            "test_session",
+            results_format="jsonl",
+            statement_timeout_ms=5000,
+            max_rows=2,
+        )
+        instruments.db = MagicMock()
+        instruments.db.stream_sql.return_value.__enter__.return_value = (
+            ["id"],
+            iter([[(1,), (2,)], [(3,)]]),
+        )
+
+        with patch("builtins.open", mock_open()) as mock_file:
+            result = instruments.run_sql("SELECT id FROM events")
+
+        self.assertEqual(mock_file().writelines.call_count, 1)
+        self.assertIn('"row_count": 2', result)
+        self.assertIn('"truncated": true', result)
+        self.assertEqual(
+            instruments.db.stream_sql.call_args[1]["statement_timeout_ms"], 5000
+        )
+        # capped queries are fetched, never exported with COPY
+        instruments.db.estimate_rows.assert_not_called()
+
+    def test_cancel(self):
+        instruments = PostgresAgentInstruments("test_db_url", "test_session")
+        instruments.cancel()
+        instruments.db = MagicMock()
+        instruments.cancel()
+        instruments.db.cancel.assert_called_once()
+
+    @patch("agentic_edu.agents.instruments.db_pool.get_pool")
+    @patch("agentic_edu.agents.instruments.PostgresManager")
+    def test_enter_routes_to_replicas(self, mock_manager, mock_get_pool):
+        instruments = PostgresAgentInstruments(
+            "primary_url",
+            "test_session",
+            replica_urls=["replica_a", "replica_b"],
+            replica_strategy="least_latency",
+        )
+        with patch.object(instruments, "reset_files"):
+            instruments.__enter__()
+
+        router = instruments.db.connect_with_pool.call_args[0][0]
+        self.assertIsInstance(router, ReplicaRouter)
+        self.assertEqual(router.strategy, "least_latency")
+        self.assertEqual(
+            [call.args[0] for call in mock_get_pool.call_args_list],
+            ["primary_url", "replica_a", "replica_b"],
+        )
+        instruments.db.connect_with_url.assert_not_called()
+
+    def test_run_sql_fans_out_to_tenants(self):
+        instruments = PostgresAgentInstruments("test_db_url", "test_session")
+        instruments.db = MagicMock()
+        instruments.db.datetime_handler = str
+        instruments.tenant_dbs = {"tenant_a": MagicMock(), "tenant_b": MagicMock()}
+        fan_out_result = FanOutResult(
+            columns=["_database", "id"],
+            rows=[("tenant_a", 1), ("tenant_b", 2)],
+            errors={},
+        )
+
+        with patch(
+            "agentic_edu.modules.db_router.fan_out", return_value=fan_out_result
+        ) as mock_fan_out, patch("builtins.open", mock_open()) as mock_file:
+            result = instruments.run_sql("SELECT id FROM users")
+
+        self.assertIs(mock_fan_out.call_args[0][0], instruments.tenant_dbs)
+        written = "".join(call.args[0] for call in mock_file().write.call_args_list)
+        self.assertEqual(
+            json.loads(written),
+            [{"_database": "tenant_a", "id": 1}, {"_database": "tenant_b", "id": 2}],
+        )
+        self.assertIn('"databases": ["tenant_a", "tenant_b"]', result)
+        instruments.db.run_sql.assert_not_called()
+
     def test_validate_run_sql(self):
         instruments = PostgresAgentInstruments("test_db_url", "test_session")
         with patch("builtins.open", mock_open(read_data="test_data")) as mock_file:
             result, message = instruments.validate_run_sql()
         self.assertTrue(result)
         self.assertEqual(message, "")
-        mock_file.assert_called_once_with(instruments.run_sql_results_file, "r")
+        mock_file.assert_called_once_with(instruments.run_sql_results_file, "rb")
+
+    def test_validate_run_sql_empty_jsonl_result(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with patch("agentic_edu.agents.instruments.BASE_DIR", tmp_dir):
+                instruments = PostgresAgentInstruments(
+                    "test_db_url", "test_session", results_format="jsonl"
+                )
+                instruments.reset_files()
+                instruments.db = MagicMock()
+                instruments.db.estimate_rows.return_value = 0
+                instruments.db.stream_sql.return_value.__enter__.return_value = (
+                    ["id"],
+                    iter([]),
+                )
+                result = instruments.run_sql("SELECT id FROM users WHERE false")
+                self.assertEqual(
+                    os.path.getsize(instruments.last_run_sql_results_file), 0
+                )
+                self.assertIn('"row_count": 0', result)
+                self.assertEqual(instruments.validate_run_sql(), (True, ""))
 
     @patch("agentic_edu.modules.file.write_file", return_value="test_result")
     def test_write_file(self, mock_write_file):
@@ -0,0 +1,41 @@
+from agentic_edu.modules.keyword_matcher import KeywordMatcher
+
+
+def test_find_single_keyword():
+    matcher = KeywordMatcher(["users"])
+    assert matcher.find("give me all users") == ["users"]
+    assert matcher.find("give me all jobs") == []
+
+
+def test_find_is_case_insensitive():
+    matcher = KeywordMatcher(["Users", "JOBS"])
+    assert matcher.find("users with jobs") == ["Users", "JOBS"]
+
+
+def test_find_matches_substrings():
+    # same semantics as a plain `name in query` check
+    matcher = KeywordMatcher(["user", "user_accounts", "account"])
+    assert matcher.find("list user_accounts") == ["user", "user_accounts", "account"]
+
+
+def test_find_overlapping_keywords():
+    matcher = KeywordMatcher(["she", "he", "hers", "his"])
+    assert matcher.find("ushers") == ["she", "he", "hers"]
+
+
+def test_find_returns_keywords_in_insertion_order():
+    matcher = KeywordMatcher(["b", "a"])
+    assert matcher.find("a b") == ["b", "a"]
+
+
+def test_add_rebuilds_automaton():
+    matcher = KeywordMatcher(["users"])
+    assert matcher.find("orders for users") == ["users"]
+    matcher.add("orders")
+    assert matcher.is_stale
+    assert matcher.find("orders for users") == ["users", "orders"]
+
+
+def test_add_ignores_duplicates_and_empty():
+    matcher = KeywordMatcher(["users", "users", ""])
+    assert len(matcher) == 1
@@ -1,7 +1,12 @@
+import asyncio
 import unittest
 from unittest.mock import patch, MagicMock, call
 import os
 from agentic_edu.modules import llm  # assuming the llm.py is in the same directory
+from agentic_edu.modules.llm_cache import ResponseCache
+from agentic_edu.modules.rate_limit import RateLimiter
+from agentic_edu.modules.resilience import RetryPolicy, circuit_breakers
+from agentic_edu.modules.usage import UsageLedger
 
 
 class TestLLMMethods(unittest.TestCase):
@@ -25,6 +30,49 @@ class TestLLMMethods(unittest.TestCase):
         response = llm.prompt("test_prompt")
         self.assertEqual(response, "test_content")
 
+    @patch("agentic_edu.modules.llm.openai.ChatCompletion.create")
+    def test_prompt_retries_transient_errors(self, mock_create):
+        circuit_breakers.clear()
+        mock_create.side_effect = [
+            llm.openai.error.ServiceUnavailableError("overloaded"),
+            fake_response("test_content"),
+        ]
+        response = llm.prompt("test_prompt", retry_policy=RetryPolicy(base_delay=0.001))
+        self.assertEqual(response, "test_content")
+        self.assertEqual(mock_create.call_count, 2)
+
+    @patch("agentic_edu.modules.llm.openai.ChatCompletion.create")
+    def test_prompt_does_not_retry_bad_requests(self, mock_create):
+        circuit_breakers.clear()
+        mock_create.side_effect = llm.openai.error.InvalidRequestError("bad", None)
+        with self.assertRaises(llm.openai.error.InvalidRequestError):
+            llm.prompt("test_prompt", retry_policy=RetryPolicy(base_delay=0.001))
+        self.assertEqual(mock_create.call_count, 1)
+
+    @patch("agentic_edu.modules.llm.openai.ChatCompletion.create")
+    def test_prompt_cache(self, mock_create):
+        cache = ResponseCache(":memory:")
+        mock_create.return_value = fake_response("test_content")
+
+        self.assertEqual(llm.prompt("test_prompt", cache=cache), "test_content")
+        self.assertEqual(llm.prompt("test_prompt", cache=cache), "test_content")
+
+        mock_create.assert_called_once()
+        self.assertEqual(cache.metrics["hits"], 1)
+
+    @patch("agentic_edu.modules.llm.openai.ChatCompletion.create")
+    def test_prompt_records_usage(self, mock_create):
+        ledger = UsageLedger()
+        response = fake_response("test_content", completion_tokens=20)
+        response["usage"]["prompt_tokens"] = 1000
+        mock_create.return_value = response
+
+        llm.prompt("test_prompt", usage_ledger=ledger)
+
+        self.assertEqual(ledger.total.prompt_tokens, 1000)
+        self.assertEqual(ledger.total.completion_tokens, 20)
+        self.assertAlmostEqual(ledger.total.cost, 0.03 + 0.0012)
+
     def test_add_cap_ref(self):
         prompt = "Refactor this code."
         prompt_suffix = "Make it more readable using this EXAMPLE."
@@ -40,12 +88,170 @@ class TestLLMMethods(unittest.TestCase):
         mock_get_encoding.return_value = MagicMock(
             encode=MagicMock(return_value=[1, 2, 3])
         )
+        llm.get_encoding.cache_clear()
+        self.addCleanup(llm.get_encoding.cache_clear)
         self.assertEqual(llm.count_tokens("test_text"), 3)
+        self.assertEqual(llm.count_tokens("more_text"), 3)
+        # the encoding is only built once
+        mock_get_encoding.assert_called_once_with("cl100k_base")
+
+    def test_estimate_price(self):
+        self.assertEqual(llm.estimate_price(2000), 0.12)
+        self.assertEqual(llm.estimate_price(0), 0.0)
 
     @patch("agentic_edu.modules.llm.count_tokens", return_value=2000)
     def test_estimate_price_and_tokens(self, mock_count_tokens):
         self.assertEqual(llm.estimate_price_and_tokens("test_text"), (0.12, 2000))
 
 
+def fake_response(content, completion_tokens=5):
+    return {
+        "choices": [{"message": {"content": content}}],
+        "usage": {"completion_tokens": completion_tokens},
+    }
+
+
+class FakeTransport:
+    """
+    Echoes the prompt back after yielding to the loop, tracking requests in flight
+    """
+
+    def __init__(self):
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.calls = []
+
+    async def __call__(self, model, messages, timeout):
+        self.calls.append((model, messages, timeout))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        content = messages[0]["content"]
+        # later prompts finish first to check the results keep their order
+        await asyncio.sleep(0.001 * (10 - int(content)))
+        self.in_flight -= 1
+        return fake_response("answer " + content)
+
+
+class TestAsyncPrompt(unittest.TestCase):
+    def setUp(self):
+        circuit_breakers.clear()
+
+    def test_aprompt(self):
+        transport = FakeTransport()
+        response = asyncio.run(
+            llm.aprompt("1", model="gpt-4", transport=transport, timeout=5)
+        )
+        self.assertEqual(response, "answer 1")
+        self.assertEqual(
+            transport.calls, [("gpt-4", [{"role": "user", "content": "1"}], 5)]
+        )
+
+    @patch("agentic_edu.modules.llm.count_tokens", return_value=7)
+    def test_aprompt_rate_limiter(self, mock_count_tokens):
+        rate_limiter = MagicMock(spec=RateLimiter)
+        rate_limiter.tokens = object()
+
+        asyncio.run(
+            llm.aprompt("1", transport=FakeTransport(), rate_limiter=rate_limiter)
+        )
+
+        rate_limiter.acquire_async.assert_awaited_once_with(7)
+        rate_limiter.consume.assert_called_once_with(5)
+
+    def test_aprompt_batch_caps_concurrency_and_keeps_order(self):
+        transport = FakeTransport()
+        prompts = [str(i) for i in range(10)]
+
+        responses = asyncio.run(
+            llm.aprompt_batch(prompts, max_concurrency=3, transport=transport)
+        )
+
+        self.assertEqual(responses, ["answer " + p for p in prompts])
+        self.assertEqual(transport.max_in_flight, 3)
+
+    def test_aprompt_batch_return_exceptions(self):
+        async def transport(model, messages, timeout):
+            if messages[0]["content"] == "bad":
+                raise TimeoutError("slow")
+            return fake_response("ok")
+
+        responses = asyncio.run(
+            llm.aprompt_batch(
+                ["good", "bad"],
+                transport=transport,
+                return_exceptions=True,
+                retry_policy=RetryPolicy(max_attempts=1),
+            )
+        )
+
+        self.assertEqual(responses[0], "ok")
+        self.assertIsInstance(responses[1], TimeoutError)
+
+    def test_aprompt_retries_transient_errors(self):
+        attempts = []
+
+        async def transport(model, messages, timeout):
+            attempts.append(1)
+            if len(attempts) < 3:
+                raise llm.openai.error.RateLimitError("slow down")
+            return fake_response("ok")
+
+        response = asyncio.run(
+            llm.aprompt(
+                "1",
+                transport=transport,
+                retry_policy=RetryPolicy(base_delay=0.001),
+            )
+        )
+        self.assertEqual(response, "ok")
+        self.assertEqual(len(attempts), 3)
+
+    def test_aprompt_rate_limits_every_attempt(self):
+        rate_limiter = RateLimiter(rpm=100)
+        attempts = []
+
+        async def transport(model, messages, timeout):
+            attempts.append(1)
+            if len(attempts) < 3:
+                raise llm.openai.error.RateLimitError("slow down")
+            return fake_response("ok")
+
+        with patch.object(
+            rate_limiter, "reserve", wraps=rate_limiter.reserve
+        ) as mock_reserve:
+            asyncio.run(
+                llm.aprompt(
+                    "1",
+                    transport=transport,
+                    rate_limiter=rate_limiter,
+                    retry_policy=RetryPolicy(base_delay=0.001),
+                )
+            )
+        self.assertEqual(mock_reserve.call_count, 3)
+        self.assertAlmostEqual(rate_limiter.requests.balance, 97, delta=0.1)
+
+    def test_aprompt_rate_limits_hedged_requests(self):
+        rate_limiter = MagicMock(spec=RateLimiter)
+        rate_limiter.tokens = None
+
+        async def transport(model, messages, timeout):
+            await asyncio.sleep(0.05)
+            return fake_response("ok")
+
+        asyncio.run(
+            llm.aprompt(
+                "1",
+                transport=transport,
+                rate_limiter=rate_limiter,
+                hedge_after=0.01,
+            )
+        )
+        self.assertEqual(rate_limiter.acquire_async.await_count, 2)
+
+    def test_prompt_batch(self):
+        responses = llm.prompt_batch(["1", "2"], transport=FakeTransport())
+        self.assertEqual(responses, ["answer 1", "answer 2"])
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,185 @@
+from unittest.mock import MagicMock, patch
+import autogen
+import numpy as np
+import pytest
+from agentic_edu.modules.llm_cache import ResponseCache, register_response_cache
+
+MESSAGES = [
+    {"role": "system", "content": "You are a data analyst"},
+    {"role": "user", "content": "How many users signed up today?"},
+]
+
+
+class FakeEmbedder:
+    """
+    Embeds a text as its letter counts, so reworded texts stay close
+    """
+
+    def compute_embeddings(self, text):
+        vector = np.zeros((1, 26), dtype=np.float32)
+        for char in text.lower():
+            if "a" <= char <= "z":
+                vector[0, ord(char) - ord("a")] += 1
+        return vector
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ResponseCache(str(tmp_path / "responses.sqlite"))
+    yield cache
+    cache.close()
+
+
+def with_last_message(content):
+    return MESSAGES[:-1] + [{"role": "user", "content": content}]
+
+
+def test_exact_hit_and_miss(cache):
+    assert cache.get("gpt-4", 0, MESSAGES) is None
+    cache.put("gpt-4", 0, MESSAGES, "42")
+
+    assert cache.get("gpt-4", 0, MESSAGES) == "42"
+    assert cache.metrics["hits"] == 1
+    assert cache.metrics["misses"] == 1
+    assert cache.metrics["entries"] == 1
+
+
+def test_key_includes_model_temperature_and_functions(cache):
+    cache.put("gpt-4", 0, MESSAGES, "42")
+    assert cache.get("gpt-3.5-turbo", 0, MESSAGES) is None
+    assert cache.get("gpt-4", 0.7, MESSAGES) is None
+    assert cache.get("gpt-4", 0, MESSAGES, functions=[{"name": "run_sql"}]) is None
+
+
+def test_ignores_extra_message_fields(cache):
+    cache.put("gpt-4", 0, MESSAGES, "42")
+    messages = MESSAGES[:-1] + [{**MESSAGES[-1], "context": {"a": 1}}]
+    assert cache.get("gpt-4", 0, messages) == "42"
+
+
+def test_function_call_responses(cache):
+    reply = {"name": "run_sql", "arguments": '{"sql": "SELECT 1"}'}
+    cache.put("gpt-4", 0, MESSAGES, {"function_call": reply})
+    assert cache.get("gpt-4", 0, MESSAGES) == {"function_call": reply}
+
+
+def test_shared_across_sessions(tmp_path):
+    path = str(tmp_path / "responses.sqlite")
+    first = ResponseCache(path)
+    first.put("gpt-4", 0, MESSAGES, "42")
+    first.close()
+
+    second = ResponseCache(path)
+    assert second.get("gpt-4", 0, MESSAGES) == "42"
+    second.close()
+
+
+def test_semantic_hit_for_near_duplicate(tmp_path):
+    cache = ResponseCache(
+        str(tmp_path / "responses.sqlite"),
+        embedder=FakeEmbedder(),
+        similarity_threshold=0.95,
+    )
+    cache.put("gpt-4", 0, MESSAGES, "42")
+
+    near_duplicate = with_last_message("How many users signed up today??")
+    assert cache.get("gpt-4", 0, near_duplicate) == "42"
+    assert cache.metrics["semantic_hits"] == 1
+
+    assert cache.get("gpt-4", 0, with_last_message("List all orders")) is None
+    # near-duplicates need the same earlier messages
+    other_system = [{"role": "system", "content": "Be brief"}] + near_duplicate[1:]
+    assert cache.get("gpt-4", 0, other_system) is None
+    cache.close()
+
+
+def test_only_exact_repeats_by_default(cache):
+    cache.put("gpt-4", 0, MESSAGES, "42")
+    assert (
+        cache.get("gpt-4", 0, with_last_message("How many users signed up today??"))
+        is None
+    )
+
+
+def test_semantic_precision_at_temperature_0(tmp_path):
+    cache = ResponseCache(
+        str(tmp_path / "responses.sqlite"),
+        embedder=FakeEmbedder(),
+        similarity_threshold=0.95,
+    )
+    answers = {
+        "What was the revenue in 2022?": "1M",
+        "How many rows are in user_accounts?": "10",
+        "Count the users with an email like '%@gmail.com'": "7",
+    }
+    for question, answer in answers.items():
+        cache.put("gpt-4", 0, with_last_message(question), answer)
+
+    # (question, the only acceptable reply, None if it must miss)
+    queries = [
+        ("What was the revenue in 2022??", "1M"),
+        ("what was the revenue in 2022?", "1M"),
+        ("What was the revenue in 2023?", None),
+        ("How many rows are in user_account?", None),
+        ("How many rows are in user_accounts ?", "10"),
+        ("Count the users with an email like '%@yahoo.com'", None),
+    ]
+    served = [
+        (cache.get("gpt-4", 0, with_last_message(question)), expected)
+        for question, expected in queries
+    ]
+
+    # every reply served is the right one, and reworded repeats are served
+    assert all(reply == expected for reply, expected in served if reply is not None)
+    assert [reply for reply, _ in served] == [expected for _, expected in queries]
+    cache.close()
+
+
+def test_no_semantic_lookup_when_sampling(tmp_path):
+    embedder = MagicMock(wraps=FakeEmbedder())
+    cache = ResponseCache(str(tmp_path / "responses.sqlite"), embedder=embedder)
+    cache.put("gpt-4", 0.7, MESSAGES, "42")
+    assert (
+        cache.get("gpt-4", 0.7, with_last_message("How many users signed up?")) is None
+    )
+    embedder.compute_embeddings.assert_not_called()
+    cache.close()
+
+
+def test_size_bounded_lru_eviction(tmp_path):
+    cache = ResponseCache(str(tmp_path / "responses.sqlite"), max_bytes=25)
+    with patch("agentic_edu.modules.llm_cache.time.time", side_effect=range(100)):
+        cache.put("gpt-4", 0, with_last_message("a"), "x" * 8)
+        cache.put("gpt-4", 0, with_last_message("b"), "y" * 8)
+        # "a" is used again, so "b" is the least recently used
+        assert cache.get("gpt-4", 0, with_last_message("a")) == "x" * 8
+        cache.put("gpt-4", 0, with_last_message("c"), "z" * 8)
+
+        assert cache.get("gpt-4", 0, with_last_message("b")) is None
+        assert cache.get("gpt-4", 0, with_last_message("a")) is not None
+        assert cache.get("gpt-4", 0, with_last_message("c")) is not None
+
+    assert cache.metrics["evictions"] == 1
+    assert cache.metrics["bytes"] <= 25
+    cache.close()
+
+
+def test_register_response_cache(cache):
+    agent = autogen.AssistantAgent(
+        "analyst",
+        llm_config={
+            "temperature": 0,
+            "config_list": [{"model": "gpt-4", "api_key": "x"}],
+        },
+    )
+    register_response_cache(agent, cache)
+    messages = [{"role": "user", "content": "How many users?"}]
+
+    with patch.object(
+        autogen.ConversableAgent, "generate_oai_reply", return_value=(True, "42")
+    ) as mock_reply:
+        assert agent.generate_reply(messages=messages) == "42"
+        assert agent.generate_reply(messages=messages) == "42"
+
+    mock_reply.assert_called_once()
+    assert cache.metrics["hits"] == 1
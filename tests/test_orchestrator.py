@@ -1,10 +1,19 @@
 import unittest
 from unittest.mock import MagicMock, patch, mock_open
-from agentic_edu.modules.orchestrator import Orchestrator
+import openai
+from agentic_edu.modules.orchestrator import Orchestrator, agent_endpoint
+from agentic_edu.modules.resilience import (
+    RetryPolicy,
+    circuit_breakers,
+    get_circuit_breaker,
+)
+from agentic_edu.modules.usage import UsageLedger, current_ledger
+import time
 
 
 class TestOrchestrator(unittest.TestCase):
     def setUp(self):
+        circuit_breakers.clear()
         self.mock_agent = MagicMock()
         self.mock_instruments = MagicMock()
         self.orchestrator = Orchestrator(
@@ -72,6 +81,154 @@ class TestOrchestrator(unittest.TestCase):
     def test_round_robin_conversation(self):
         pass
 
+    @patch("builtins.open", new_callable=mock_open)
+    def test_deadline_cancels_and_fails_conversation(self, mock_file):
+        orchestrator = Orchestrator(
+            "test",
+            [self.mock_agent, self.mock_agent],
+            self.mock_instruments,
+            deadline_seconds=0.05,
+        )
+        orchestrator.get_cost_and_tokens = MagicMock(return_value=(0.0, 0))
+
+        def slow_reply(sender):
+            time.sleep(0.2)
+            return "reply"
+
+        self.mock_agent.name = "agent"
+        self.mock_agent.generate_reply.side_effect = slow_reply
+
+        result = orchestrator.round_robin_conversation("Hello", loops=5)
+
+        self.assertFalse(result.success)
+        self.assertIn("deadline", result.error_message)
+        self.mock_instruments.cancel.assert_called_once()
+        # stopped at the first message after the deadline, not after 10 turns
+        self.assertEqual(self.mock_agent.generate_reply.call_count, 1)
+
+    @patch("builtins.open", new_callable=mock_open)
+    def test_no_deadline(self, mock_file):
+        self.orchestrator.get_cost_and_tokens = MagicMock(return_value=(0.0, 0))
+        self.mock_agent.name = "agent"
+        self.mock_agent.generate_reply.return_value = "reply"
+        result = self.orchestrator.round_robin_conversation("Hello", loops=1)
+        self.assertEqual(result.error_message, "")
+        self.mock_instruments.cancel.assert_not_called()
+
+    def test_generate_reply_retries_transient_errors(self):
+        orchestrator = Orchestrator(
+            "test",
+            [self.mock_agent, self.mock_agent],
+            self.mock_instruments,
+            retry_policy=RetryPolicy(base_delay=0.001),
+        )
+        self.mock_agent.generate_reply.side_effect = [
+            openai.error.RateLimitError("slow down"),
+            "reply",
+        ]
+        orchestrator.basic_chat(self.mock_agent, self.mock_agent, "Hello")
+        self.assertEqual(orchestrator.messages, ["reply"])
+
+    @patch("builtins.open", new_callable=mock_open)
+    def test_unavailable_llm_fails_conversation(self, mock_file):
+        orchestrator = Orchestrator(
+            "test",
+            [self.mock_agent, self.mock_agent],
+            self.mock_instruments,
+            retry_policy=RetryPolicy(max_attempts=2, base_delay=0.001),
+        )
+        orchestrator.get_cost_and_tokens = MagicMock(return_value=(0.0, 0))
+        self.mock_agent.name = "agent"
+        self.mock_agent.generate_reply.side_effect = openai.error.APIConnectionError(
+            "connection reset"
+        )
+
+        result = orchestrator.round_robin_conversation("Hello", loops=1)
+
+        self.assertFalse(result.success)
+        self.assertIn("2 attempts", result.error_message)
+        self.assertEqual(result.messages, ["Hello", "Hello"])
+
+    def test_token_usage_is_incremental(self):
+        self.mock_agent.name = "agent"
+        self.mock_agent.generate_reply.return_value = "reply"
+        with patch(
+            "agentic_edu.modules.llm.count_tokens", side_effect=len
+        ) as mock_count:
+            self.orchestrator.add_message("Hello")
+            self.orchestrator.basic_chat(self.mock_agent, self.mock_agent, "Hello")
+            self.assertEqual(
+                self.orchestrator.get_cost_and_tokens(),
+                (0.0, 10),
+            )
+
+            self.orchestrator.add_message({"content": "abc"}, "other")
+            self.orchestrator.add_message({"function_call": {"name": "f"}}, "other")
+            self.orchestrator.add_message(None)
+            usage = self.orchestrator.update_token_usage()
+
+        # every message is tokenized once
+        self.assertEqual(mock_count.call_count, 5)
+        self.assertEqual(
+            self.orchestrator.message_tokens[2:], [3, len("{'name': 'f'}"), 0]
+        )
+        self.assertEqual(usage.prompt_tokens, 5)
+        self.assertEqual(usage.completion_tokens, 5 + 3 + len("{'name': 'f'}"))
+        self.assertEqual(usage.by_agent["other"], 3 + len("{'name': 'f'}"))
+        self.assertEqual(usage.total_tokens, sum(self.orchestrator.message_tokens))
+
+    @patch("builtins.open", new_callable=mock_open)
+    @patch("agentic_edu.modules.llm.count_tokens", side_effect=len)
+    def test_token_budget_stops_conversation(self, mock_count, mock_file):
+        orchestrator = Orchestrator(
+            "test",
+            [self.mock_agent, self.mock_agent],
+            self.mock_instruments,
+            token_budget=20,
+        )
+        self.mock_agent.name = "agent"
+        self.mock_agent.generate_reply.return_value = "x" * 19
+
+        result = orchestrator.round_robin_conversation("Hello", loops=5)
+
+        self.assertFalse(result.success)
+        self.assertIn("budget of 20", result.error_message)
+        self.assertEqual(self.mock_agent.generate_reply.call_count, 1)
+        self.assertEqual(result.tokens, 5 + 5 + 19)
+
+    def test_cost_from_usage_ledger(self):
+        session = UsageLedger({"session": "s1"})
+        orchestrator = Orchestrator(
+            "team",
+            [self.mock_agent, self.mock_agent],
+            self.mock_instruments,
+            usage_ledger=session,
+        )
+
+        def generate_reply(sender=None):
+            # stands in for the agent's ChatCompletion.create
+            current_ledger.get().record("gpt-4", 1000, 500)
+            return "reply"
+
+        self.mock_agent.generate_reply.side_effect = generate_reply
+        orchestrator.generate_reply(self.mock_agent, self.mock_agent)
+
+        self.assertEqual(orchestrator.get_cost_and_tokens(), (0.06, 1500))
+        self.assertEqual(session.by("team")["team"].calls, 1)
+
+    def test_tool_error_does_not_wedge_circuit(self):
+        breaker = get_circuit_breaker(agent_endpoint(self.mock_agent))
+        breaker.record_failure()
+        breaker.state = "half_open"
+        self.mock_agent.generate_reply.side_effect = [KeyError("tool failed"), "reply"]
+
+        with self.assertRaises(KeyError):
+            self.orchestrator.generate_reply(self.mock_agent, self.mock_agent)
+        self.assertEqual(
+            self.orchestrator.generate_reply(self.mock_agent, self.mock_agent), "reply"
+        )
+        self.assertEqual(breaker.state, "closed")
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,157 @@
+from unittest.mock import patch
+import pytest
+from agentic_edu.modules.db import format_create_table
+from agentic_edu.modules.fk_graph import ForeignKeyGraph
+from agentic_edu.modules.prompt_packer import (
+    PromptPacker,
+    TableCandidate,
+    abbreviate_type,
+    is_low_value_column,
+    parse_table_definition,
+    rank_tables,
+)
+
+USERS = format_create_table(
+    "users",
+    "id integer,\nemail character varying(255),\ncreated_at timestamp without time zone,\n"
+    "updated_at timestamp without time zone,\nupdated_by integer,\n_fivetran_synced timestamp with time zone",
+)
+ORDERS = format_create_table(
+    "orders", "id integer,\nuser_id integer,\ntotal double precision"
+)
+ITEMS = format_create_table("items", "id integer,\norder_id integer,\nsku text")
+COUPONS = format_create_table("coupons", "id integer,\ncode text")
+
+DEFINITIONS = {
+    "users": USERS,
+    "orders": ORDERS,
+    "items": ITEMS,
+    "coupons": COUPONS,
+}
+
+
+@pytest.fixture(autouse=True)
+def count_characters():
+    # one token per character keeps budgets easy to reason about
+    with patch("agentic_edu.modules.llm.count_tokens", side_effect=len):
+        yield
+
+
+def test_abbreviate_type():
+    assert abbreviate_type("character varying(255)") == "varchar(255)"
+    assert abbreviate_type("character(2)") == "char(2)"
+    assert abbreviate_type("timestamp without time zone") == "timestamp"
+    assert abbreviate_type("timestamp with time zone") == "timestamptz"
+    assert abbreviate_type("integer[]") == "int[]"
+    assert abbreviate_type("jsonb") == "jsonb"
+
+
+def test_abbreviate_type_with_modifier():
+    assert abbreviate_type("timestamp(3) without time zone") == "timestamp(3)"
+    assert abbreviate_type("timestamp(0) with time zone") == "timestamptz(0)"
+    assert abbreviate_type("time(6) with time zone") == "timetz(6)"
+    assert abbreviate_type("time(6) without time zone[]") == "time(6)[]"
+    assert abbreviate_type("character varying(64)[]") == "varchar(64)[]"
+    assert abbreviate_type("numeric(10,2)") == "numeric(10,2)"
+
+
+def test_parse_table_definition():
+    name, columns = parse_table_definition(ORDERS)
+    assert name == "orders"
+    assert columns == [
+        ["id", "integer"],
+        ["user_id", "integer"],
+        ["total", "double precision"],
+    ]
+    assert parse_table_definition("not a table") is None
+
+
+def test_is_low_value_column():
+    assert is_low_value_column("updated_at", set())
+    assert is_low_value_column("_fivetran_synced", set())
+    assert not is_low_value_column("created_at", set())
+    assert not is_low_value_column("email", set())
+    assert not is_low_value_column("updated_by_id", set())
+    # named in the question
+    assert not is_low_value_column("updated_at", {"updated_at"})
+
+
+def test_rank_tables_by_score_and_fk_distance():
+    graph = ForeignKeyGraph(
+        [("orders", "users"), ("items", "orders"), ("coupons", "items")]
+    )
+    candidates = rank_tables({"users": 0.9, "coupons": 0.3}, DEFINITIONS, graph)
+
+    assert [(c.name, c.hops) for c in candidates] == [
+        ("users", 0),
+        # one hop from a 0.9 match beats a 0.3 match
+        ("items", 1),
+        ("orders", 1),
+        ("coupons", 0),
+    ]
+    assert candidates[1].relevance == pytest.approx(0.45)
+
+    assert [c.name for c in rank_tables({"users": 0.9}, DEFINITIONS, graph, 0)] == [
+        "users"
+    ]
+
+
+def test_pack_compacts_types():
+    packed = PromptPacker(token_budget=10_000).pack(
+        [TableCandidate("orders", ORDERS, 1.0)]
+    )
+    assert packed.text == (
+        "CREATE TABLE orders (\nid int,\nuser_id int,\ntotal float8\n);"
+    )
+    assert packed.tokens == len(packed.text)
+    assert packed.tables == ["orders"]
+    assert packed.compressed == []
+
+
+def test_pack_drops_low_value_columns_when_needed():
+    packer = PromptPacker(token_budget=10_000)
+    full = packer.pack([TableCandidate("users", USERS, 1.0)])
+    assert "updated_by" in full.text
+
+    packer.token_budget = full.tokens - 1
+    packed = packer.pack([TableCandidate("users", USERS, 1.0)])
+
+    assert packed.compressed == ["users"]
+    assert "updated_at" not in packed.text
+    assert "_fivetran_synced" not in packed.text
+    assert "created_at timestamp" in packed.text
+    assert "-- 3 more columns omitted" in packed.text
+    assert packed.tokens <= packer.token_budget
+
+
+def test_pack_keeps_columns_named_in_query():
+    packer = PromptPacker(token_budget=10_000)
+    budget = packer.pack([TableCandidate("users", USERS, 1.0)]).tokens - 1
+    packer.token_budget = budget
+
+    packed = packer.pack(
+        [TableCandidate("users", USERS, 1.0)], "Who changed emails by updated_at?"
+    )
+    assert "updated_at timestamp" in packed.text
+    assert "updated_by" not in packed.text
+
+
+def test_pack_fills_greedily_within_budget():
+    candidates = rank_tables({"orders": 0.9, "users": 0.8, "coupons": 0.1}, DEFINITIONS)
+    packer = PromptPacker()
+    orders_tokens = len(packer.pack([TableCandidate("orders", ORDERS, 1.0)]).text)
+    coupons_tokens = len(packer.pack([TableCandidate("coupons", COUPONS, 1.0)]).text)
+
+    # users does not fit even without its bookkeeping columns, coupons does
+    packer.token_budget = orders_tokens + len("\n\n") + coupons_tokens + 10
+    packed = packer.pack(candidates)
+
+    assert packed.tables == ["orders", "coupons"]
+    assert packed.omitted == ["users"]
+    assert packed.tokens == len(packed.text)
+    assert packed.tokens <= packer.token_budget
+
+
+def test_pack_keeps_unparsed_definitions_verbatim():
+    packed = PromptPacker().pack([TableCandidate("view", "some text", 1.0)])
+    assert packed.text == "some text"
@@ -0,0 +1,65 @@
+from agentic_edu.modules.quantization import QuantizedMatrix
+import numpy as np
+import pytest
+
+
+def make_rows(n=100, dim=16, seed=0):
+    rows = np.random.default_rng(seed).standard_normal((n, dim))
+    return (rows / np.linalg.norm(rows, axis=1, keepdims=True)).astype(np.float32)
+
+
+def test_unsupported_dtype():
+    with pytest.raises(ValueError):
+        QuantizedMatrix(16, "int4")
+
+
+def test_float32_round_trip_is_exact():
+    rows = make_rows()
+    matrix = QuantizedMatrix(16)
+    matrix.append(rows)
+    np.testing.assert_array_equal(matrix.to_array(), rows)
+    assert matrix.shape == (100, 16)
+
+
+@pytest.mark.parametrize("dtype,atol", [("float16", 1e-3), ("int8", 1e-2)])
+def test_quantized_round_trip_is_close(dtype, atol):
+    rows = make_rows()
+    matrix = QuantizedMatrix(16, dtype)
+    matrix.append(rows)
+    np.testing.assert_allclose(matrix.to_array(), rows, atol=atol)
+
+
+@pytest.mark.parametrize("dtype,atol", [("float16", 1e-3), ("int8", 2e-2)])
+def test_matmul_matches_float32(dtype, atol):
+    rows = make_rows()
+    matrix = QuantizedMatrix(16, dtype)
+    matrix.append(rows)
+    query = rows[5]
+    np.testing.assert_allclose(matrix @ query, rows @ query, atol=atol)
+    assert np.argmax(matrix @ query) == 5
+
+
+def test_int8_is_a_quarter_of_float32():
+    rows = make_rows(n=100, dim=768)
+    float32 = QuantizedMatrix(768)
+    float32.append(rows)
+    int8 = QuantizedMatrix(768, "int8")
+    int8.append(rows)
+    # one float32 scale per row on top of the int8 codes
+    assert int8.nbytes == 100 * 768 + 100 * 4
+    assert float32.nbytes == 100 * 768 * 4
+
+
+def test_setitem_overwrites_row():
+    rows = make_rows(n=3)
+    matrix = QuantizedMatrix(16, "int8")
+    matrix.append(rows)
+    matrix[1] = rows[2]
+    np.testing.assert_allclose(matrix[1], rows[2], atol=1e-2)
+
+
+def test_fancy_indexing_dequantizes():
+    rows = make_rows(n=10)
+    matrix = QuantizedMatrix(16, "int8")
+    matrix.append(rows)
+    np.testing.assert_allclose(matrix[np.array([2, 7])], rows[[2, 7]], atol=1e-2)
@@ -0,0 +1,145 @@
+import os
+from agentic_edu.modules.query_cache import QueryResultCache, normalize_sql
+import pytest
+
+
+def write_results(tmp_path, content, name="run_sql_results.json"):
+    path = tmp_path / name
+    path.write_text(content)
+    return str(path)
+
+
+@pytest.mark.parametrize(
+    "sql",
+    [
+        "SELECT id, name FROM users WHERE email LIKE '%@gmail.com'",
+        "select id,name\n  from USERS\twhere email like '%@gmail.com';",
+        "-- all gmail users\nSELECT id , name FROM users /* hint */ WHERE email LIKE '%@gmail.com' ;",
+    ],
+)
+def test_normalize_sql_equivalent_queries(sql):
+    assert (
+        normalize_sql(sql) == "select id,name from users where email like '%@gmail.com'"
+    )
+
+
+def test_normalize_sql_keeps_literals_and_quoted_identifiers():
+    sql = """SELECT "UserName" FROM t WHERE note = 'It''s  -- Not A Comment'"""
+    assert (
+        normalize_sql(sql)
+        == """select "UserName" from t where note = 'It''s  -- Not A Comment'"""
+    )
+
+
+def test_normalize_sql_collapses_parentheses():
+    assert normalize_sql("SELECT COUNT( * ) FROM t") == "select count(*) from t"
+
+
+@pytest.mark.parametrize(
+    "sql, other",
+    [
+        ("SELECT $$Foo$$", "SELECT $$FOO$$"),
+        ("SELECT $tag$Foo$tag$", "SELECT $tag$FOO$tag$"),
+        (
+            r"SELECT * FROM t WHERE n = E'O\'Brien'",
+            r"SELECT * FROM t WHERE n = E'O\'BRIEN'",
+        ),
+    ],
+)
+def test_normalize_sql_keeps_dollar_quoted_and_escape_strings(sql, other):
+    assert normalize_sql(sql) != normalize_sql(other)
+
+
+def test_miss_then_hit(tmp_path):
+    cache = QueryResultCache(str(tmp_path / "cache"))
+    results = write_results(tmp_path, '[{"id": 1}]')
+
+    assert cache.get("SELECT 1", "v1", "json") is None
+    cache.put("SELECT 1", "v1", "json", results, {"row_count": 1})
+
+    path, summary = cache.get("select  1;", "v1", "json")
+    assert open(path).read() == '[{"id": 1}]'
+    assert summary == {"row_count": 1}
+    assert cache.metrics["hits"] == 1
+    assert cache.metrics["misses"] == 1
+
+
+def test_schema_version_and_format_are_part_of_the_key(tmp_path):
+    cache = QueryResultCache(str(tmp_path / "cache"))
+    cache.put("SELECT 1", "v1", "json", write_results(tmp_path, "[]"))
+    assert cache.get("SELECT 1", "v2", "json") is None
+    assert cache.get("SELECT 1", "v1", "jsonl") is None
+
+
+def test_database_is_part_of_the_key(tmp_path):
+    cache = QueryResultCache(str(tmp_path / "cache"))
+    cache.put("SELECT 1", "v1", "json", write_results(tmp_path, "[]"), database="a")
+    assert cache.get("SELECT 1", "v1", "json", database="b") is None
+    assert cache.get("SELECT 1", "v1", "json", database="a") is not None
+
+
+def test_ttl_expiry(tmp_path):
+    cache = QueryResultCache(str(tmp_path / "cache"), ttl_seconds=-1)
+    cache.put("SELECT 1", "v1", "json", write_results(tmp_path, "[]"))
+    assert cache.get("SELECT 1", "v1", "json") is None
+    assert cache.metrics["expirations"] == 1
+    assert cache.metrics["entries"] == 0
+
+
+def test_lru_eviction_by_bytes(tmp_path):
+    cache = QueryResultCache(str(tmp_path / "cache"), max_bytes=25)
+    results = write_results(tmp_path, "x" * 10)
+
+    cache.put("SELECT 1", "v1", "json", results)
+    cache.put("SELECT 2", "v1", "json", results)
+    # touch the first entry so the second is least recently used
+    assert cache.get("SELECT 1", "v1", "json") is not None
+    cache.put("SELECT 3", "v1", "json", results)
+
+    assert cache.get("SELECT 1", "v1", "json") is not None
+    assert cache.get("SELECT 2", "v1", "json") is None
+    assert cache.get("SELECT 3", "v1", "json") is not None
+    assert cache.metrics["evictions"] == 1
+    assert cache.metrics["bytes"] == 20
+
+
+def test_results_larger_than_cache_are_not_stored(tmp_path):
+    cache = QueryResultCache(str(tmp_path / "cache"), max_bytes=5)
+    cache.put("SELECT 1", "v1", "json", write_results(tmp_path, "x" * 10))
+    assert cache.metrics["entries"] == 0
+
+
+def test_persists_across_instances(tmp_path):
+    directory = str(tmp_path / "cache")
+    QueryResultCache(directory).put(
+        "SELECT 1", "v1", "json", write_results(tmp_path, "[]")
+    )
+
+    path, _ = QueryResultCache(directory).get("SELECT 1", "v1", "json")
+    assert os.path.exists(path)
+
+
+def test_concurrent_instances_keep_each_others_entries(tmp_path):
+    directory = str(tmp_path / "cache")
+    first = QueryResultCache(directory)
+    second = QueryResultCache(directory)
+
+    first.put("SELECT 1", "v1", "json", write_results(tmp_path, "[1]"))
+    second.put("SELECT 2", "v1", "json", write_results(tmp_path, "[2]"))
+    # a hit in one instance must not drop the other's entry
+    assert first.get("SELECT 1", "v1", "json") is not None
+
+    assert second.get("SELECT 1", "v1", "json") is not None
+    assert first.get("SELECT 2", "v1", "json") is not None
+    assert QueryResultCache(directory).metrics["entries"] == 2
+
+
+def test_entry_evicted_by_another_instance_is_a_miss(tmp_path):
+    directory = str(tmp_path / "cache")
+    first = QueryResultCache(directory)
+    first.put("SELECT 1", "v1", "json", write_results(tmp_path, "[]"))
+    path, _ = first.get("SELECT 1", "v1", "json")
+    os.remove(path)
+
+    assert QueryResultCache(directory).get("SELECT 1", "v1", "json") is None
+    assert first.metrics["entries"] == 0
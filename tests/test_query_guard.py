@@ -0,0 +1,141 @@
+from unittest.mock import MagicMock
+from agentic_edu.modules.query_guard import QueryGuard, is_select, limit_sql, split_sql
+import pytest
+
+
+def make_plan(cost, rows, node="Nested Loop"):
+    return {"Node Type": node, "Total Cost": cost, "Plan Rows": rows}
+
+
+def explain_returning(plan):
+    return lambda sql: plan
+
+
+def test_cheap_query_is_allowed_unchanged():
+    guard = QueryGuard(max_cost=1000, max_rows=1000)
+    decision = guard.check("SELECT 1", explain_returning(make_plan(10, 1)))
+    assert decision.allowed
+    assert decision.sql == "SELECT 1"
+    assert decision.statement_timeout_ms is None
+
+
+def test_unexplainable_statement_is_allowed():
+    decision = QueryGuard().check("VACUUM users", explain_returning(None))
+    assert decision.allowed
+
+
+def test_reject_returns_structured_error():
+    guard = QueryGuard(max_cost=1000, max_rows=1000)
+    decision = guard.check(
+        "SELECT * FROM users, orders", explain_returning(make_plan(5e9, 1e10))
+    )
+    assert not decision.allowed
+    assert decision.error["error"] == "query_rejected"
+    assert decision.error["estimated_rows"] == 1e10
+    assert decision.error["plan_node"] == "Nested Loop"
+    assert "cost and rows" in decision.error["reason"]
+
+
+def test_limit_wraps_large_results_and_sets_timeout():
+    guard = QueryGuard(
+        max_cost=1e12,
+        max_rows=1000,
+        action="limit",
+        limit_rows=50,
+        statement_timeout_ms=5000,
+    )
+    decision = guard.check(
+        "SELECT * FROM events;", explain_returning(make_plan(100, 1e6))
+    )
+    assert decision.allowed
+    assert decision.sql == limit_sql("SELECT * FROM events", 50)
+    assert decision.row_limit == 50
+    assert decision.statement_timeout_ms == 5000
+
+
+def test_limit_only_times_out_expensive_aggregates():
+    guard = QueryGuard(max_cost=1000, action="limit", statement_timeout_ms=5000)
+    sql = "SELECT count(*) FROM users, orders"
+    decision = guard.check(sql, explain_returning(make_plan(1e9, 1)))
+    assert decision.sql == sql
+    assert decision.row_limit is None
+    assert decision.statement_timeout_ms == 5000
+
+
+def test_limit_does_not_wrap_writes():
+    guard = QueryGuard(max_rows=10, action="limit")
+    sql = "DELETE FROM events"
+    assert guard.check(sql, explain_returning(make_plan(1, 1e6))).sql == sql
+
+
+def test_unsupported_action():
+    with pytest.raises(ValueError):
+        QueryGuard(action="warn")
+
+
+def test_is_select():
+    assert is_select("  with x as (select 1) select * from x")
+    assert not is_select("UPDATE users SET name = 'a'")
+    assert not is_select("")
+
+
+def test_is_select_skips_leading_comments():
+    assert is_select("-- top customers\n/* by revenue */ SELECT 1")
+    assert not is_select("/* SELECT */ DELETE FROM users")
+
+
+def test_is_select_rejects_multiple_statements():
+    assert not is_select("SELECT 1; INSERT INTO users VALUES (1)")
+    assert is_select("SELECT 1;")
+
+
+def test_split_sql():
+    assert split_sql("SELECT 1; -- one\nSELECT ';' /* ; */;") == [
+        "SELECT 1",
+        "SELECT ';'",
+    ]
+    assert split_sql('SELECT $body$ a; b $body$, "x;y"') == [
+        'SELECT $body$ a; b $body$, "x;y"'
+    ]
+    assert split_sql("  ; -- nothing") == []
+
+
+def test_split_sql_escape_strings():
+    assert split_sql(r"SELECT E'it\'s; fine'; SELECT 'a\'; SELECT 2") == [
+        r"SELECT E'it\'s; fine'",
+        r"SELECT 'a\'",
+        "SELECT 2",
+    ]
+
+
+def test_multiple_statements_are_rejected_before_explain():
+    explain = MagicMock()
+    decision = QueryGuard().check("SELECT 1; DROP TABLE users", explain)
+    assert not decision.allowed
+    assert decision.error["error"] == "multiple_statements"
+    explain.assert_not_called()
+
+
+def test_decision_carries_row_estimate():
+    guard = QueryGuard(max_rows=1000, action="limit", limit_rows=10)
+    decision = guard.check("SELECT 1", explain_returning(make_plan(10, 5)))
+    assert decision.explained
+    assert decision.estimated_rows == 5
+
+    decision = guard.check("SELECT 1", explain_returning(make_plan(10, 1e6)))
+    assert decision.estimated_rows == 10
+
+
+@pytest.mark.parametrize(
+    "sql",
+    [
+        "SELECT * FROM orders -- all orders",
+        "SELECT * FROM orders; -- all orders",
+        "SELECT * FROM orders /* all orders */;",
+        "/* all orders */ SELECT * FROM orders;\n",
+    ],
+)
+def test_limit_sql_drops_comments(sql):
+    assert limit_sql(sql, 10) == (
+        "SELECT * FROM (\nSELECT * FROM orders\n) AS limited_query LIMIT 10"
+    )
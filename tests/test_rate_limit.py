@@ -0,0 +1,104 @@
+import asyncio
+from unittest.mock import patch
+import pytest
+from agentic_edu.modules.rate_limit import RateLimiter, TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    fake = FakeClock()
+    with patch("agentic_edu.modules.rate_limit.time.monotonic", fake):
+        yield fake
+
+
+def test_token_bucket_wait_time(clock):
+    bucket = TokenBucket(60)
+    assert bucket.wait_time(60) == 0
+    bucket.balance = 0
+    assert bucket.wait_time(10) == pytest.approx(10)
+
+    clock.now += 5
+    bucket.refill(clock.now)
+    assert bucket.balance == pytest.approx(5)
+
+
+def test_token_bucket_refill_is_capped(clock):
+    bucket = TokenBucket(60, capacity=10)
+    clock.now += 1000
+    bucket.refill(clock.now)
+    assert bucket.balance == 10
+    # more than the bucket holds waits for a full bucket, not forever
+    assert bucket.wait_time(1_000) == 0
+
+
+def test_rate_limiter_rpm(clock):
+    limiter = RateLimiter(rpm=2)
+    assert limiter.reserve() == 0
+    assert limiter.reserve() == 0
+    assert limiter.reserve() == pytest.approx(30)
+
+    clock.now += 30
+    assert limiter.reserve() == 0
+
+
+def test_rate_limiter_tpm_does_not_take_requests_while_waiting(clock):
+    limiter = RateLimiter(rpm=10, tpm=100)
+    assert limiter.reserve(80) == 0
+    assert limiter.reserve(50) == pytest.approx(18)
+    # the rejected reservation left the request bucket alone
+    assert limiter.requests.balance == pytest.approx(9)
+
+
+def test_rate_limiter_consume_records_debt(clock):
+    limiter = RateLimiter(tpm=60)
+    assert limiter.reserve(60) == 0
+    limiter.consume(30)
+    assert limiter.tokens.balance == pytest.approx(-30)
+    assert limiter.reserve(1) == pytest.approx(31)
+
+
+def test_rate_limiter_unlimited():
+    limiter = RateLimiter()
+    for _ in range(1000):
+        assert limiter.reserve(10_000) == 0
+    limiter.consume(10_000)
+
+
+def test_rate_limiter_acquire_sleeps(clock):
+    limiter = RateLimiter(rpm=1)
+    limiter.acquire()
+
+    sleeps = []
+
+    def fake_sleep(seconds):
+        sleeps.append(seconds)
+        clock.now += seconds
+
+    with patch("agentic_edu.modules.rate_limit.time.sleep", fake_sleep):
+        limiter.acquire()
+    assert sleeps == [pytest.approx(60)]
+
+
+def test_rate_limiter_acquire_async(clock):
+    limiter = RateLimiter(rpm=1)
+    sleeps = []
+
+    async def fake_sleep(seconds):
+        sleeps.append(seconds)
+        clock.now += seconds
+
+    async def run():
+        await limiter.acquire_async()
+        await limiter.acquire_async()
+
+    with patch("agentic_edu.modules.rate_limit.asyncio.sleep", fake_sleep):
+        asyncio.run(run())
+    assert sleeps == [pytest.approx(60)]
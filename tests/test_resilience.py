@@ -0,0 +1,239 @@
+import asyncio
+import threading
+import time
+from unittest.mock import MagicMock, patch
+import openai
+import pytest
+from agentic_edu.modules.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    RetryPolicy,
+    ahedged,
+    get_circuit_breaker,
+    circuit_breakers,
+    hedged,
+    is_retryable,
+    retry_after,
+)
+
+
+class FlakyTransport:
+    """
+    Fails the first 'failures' calls with 'error', then returns 'ok'
+    """
+
+    def __init__(self, failures, error):
+        self.failures = failures
+        self.error = error
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise self.error
+        return "ok"
+
+
+def rate_limit_error(retry_after_header=None):
+    headers = {"retry-after": retry_after_header} if retry_after_header else None
+    return openai.error.RateLimitError("slow down", http_status=429, headers=headers)
+
+
+def test_is_retryable():
+    assert is_retryable(rate_limit_error())
+    assert is_retryable(openai.error.APIError("bad gateway", http_status=502))
+    assert is_retryable(TimeoutError())
+    assert not is_retryable(openai.error.APIError("bad request", http_status=400))
+    assert not is_retryable(openai.error.AuthenticationError("no key"))
+    assert not is_retryable(ValueError())
+
+
+def test_retry_after():
+    assert retry_after(rate_limit_error("7")) == 7.0
+    assert retry_after(rate_limit_error()) is None
+    assert retry_after(ValueError()) is None
+    assert retry_after(rate_limit_error("Wed, 21 Oct 2015 07:28:00 GMT")) == 0.0
+
+
+def test_retry_policy_delay_is_jittered_and_capped():
+    policy = RetryPolicy(base_delay=1, max_delay=5)
+    with patch("agentic_edu.modules.resilience.random.uniform", lambda a, b: b):
+        assert policy.delay(1, TimeoutError()) == 1
+        assert policy.delay(3, TimeoutError()) == 4
+        assert policy.delay(10, TimeoutError()) == 5
+        # the server's Retry-After wins over a shorter backoff
+        assert policy.delay(1, rate_limit_error("30")) == 30
+
+
+@patch("agentic_edu.modules.resilience.time.sleep")
+def test_retry_policy_retries_transient_errors(mock_sleep):
+    transport = FlakyTransport(2, rate_limit_error("3"))
+    assert RetryPolicy().call(transport) == "ok"
+    assert transport.calls == 3
+    assert [c.args[0] for c in mock_sleep.call_args_list] == [3, 3]
+
+
+@patch("agentic_edu.modules.resilience.time.sleep")
+def test_retry_policy_gives_up(mock_sleep):
+    transport = FlakyTransport(10, TimeoutError("slow"))
+    with pytest.raises(TimeoutError):
+        RetryPolicy(max_attempts=3).call(transport)
+    assert transport.calls == 3
+
+
+@patch("agentic_edu.modules.resilience.time.sleep")
+def test_retry_policy_does_not_retry_permanent_errors(mock_sleep):
+    transport = FlakyTransport(1, ValueError("bad request"))
+    with pytest.raises(ValueError):
+        RetryPolicy().call(transport)
+    assert transport.calls == 1
+    mock_sleep.assert_not_called()
+
+
+def test_retry_policy_acall():
+    attempts = []
+
+    async def transport():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise TimeoutError()
+        return "ok"
+
+    result = asyncio.run(RetryPolicy(base_delay=0.001).acall(transport))
+    assert result == "ok"
+    assert len(attempts) == 2
+
+
+def test_circuit_breaker_opens_and_recovers():
+    clock = MagicMock(return_value=100.0)
+    with patch("agentic_edu.modules.resilience.time.monotonic", clock):
+        breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=10)
+        breaker.record_failure()
+        breaker.before_call()
+        breaker.record_failure()
+        assert breaker.state == "open"
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()
+
+        # one probe is let through after the reset timeout
+        clock.return_value = 111.0
+        breaker.before_call()
+        assert breaker.state == "half_open"
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()
+
+        breaker.record_success()
+        assert breaker.state == "closed"
+        breaker.before_call()
+
+
+def test_circuit_breaker_failed_probe_reopens():
+    clock = MagicMock(return_value=100.0)
+    with patch("agentic_edu.modules.resilience.time.monotonic", clock):
+        breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=10)
+        breaker.record_failure()
+        clock.return_value = 111.0
+        breaker.before_call()
+        breaker.record_failure()
+        assert breaker.state == "open"
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()
+
+
+def test_non_retryable_error_settles_half_open_probe():
+    clock = MagicMock(return_value=100.0)
+    with patch("agentic_edu.modules.resilience.time.monotonic", clock):
+        breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=10)
+        breaker.record_failure()
+        clock.return_value = 111.0
+
+        # the probe fails for a reason unrelated to the endpoint's health
+        with pytest.raises(ValueError):
+            RetryPolicy().call(
+                FlakyTransport(1, ValueError("bad request")), breaker=breaker
+            )
+        assert not breaker.probing
+
+        # the next call probes again instead of failing fast forever
+        assert RetryPolicy().call(FlakyTransport(0, None), breaker=breaker) == "ok"
+        assert breaker.state == "closed"
+
+
+def test_cancelled_probe_settles():
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+
+    async def cancelled():
+        raise asyncio.CancelledError()
+
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(RetryPolicy().acall(cancelled, breaker=breaker))
+    assert not breaker.probing
+
+
+@patch("agentic_edu.modules.resilience.time.sleep")
+def test_retry_policy_fails_fast_on_open_circuit(mock_sleep):
+    breaker = CircuitBreaker("test", failure_threshold=2)
+    transport = FlakyTransport(10, TimeoutError())
+
+    with pytest.raises(CircuitOpenError):
+        RetryPolicy(max_attempts=5).call(transport, breaker=breaker)
+    assert transport.calls == 2
+
+
+def test_get_circuit_breaker_is_per_endpoint():
+    circuit_breakers.clear()
+    assert get_circuit_breaker("a") is get_circuit_breaker("a")
+    assert get_circuit_breaker("a") is not get_circuit_breaker("b")
+    circuit_breakers.clear()
+
+
+def test_hedged_returns_fast_hedge():
+    calls = []
+    lock = threading.Lock()
+
+    def transport():
+        with lock:
+            calls.append(1)
+            first = len(calls) == 1
+        # the first request stalls, the hedge answers straight away
+        if first:
+            time.sleep(1)
+            return "slow"
+        return "fast"
+
+    started = time.monotonic()
+    assert hedged(transport, hedge_after=0.05) == "fast"
+    assert time.monotonic() - started < 0.5
+    assert len(calls) == 2
+
+
+def test_hedged_no_hedge_when_fast():
+    transport = FlakyTransport(0, None)
+    assert hedged(transport, hedge_after=1) == "ok"
+    assert transport.calls == 1
+
+
+def test_hedged_failure_starts_hedge():
+    transport = FlakyTransport(1, TimeoutError())
+    assert hedged(transport, hedge_after=10) == "ok"
+    assert transport.calls == 2
+
+    transport = FlakyTransport(5, TimeoutError())
+    with pytest.raises(TimeoutError):
+        hedged(transport, hedge_after=10, max_hedges=2)
+    assert transport.calls == 3
+
+
+def test_ahedged_cancels_slow_request():
+    started = []
+
+    async def transport():
+        started.append(1)
+        if len(started) == 1:
+            await asyncio.sleep(10)
+            return "slow"
+        return "fast"
+
+    assert asyncio.run(ahedged(transport, hedge_after=0.01)) == "fast"
+    assert len(started) == 2
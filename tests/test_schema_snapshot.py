@@ -0,0 +1,65 @@
+from agentic_edu.modules.schema_snapshot import SchemaSnapshot
+import os
+
+
+def test_empty_snapshot(tmp_path):
+    snapshot = SchemaSnapshot(str(tmp_path / "snapshot.json"))
+    assert snapshot.definitions == {}
+    assert snapshot.diff({"users": "fp1"}) == (["users"], [])
+
+
+def test_diff_detects_changed_and_removed_tables(tmp_path):
+    snapshot = SchemaSnapshot(str(tmp_path / "snapshot.json"))
+    snapshot.update({"users": ("fp1", "def1"), "jobs": ("fp2", "def2")})
+    changed, removed = snapshot.diff({"users": "fp1b", "orders": "fp3"})
+    assert changed == ["users", "orders"]
+    assert removed == ["jobs"]
+
+
+def test_update_removes_dropped_tables(tmp_path):
+    snapshot = SchemaSnapshot(str(tmp_path / "snapshot.json"))
+    snapshot.update({"users": ("fp1", "def1"), "jobs": ("fp2", "def2")})
+    snapshot.update({}, ["jobs"])
+    assert snapshot.definitions == {"users": "def1"}
+
+
+def test_save_and_load(tmp_path):
+    path = str(tmp_path / "nested" / "snapshot.json")
+    snapshot = SchemaSnapshot(path)
+    snapshot.update({"users": ("fp1", "def1")})
+    snapshot.save()
+    assert os.path.exists(path)
+    reloaded = SchemaSnapshot(path)
+    assert reloaded.definitions == {"users": "def1"}
+    assert reloaded.version == snapshot.version
+
+
+def test_version_changes_with_fingerprints(tmp_path):
+    snapshot = SchemaSnapshot(str(tmp_path / "snapshot.json"))
+    snapshot.update({"users": ("fp1", "def1")})
+    version = snapshot.version
+    snapshot.update({"users": ("fp1b", "def1b")})
+    assert snapshot.version != version
+
+
+def test_corrupt_snapshot_is_ignored(tmp_path):
+    path = tmp_path / "snapshot.json"
+    path.write_text("{not json")
+    assert SchemaSnapshot(str(path)).tables == {}
+
+
+def test_foreign_keys_round_trip(tmp_path):
+    path = str(tmp_path / "snapshot.json")
+    snapshot = SchemaSnapshot(path)
+    snapshot.update_foreign_keys("fk_fp", [("orders", "users")])
+    snapshot.save()
+    reloaded = SchemaSnapshot(path)
+    assert reloaded.foreign_keys == [["orders", "users"]]
+    assert reloaded.foreign_keys_fingerprint == "fk_fp"
+
+
+def test_save_leaves_no_temporary_files(tmp_path):
+    path = tmp_path / "snapshot.json"
+    SchemaSnapshot(str(path)).save()
+    SchemaSnapshot(str(path)).save()
+    assert [p.name for p in tmp_path.iterdir()] == ["snapshot.json"]
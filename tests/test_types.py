@@ -1,4 +1,4 @@
-from agentic_edu.types import Chat, ConversationResult
+from agentic_edu.types import Chat, ConversationResult, TokenUsage
 import pytest
 
 
@@ -41,3 +41,9 @@ def test_conversation_result_multiple_messages():
         error_message="",
     )
     assert len(result.messages) == 2
+
+
+def test_token_usage_total():
+    usage = TokenUsage(prompt_tokens=10, completion_tokens=5, by_agent={"a": 5})
+    assert usage.total_tokens == 15
+    assert TokenUsage().by_agent == {}
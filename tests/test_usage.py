@@ -0,0 +1,165 @@
+from unittest.mock import patch
+import autogen
+import openai
+import pytest
+from agentic_edu.modules.llm_cache import ResponseCache, register_response_cache
+from agentic_edu.modules.usage import (
+    DEFAULT_PRICING,
+    MODEL_PRICING,
+    Usage,
+    UsageLedger,
+    model_pricing,
+)
+
+
+def completion(content, prompt_tokens=100, completion_tokens=20, model="gpt-4-0613"):
+    return {
+        "model": model,
+        "choices": [{"message": {"role": "assistant", "content": content}}],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    }
+
+
+def make_agent():
+    return autogen.AssistantAgent(
+        "analyst",
+        llm_config={
+            "temperature": 0,
+            "config_list": [{"model": "gpt-4", "api_key": "x"}],
+        },
+    )
+
+
+def test_model_pricing():
+    assert model_pricing("gpt-4") == MODEL_PRICING["gpt-4"]
+    assert model_pricing("gpt-4-0613") == MODEL_PRICING["gpt-4"]
+    assert model_pricing("gpt-4-32k-0613") == MODEL_PRICING["gpt-4-32k"]
+    assert model_pricing("gpt-3.5-turbo-16k-0613") == MODEL_PRICING["gpt-3.5-turbo-16k"]
+    assert model_pricing("some-other-model") == DEFAULT_PRICING
+
+
+def test_model_pricing_azure_names():
+    assert model_pricing("gpt-35-turbo") == MODEL_PRICING["gpt-3.5-turbo"]
+    assert model_pricing("gpt-35-turbo-16k") == MODEL_PRICING["gpt-3.5-turbo-16k"]
+
+
+def test_record_prices_prompt_and_completion_separately():
+    ledger = UsageLedger()
+    usage = ledger.record("gpt-4", prompt_tokens=1000, completion_tokens=500)
+    assert usage.cost == pytest.approx(0.03 + 0.03)
+
+    ledger.record("gpt-3.5-turbo", prompt_tokens=1000, completion_tokens=1000)
+    total = ledger.total
+    assert total.calls == 2
+    assert total.prompt_tokens == 2000
+    assert total.completion_tokens == 1500
+    assert total.total_tokens == 3500
+    assert total.cost == pytest.approx(0.06 + 0.0035)
+
+
+def test_record_response():
+    ledger = UsageLedger()
+    usage = ledger.record_response(completion("hi"))
+    assert usage.prompt_tokens == 100
+    assert ledger.by("model")["gpt-4-0613"].calls == 1
+
+    # no usage block, e.g. served from a cache
+    assert ledger.record_response({"choices": []}) is None
+    assert ledger.total.calls == 1
+
+
+def test_child_ledgers_roll_up():
+    session = UsageLedger({"session": "s1"})
+    gate = session.child(team="gate")
+    insights = session.child(team="insights")
+
+    gate.record("gpt-4", 100, 10)
+    insights.record("gpt-4", 200, 20)
+    insights.record("gpt-3.5-turbo", 300, 30)
+
+    assert gate.total.calls == 1
+    assert insights.total.prompt_tokens == 500
+    assert session.total.calls == 3
+
+    by_team = session.by("team")
+    assert by_team["gate"].prompt_tokens == 100
+    assert by_team["insights"].calls == 2
+    assert session.by("session")["s1"].calls == 3
+    assert set(session.by("model")) == {"gpt-4", "gpt-3.5-turbo"}
+
+
+def test_usage_add():
+    usage = Usage()
+    usage.add(Usage(calls=1, prompt_tokens=2, completion_tokens=3, cost=0.5))
+    assert usage == Usage(calls=1, prompt_tokens=2, completion_tokens=3, cost=0.5)
+
+
+@patch("autogen.oai.ChatCompletion.create")
+def test_recording(mock_create):
+    mock_create.return_value = completion("42")
+    agent = make_agent()
+    ledger = UsageLedger()
+
+    with ledger.recording():
+        reply = agent.generate_reply(
+            messages=[{"role": "user", "content": "How many?"}]
+        )
+
+    assert reply == "42"
+    assert ledger.total.prompt_tokens == 100
+    assert ledger.total.completion_tokens == 20
+
+    # nothing is recorded outside the context
+    agent.generate_reply(messages=[{"role": "user", "content": "How many?"}])
+    assert ledger.total.calls == 1
+
+
+@patch("autogen.oai.ChatCompletion._get_response")
+def test_recording_config_list_fallback_counts_once(mock_get_response):
+    # the first config is throttled, the second answers
+    mock_get_response.side_effect = [
+        openai.error.RateLimitError("throttled"),
+        {**completion("42"), "cost": 0.0},
+    ]
+    agent = autogen.AssistantAgent(
+        "analyst",
+        llm_config={
+            "temperature": 0,
+            # keep autogen's disk cache out of the test
+            "use_cache": False,
+            "config_list": [
+                {"model": "gpt-4", "api_key": "x"},
+                {"model": "gpt-3.5-turbo", "api_key": "x"},
+            ],
+        },
+    )
+    ledger = UsageLedger()
+
+    with ledger.recording():
+        agent.generate_reply(messages=[{"role": "user", "content": "How many?"}])
+
+    assert mock_get_response.call_count == 2
+    assert ledger.total.calls == 1
+
+
+@patch("autogen.oai.ChatCompletion.create")
+def test_usage_ledger_with_response_cache(mock_create):
+    mock_create.return_value = completion("42")
+    agent = make_agent()
+    ledger = UsageLedger()
+    cache = ResponseCache(":memory:")
+    register_response_cache(agent, cache)
+    messages = [{"role": "user", "content": "How many?"}]
+
+    with ledger.recording():
+        assert agent.generate_reply(messages=messages) == "42"
+        assert agent.generate_reply(messages=messages) == "42"
+
+    # the cached reply cost nothing
+    mock_create.assert_called_once()
+    assert ledger.total.calls == 1
+    cache.close()
@@ -0,0 +1,90 @@
+from agentic_edu.modules.vector_index import ExactIndex, IVFIndex, VectorIndex, top_k
+from agentic_edu.modules.quantization import QuantizedMatrix
+import numpy as np
+import pytest
+
+
+def make_clustered_vectors(n=2000, dim=32, clusters=20, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim))
+    vectors = centers[rng.integers(0, clusters, n)] + 0.3 * rng.standard_normal(
+        (n, dim)
+    )
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors.astype(np.float32)
+
+
+def test_top_k():
+    scores = np.array([0.1, 0.9, 0.5, 0.7])
+    assert top_k(scores, 2).tolist() == [1, 3]
+    assert top_k(scores, 10).tolist() == [1, 3, 2, 0]
+    assert top_k(scores, 0).tolist() == []
+
+
+def test_vector_index_is_abstract():
+    index = VectorIndex()
+    with pytest.raises(NotImplementedError):
+        index.build(np.zeros((1, 2)))
+    with pytest.raises(NotImplementedError):
+        index.search(np.zeros((1, 2)), np.zeros(2), 1)
+
+
+def test_exact_index_matches_brute_force():
+    vectors = make_clustered_vectors()
+    query = vectors[7]
+    index = ExactIndex()
+    index.build(vectors)
+    indices, scores = index.search(vectors, query, 5)
+    expected = np.argsort(-(vectors @ query))[:5]
+    assert indices.tolist() == expected.tolist()
+    assert indices[0] == 7
+    assert scores[0] == pytest.approx(1.0, abs=1e-5)
+
+
+def test_ivf_probing_every_list_is_exact():
+    vectors = make_clustered_vectors()
+    index = IVFIndex(n_lists=16, n_probe=16, min_vectors=0)
+    index.build(vectors)
+    for query in vectors[:20]:
+        indices, _ = index.search(vectors, query, 10)
+        exact, _ = ExactIndex().search(vectors, query, 10)
+        assert indices.tolist() == exact.tolist()
+
+
+def test_ivf_recall_on_clustered_data():
+    vectors = make_clustered_vectors()
+    index = IVFIndex(n_lists=16, n_probe=4, min_vectors=0)
+    index.build(vectors)
+    hits = 0
+    for query in vectors[:50]:
+        indices, _ = index.search(vectors, query, 10)
+        exact, _ = ExactIndex().search(vectors, query, 10)
+        hits += len(set(indices.tolist()) & set(exact.tolist()))
+    assert hits / (50 * 10) >= 0.9
+
+
+def test_ivf_lists_cover_every_vector():
+    vectors = make_clustered_vectors(n=500)
+    index = IVFIndex(n_lists=8, min_vectors=0)
+    index.build(vectors)
+    assert index.offsets[-1] == 500
+    assert sorted(index.members.tolist()) == list(range(500))
+
+
+def test_ivf_small_index_falls_back_to_exact():
+    vectors = make_clustered_vectors(n=50)
+    index = IVFIndex()
+    index.build(vectors)
+    assert index.centroids is None
+    indices, _ = index.search(vectors, vectors[3], 1)
+    assert indices.tolist() == [3]
+
+
+def test_ivf_over_quantized_matrix():
+    vectors = make_clustered_vectors()
+    quantized = QuantizedMatrix(vectors.shape[1], "int8")
+    quantized.append(vectors)
+    index = IVFIndex(n_lists=16, n_probe=16, min_vectors=0)
+    index.build(quantized)
+    indices, _ = index.search(quantized, vectors[11], 1)
+    assert indices.tolist() == [11]